@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_travel_app.settings")
 
 application = get_asgi_application()
+
+# Build the listing autocomplete index before the worker serves requests.
+from listings import autocomplete  # noqa: E402
+
+autocomplete.warm()
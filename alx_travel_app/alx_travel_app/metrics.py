@@ -0,0 +1,194 @@
+"""
+In-process request metrics: per-request DB and outbound HTTP timings, and
+Prometheus-style histograms rendered by the /metrics view.
+
+Histograms live in process memory, so each server worker exposes its own
+series; scrape every worker (or aggregate in Prometheus) for totals.
+"""
+import contextvars
+import hmac
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class RequestStats:
+    """Counters for the request being served, shared across the threads serving it."""
+
+    __slots__ = ("db_queries", "db_seconds", "http_calls", "http_seconds")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.http_calls = 0
+        self.http_seconds = 0.0
+
+
+# Context variables follow a request into sync_to_async/async_to_sync threads.
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_outbound(seconds):
+    """Add an outbound HTTP call to the current request, if any."""
+    stats = _current.get()
+    if stats is not None:
+        stats.http_calls += 1
+        stats.http_seconds += seconds
+
+
+# ----------------------------
+# DB query timing
+# ----------------------------
+def query_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+def install_query_wrapper(connection):
+    """Time every query on `connection` (see connection.execute_wrapper)."""
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+@receiver(connection_created)
+def _wrap_new_connection(sender, connection, **kwargs):
+    install_query_wrapper(connection)
+
+
+def install_on_open_connections():
+    for connection in connections.all(initialized_only=True):
+        install_query_wrapper(connection)
+
+
+# ----------------------------
+# Histograms
+# ----------------------------
+class Histogram:
+    """Thread-safe cumulative histogram keyed by label values."""
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot):
+            label_text = ",".join(
+                f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)
+            )
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Wall time of HTTP requests by route.",
+    ("method", "route", "status"),
+    DURATION_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries per HTTP request by route.",
+    ("method", "route"),
+    QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries per HTTP request by route.",
+    ("method", "route"),
+    DURATION_BUCKETS,
+)
+REQUEST_OUTBOUND_DURATION = Histogram(
+    "http_request_outbound_duration_seconds",
+    "Time spent in outbound HTTP calls per HTTP request by route.",
+    ("method", "route"),
+    DURATION_BUCKETS,
+)
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_DB_QUERIES, REQUEST_DB_DURATION, REQUEST_OUTBOUND_DURATION)
+
+
+def observe_request(method, route, status, seconds, stats):
+    REQUEST_DURATION.observe((method, route, str(status)), seconds)
+    REQUEST_DB_QUERIES.observe((method, route), stats.db_queries)
+    REQUEST_DB_DURATION.observe((method, route), stats.db_seconds)
+    REQUEST_OUTBOUND_DURATION.observe((method, route), stats.http_seconds)
+
+
+def render_metrics():
+    return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of the request histograms.
+
+    Needs METRICS_TOKEN as a bearer token; without one configured the
+    endpoint is only open with DEBUG on.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        # compare_digest() rejects non-ASCII str, so compare bytes.
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponse(status=403)
+    elif not settings.DEBUG:
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
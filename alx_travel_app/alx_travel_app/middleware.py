@@ -0,0 +1,115 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics
+
+logger = logging.getLogger("alx_travel_app.requests")
+
+# Anything else is reported as OTHER to keep metric label sets bounded.
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class RequestMetricsMiddleware:
+    """
+    Record wall time, DB query count/time and outbound HTTP time per request.
+
+    Each request is logged once on the "alx_travel_app.requests" logger, with
+    the numbers both in the message (logfmt) and as record attributes: at
+    DEBUG, or at INFO when it took REQUEST_LOG_SLOW_MS or longer. Every
+    request is added to the histograms served at /metrics, labelled by the
+    resolved view name. Overhead is a few perf_counter() calls per request and query.
+    Place it first in MIDDLEWARE so the timings cover the whole stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        metrics.install_on_open_connections()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    @staticmethod
+    def record(request, response, seconds, stats):
+        method = request.method if request.method in KNOWN_METHODS else "OTHER"
+        route = getattr(request.resolver_match, "view_name", None) or "unmatched"
+        metrics.observe_request(method, route, response.status_code, seconds, stats)
+
+        fields = {
+            "method": method,
+            "route": route,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(seconds * 1000, 2),
+            "db_queries": stats.db_queries,
+            "db_ms": round(stats.db_seconds * 1000, 2),
+            "http_calls": stats.http_calls,
+            "http_ms": round(stats.http_seconds * 1000, 2),
+        }
+        level = logging.INFO if seconds * 1000 >= settings.REQUEST_LOG_SLOW_MS else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, " ".join(f"{key}={value}" for key, value in fields.items()), extra=fields)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise static file middleware that also runs natively under ASGI.
+
+    The stock middleware is sync-only, so under ASGI Django runs it, and
+    every middleware and view below it, on the single thread-sensitive
+    worker thread; async views then handle one request at a time. Here the
+    static lookup stays on the event loop and only serving a file (or the
+    DEBUG autorefresh scan) leaves it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -80,9 +80,10 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # ------------------------------------------------------------------------------
 MIDDLEWARE = [
+    "alx_travel_app.middleware.RequestMetricsMiddleware",  # first: times the whole stack
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",  # static file handling
+    "alx_travel_app.middleware.AsyncWhiteNoiseMiddleware",  # static files (WhiteNoise, ASGI-safe)
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -149,6 +150,12 @@ if DEBUG:
                 "NAME": BASE_DIR / "db.sqlite3",
             }
         }
+# ------------------------------------------------------------------------------
+# CACHE (in-process by default; set CACHE_URL=redis://... to share it between workers)
+# ------------------------------------------------------------------------------
+CACHES = {"default": env.cache_url("CACHE_URL", default="locmemcache://")}
+LISTING_CACHE_TIMEOUT = env.int("LISTING_CACHE_TIMEOUT", default=300)
+
 # ------------------------------------------------------------------------------
 # PASSWORD VALIDATION
 # ------------------------------------------------------------------------------
@@ -200,11 +207,57 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_RESULT_EXTENDED = True
+# Sync mode (USE_CELERY=False): tasks run on an in-process thread pool after commit
+TASK_EXECUTOR_WORKERS = env.int("TASK_EXECUTOR_WORKERS", default=2)
+TASK_EXECUTOR_QUEUE_SIZE = env.int("TASK_EXECUTOR_QUEUE_SIZE", default=1000)
+TASK_EXECUTOR_DRAIN_TIMEOUT = env.float("TASK_EXECUTOR_DRAIN_TIMEOUT", default=10.0)
+# Run dispatched tasks in the calling thread (still after commit), e.g. for tests
+TASK_EXECUTOR_EAGER = env.bool("TASK_EXECUTOR_EAGER", default=False)
+
+CELERY_BEAT_SCHEDULE = {
+    "drain-email-outbox": {
+        "task": "listings.tasks.drain_email_outbox",
+        "schedule": env.float("EMAIL_OUTBOX_DRAIN_INTERVAL", default=30.0),
+    },
+    "reconcile-pending-payments": {
+        "task": "listings.tasks.reconcile_payments",
+        "schedule": env.float("PAYMENT_RECONCILE_INTERVAL", default=300.0),
+    },
+    "purge-idempotency-keys": {
+        "task": "listings.tasks.purge_idempotency_keys",
+        "schedule": env.float("IDEMPOTENCY_PURGE_INTERVAL", default=3600.0),
+    },
+    "refresh-analytics-rollups": {
+        "task": "listings.tasks.refresh_analytics_rollups",
+        "schedule": env.float("ANALYTICS_ROLLUP_INTERVAL", default=900.0),
+    },
+}
 
 # ------------------------------------------------------------------------------
 # PAYMENTS / KEYS
 # ------------------------------------------------------------------------------
 CHAPA_SECRET_KEY = env("CHAPA_SECRET_KEY", default="")
+CHAPA_BASE_URL = env("CHAPA_BASE_URL", default="https://api.chapa.co/v1")
+FRONTEND_URL = env("FRONTEND_URL", default="http://localhost:3000")
+
+# Outbound gateway client (listings.gateway): pooling, timeouts, retries, breaker
+CHAPA_POOL_SIZE = env.int("CHAPA_POOL_SIZE", default=10)
+CHAPA_ASYNC_POOL_SIZE = env.int("CHAPA_ASYNC_POOL_SIZE", default=200)
+CHAPA_CONNECT_TIMEOUT = env.float("CHAPA_CONNECT_TIMEOUT", default=3.05)
+CHAPA_READ_TIMEOUT = env.float("CHAPA_READ_TIMEOUT", default=10.0)
+CHAPA_MAX_RETRIES = env.int("CHAPA_MAX_RETRIES", default=2)
+CHAPA_BREAKER_THRESHOLD = env.int("CHAPA_BREAKER_THRESHOLD", default=5)
+CHAPA_BREAKER_RESET_SECONDS = env.float("CHAPA_BREAKER_RESET_SECONDS", default=30.0)
+
+# Signed webhooks and reconciliation of stale PENDING payments (listings.payments)
+CHAPA_WEBHOOK_SECRET = env("CHAPA_WEBHOOK_SECRET", default="")
+PAYMENT_RECONCILE_STALE_SECONDS = env.int("PAYMENT_RECONCILE_STALE_SECONDS", default=600)
+PAYMENT_RECONCILE_BATCH_SIZE = env.int("PAYMENT_RECONCILE_BATCH_SIZE", default=100)
+PAYMENT_RECONCILE_CONCURRENCY = env.int("PAYMENT_RECONCILE_CONCURRENCY", default=8)
+
+# Terminal verify results cache and Idempotency-Key retention (seconds)
+PAYMENT_STATUS_CACHE_TIMEOUT = env.int("PAYMENT_STATUS_CACHE_TIMEOUT", default=3600)
+IDEMPOTENCY_KEY_TTL = env.int("IDEMPOTENCY_KEY_TTL", default=86400)
 
 # ------------------------------------------------------------------------------
 # EMAIL
@@ -221,6 +274,14 @@ EMAIL_HOST_USER = env("EMAIL_HOST_USER", default="")
 EMAIL_HOST_PASSWORD = env("EMAIL_HOST_PASSWORD", default="")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER or "coded-something@localhost"
 
+# Outbox mailer (listings.mailer): emails are queued in the DB and sent in batches
+EMAIL_OUTBOX_BATCH_SIZE = env.int("EMAIL_OUTBOX_BATCH_SIZE", default=100)
+EMAIL_OUTBOX_MAX_ATTEMPTS = env.int("EMAIL_OUTBOX_MAX_ATTEMPTS", default=5)
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = env.int("EMAIL_OUTBOX_RETRY_BASE_SECONDS", default=30)
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = env.int("EMAIL_OUTBOX_RETRY_MAX_SECONDS", default=3600)
+# Without Celery beat nothing drains the outbox periodically, so drain after each queue
+EMAIL_OUTBOX_DRAIN_ON_QUEUE = env.bool("EMAIL_OUTBOX_DRAIN_ON_QUEUE", default=not USE_CELERY)
+
 # ------------------------------------------------------------------------------
 # SWAGGER / API DOCS
 # ------------------------------------------------------------------------------
@@ -248,9 +309,36 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
-    "PAGE_SIZE": 10,
+    "PAGE_SIZE": env.int("API_PAGE_SIZE", default=10),
+    "DEFAULT_THROTTLE_RATES": {
+        # POST /api/listings/quote/ is open to anonymous callers
+        "quote": env("QUOTE_THROTTLE_RATE", default="60/min"),
+    },
 }
 
+# Upper bound for the ?page_size= query parameter on paginated endpoints
+API_MAX_PAGE_SIZE = env.int("API_MAX_PAGE_SIZE", default=100)
+
+# Rows per query when streaming booking/payment exports (listings.exports)
+EXPORT_CHUNK_SIZE = env.int("EXPORT_CHUNK_SIZE", default=2000)
+# Rows per validation/upsert batch when importing listings (listings.imports),
+# and how many failed rows the import report lists
+LISTING_IMPORT_CHUNK_SIZE = env.int("LISTING_IMPORT_CHUNK_SIZE", default=1000)
+LISTING_IMPORT_MAX_ERRORS = env.int("LISTING_IMPORT_MAX_ERRORS", default=1000)
+# Dotted path of a listings.search backend class; by default it follows the
+# database (MySQL FULLTEXT, SQLite FTS5, otherwise plain containment)
+LISTING_SEARCH_BACKEND = env("LISTING_SEARCH_BACKEND", default="")
+# ?near=lat,lng&radius=km proximity search: default and largest radius, and
+# the most (nearest) listings a search keeps
+GEO_DEFAULT_RADIUS_KM = env.float("GEO_DEFAULT_RADIUS_KM", default=10.0)
+GEO_MAX_RADIUS_KM = env.float("GEO_MAX_RADIUS_KM", default=500.0)
+GEO_MAX_RESULTS = env.int("GEO_MAX_RESULTS", default=1000)
+# Host analytics rollups (listings.analytics): how far before the last
+# watermark each refresh looks again, in seconds, for rows committed late;
+# and the longest date range an analytics request may ask for
+ANALYTICS_ROLLUP_OVERLAP = env.int("ANALYTICS_ROLLUP_OVERLAP", default=300)
+ANALYTICS_MAX_DAYS = env.int("ANALYTICS_MAX_DAYS", default=366)
+
 # ------------------------------------------------------------------------------
 # LOGGING
 # ------------------------------------------------------------------------------
@@ -259,8 +347,21 @@ LOGGING = {
     "disable_existing_loggers": False,
     "handlers": {"console": {"class": "logging.StreamHandler"}},
     "root": {"handlers": ["console"], "level": "INFO"},
+    "loggers": {
+        # One logfmt line per request from RequestMetricsMiddleware, at DEBUG
+        # (INFO for slow requests); the same fields are set on the record for
+        # structured handlers.
+        "alx_travel_app.requests": {"level": env("REQUEST_LOG_LEVEL", default="INFO")},
+    },
 }
 
+# Per-request metrics (alx_travel_app.middleware / alx_travel_app.metrics)
+REQUEST_METRICS_ENABLED = env.bool("REQUEST_METRICS_ENABLED", default=True)
+# /metrics needs "Authorization: Bearer <token>"; unset, it is only served with DEBUG on
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+# Requests at least this slow are logged at INFO, the rest at DEBUG
+REQUEST_LOG_SLOW_MS = env.int("REQUEST_LOG_SLOW_MS", default=500)
+
 # ------------------------------------------------------------------------------
 # API VERSION
 # ------------------------------------------------------------------------------
@@ -20,6 +20,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from listings.views import UserSignupView 
+from .metrics import metrics_view
 from django.conf import settings 
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -54,4 +55,7 @@ urlpatterns = [
 
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),  # login
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'), # refresh
+
+    # Prometheus scrape endpoint (per-route request histograms)
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_travel_app.settings")
 
 application = get_wsgi_application()
+
+# Build the listing autocomplete index before the worker serves requests.
+from listings import autocomplete  # noqa: E402
+
+autocomplete.warm()
@@ -0,0 +1,192 @@
+"""
+Daily rollups of bookings, payments and reviews for host analytics.
+
+ListingDailyStats holds one row per listing and day with activity, and
+HostDailyStats the same summed over each host's listings. The analytics
+endpoints read only these tables, never the Booking, Payment or Review
+tables.
+
+refresh_rollups() runs on a Celery beat schedule and fills them in
+incrementally. It finds the listings with bookings, payments or reviews
+changed since the last watermark (updated_at, indexed on all three
+tables), or with deletions and host moves recorded in RollupInvalidation
+by listings.signals. It recomputes every rollup row of those listings, then
+the rows of their hosts. A change can move a booking between days (new
+dates) or statuses, and the old values are gone, so the listing's rows
+are recomputed whole rather than adjusted. That reads one listing's
+history per changed listing, through the listing indexes.
+
+Each run looks back ANALYTICS_ROLLUP_OVERLAP seconds before the watermark,
+so rows committed late by a long transaction are still picked up;
+reprocessing a listing is idempotent.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    AnalyticsWatermark, Booking, HostDailyStats, Listing, ListingDailyStats,
+    ListingOccupancy, Payment, Review, RollupInvalidation,
+)
+
+WATERMARK = "rollups"
+METRICS = [
+    "bookings_pending", "bookings_confirmed", "bookings_cancelled", "bookings_completed",
+    "booked_guests", "payments_completed", "revenue", "reviews_count", "rating_sum",
+]
+
+
+def _day(moment):
+    return timezone.localdate(moment)
+
+
+def changed_listing_ids(since):
+    """Listings with a booking, payment or review changed after `since` (everything if None)."""
+    def changed(queryset):
+        return queryset if since is None else queryset.filter(updated_at__gt=since)
+
+    ids = set(changed(Booking.objects).values_list("listing_id", flat=True).distinct())
+    ids.update(changed(Review.objects).values_list("listing_id", flat=True).distinct())
+    ids.update(
+        changed(Payment.objects.filter(booking__isnull=False))
+        .values_list("booking__listing_id", flat=True).distinct()
+    )
+    return ids
+
+
+def compute_listing_rows(listing_ids):
+    """Fresh ListingDailyStats rows (unsaved) for `listing_ids`, from the source tables."""
+    stats = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+
+    bookings = Booking.objects.filter(listing_id__in=listing_ids).values_list("listing_id", "created_at", "status")
+    for listing_id, created_at, status in bookings:
+        stats[listing_id, _day(created_at)][f"bookings_{status}"] += 1
+
+    # Revenue counts on the day the payment completed; later edits (a new
+    # checkout_url, an admin save) move updated_at but not completed_at.
+    payments = Payment.objects.filter(booking__listing_id__in=listing_ids, status="COMPLETED").values_list(
+        "booking__listing_id", Coalesce("completed_at", "updated_at"), "amount"
+    )
+    for listing_id, completed_at, amount in payments:
+        row = stats[listing_id, _day(completed_at)]
+        row["payments_completed"] += 1
+        row["revenue"] += amount
+
+    reviews = Review.objects.filter(listing_id__in=listing_ids).values_list("listing_id", "created_at", "rating")
+    for listing_id, created_at, rating in reviews:
+        row = stats[listing_id, _day(created_at)]
+        row["reviews_count"] += 1
+        row["rating_sum"] += rating
+
+    # Guests per night are already kept per listing by listings.occupancy.
+    nights = ListingOccupancy.objects.filter(listing_id__in=listing_ids, booked_guests__gt=0).values_list(
+        "listing_id", "date", "booked_guests"
+    )
+    for listing_id, night, guests in nights:
+        stats[listing_id, night]["booked_guests"] = guests
+
+    return [
+        ListingDailyStats(listing_id=listing_id, date=day, **values)
+        for (listing_id, day), values in stats.items()
+    ]
+
+
+def refresh_listings(listing_ids, batch_size=500):
+    """
+    Replace the rollup rows of `listing_ids`, `batch_size` listings at a
+    time; returns the ids of their hosts.
+    """
+    listing_ids = sorted(listing_ids)
+    host_ids = set()
+    for start in range(0, len(listing_ids), batch_size):
+        chunk = listing_ids[start:start + batch_size]
+        rows = compute_listing_rows(chunk)
+        with transaction.atomic():
+            ListingDailyStats.objects.filter(listing_id__in=chunk).delete()
+            ListingDailyStats.objects.bulk_create(rows, batch_size=1000)
+        host_ids.update(
+            Listing.objects.filter(pk__in=chunk, host__isnull=False).values_list("host_id", flat=True)
+        )
+    return host_ids
+
+
+def refresh_hosts(host_ids, batch_size=100):
+    """Replace the rollup rows of `host_ids` with sums of their listings' rows."""
+    host_ids = sorted(host_ids)
+    sums = {metric: Sum(metric) for metric in METRICS}
+    for start in range(0, len(host_ids), batch_size):
+        chunk = host_ids[start:start + batch_size]
+        totals = (
+            ListingDailyStats.objects.filter(listing__host_id__in=chunk)
+            .values("listing__host_id", "date")
+            .annotate(occupied_listings=Count("pk", filter=Q(booked_guests__gt=0)), **sums)
+            .order_by()
+        )
+        rows = [
+            HostDailyStats(host_id=values.pop("listing__host_id"), **values)
+            for values in totals
+        ]
+        with transaction.atomic():
+            HostDailyStats.objects.filter(host_id__in=chunk).delete()
+            HostDailyStats.objects.bulk_create(rows, batch_size=1000)
+
+
+def last_refreshed():
+    """The watermark: changes up to this moment are in the rollups (None before the first run)."""
+    return AnalyticsWatermark.objects.filter(name=WATERMARK).values_list("value", flat=True).first()
+
+
+def refresh_rollups(rebuild=False, batch_size=500):
+    """
+    Bring the rollups up to date with the rows changed since the last run.
+
+    With `rebuild`, or on the first run, the rollups are emptied and every
+    listing is recomputed. The run is one transaction holding the watermark
+    row, so overlapping runs (the beat task and a manual refresh_analytics)
+    queue instead of interleaving, and readers never see emptied tables.
+    Returns the number of listings and hosts refreshed.
+    """
+    started = timezone.now()
+    with transaction.atomic():
+        watermark, created = AnalyticsWatermark.objects.select_for_update().get_or_create(
+            name=WATERMARK, defaults={"value": started}
+        )
+        if rebuild or created:
+            ListingDailyStats.objects.all().delete()
+            HostDailyStats.objects.all().delete()
+            since = None
+        else:
+            since = watermark.value - timedelta(seconds=settings.ANALYTICS_ROLLUP_OVERLAP)
+
+        invalidations = list(RollupInvalidation.objects.values_list("pk", "listing_id", "host_id"))
+        listing_ids = changed_listing_ids(since) | {listing_id for _, listing_id, _ in invalidations}
+        host_ids = refresh_listings(listing_ids, batch_size=batch_size)
+        host_ids.update(host_id for _, _, host_id in invalidations if host_id is not None)
+        refresh_hosts(host_ids)
+
+        if invalidations:
+            RollupInvalidation.objects.filter(pk__lte=max(pk for pk, _, _ in invalidations)).delete()
+        watermark.value = started
+        watermark.save(update_fields=["value"])
+    return {"listings": len(listing_ids), "hosts": len(host_ids)}
+
+
+def summarize(queryset):
+    """Totals of a range of daily stats rows, with the average rating."""
+    sums = {metric: Sum(metric) for metric in METRICS if metric != "booked_guests"}
+    # Listing-nights with guests staying
+    if queryset.model is HostDailyStats:
+        occupied = Sum("occupied_listings")
+    else:
+        occupied = Count("pk", filter=Q(booked_guests__gt=0))
+    totals = queryset.aggregate(guest_nights=Sum("booked_guests"), occupied_nights=occupied, **sums)
+    totals = {key: value or 0 for key, value in totals.items()}
+    totals["average_rating"] = (
+        round(totals["rating_sum"] / totals["reviews_count"], 2) if totals["reviews_count"] else None
+    )
+    return totals
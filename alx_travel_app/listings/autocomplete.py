@@ -0,0 +1,354 @@
+"""
+In-process autocomplete over listing titles and locations.
+
+Each worker keeps every listing's title and location in memory, indexed by
+word. The words are kept sorted, so the ones starting with a typed prefix
+are found by bisection, and the listings (or locations) that have a word for
+every prefix are ranked. Lookups never touch the database.
+
+The index is built when the worker starts (alx_travel_app/wsgi.py and
+asgi.py), or else in the background on first use; lookups find nothing
+until it is ready, so no request waits for a full build.
+
+Committed listing saves and deletes are published to the cache as
+numbered changes. Before each lookup a worker compares the shared version
+number with its own and applies the changes it missed. When it cannot,
+because the changes have expired or a bulk write published none, it rebuilds
+the index in the background and answers from the old one until then. The
+default cache is per process, so set CACHE_URL to share changes between
+workers.
+"""
+import heapq
+import logging
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+from .models import Listing
+from .utils import executor
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "listings:autocomplete:version"
+# Published changes are kept this long; a worker further behind rebuilds.
+CHANGE_TIMEOUT = 3600
+# Above this many missed changes a rebuild is cheaper than replaying them.
+MAX_CATCH_UP = 10_000
+
+
+def _change_key(version):
+    return f"listings:autocomplete:change:{version}"
+
+
+def words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def current_version():
+    """Shared version number of the listing titles and locations."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seeded from the clock, like listings.cache, so a counter lost from
+        # the cache never goes back to a number a worker already holds.
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump(count):
+    """Advance the shared version by `count`; returns the new number."""
+    current_version()
+    try:
+        return cache.incr(VERSION_KEY, count)
+    except ValueError:  # evicted in between; the new seed is ahead of every worker
+        current_version()
+        return cache.incr(VERSION_KEY, count)
+
+
+def publish(changes):
+    """
+    Publish (listing id, (title, location) or None if deleted) changes.
+
+    Call once the writing transaction has committed.
+    """
+    changes = list(changes)
+    if not changes:
+        return
+    last = _bump(len(changes))
+    first = last - len(changes) + 1
+    cache.set_many(
+        {_change_key(first + n): change for n, change in enumerate(changes)}, CHANGE_TIMEOUT
+    )
+
+
+def invalidate():
+    """Make every worker rebuild, after writes that published no changes (bulk inserts)."""
+    _bump(1)
+
+
+def _matches(text, prefixes):
+    text_words = words(text)
+    return all(any(word.startswith(prefix) for word in text_words) for prefix in prefixes)
+
+
+def _first_word(title):
+    return next(iter(words(title)), "")
+
+
+def _title_key(listing_id, title):
+    # Sorts shorter titles first, then older listings; the id is the low bits.
+    return len(title) << 40 | listing_id
+
+
+_ID_MASK = (1 << 40) - 1
+
+
+class PrefixIndex:
+    """
+    Sorted keys per word. The keys of all words starting with a prefix are
+    merged lazily in key order, so a lookup can stop after the first few.
+    """
+
+    def __init__(self, items=()):
+        self.postings = {}  # word -> sorted list of keys
+        for key, text in items:
+            for word in set(words(text)):
+                self.postings.setdefault(word, []).append(key)
+        for keys in self.postings.values():
+            keys.sort()
+        self.words = sorted(self.postings)
+
+    def add(self, key, text):
+        for word in set(words(text)):
+            keys = self.postings.get(word)
+            if keys is None:
+                self.postings[word] = [key]
+                insort(self.words, word)
+            else:
+                insort(keys, key)
+
+    def discard(self, key, text):
+        for word in set(words(text)):
+            keys = self.postings.get(word, [])
+            position = bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key:
+                del keys[position]
+            if word in self.postings and not keys:
+                del self.postings[word]
+                del self.words[bisect_left(self.words, word)]
+
+    def _words(self, prefix):
+        return self.words[bisect_left(self.words, prefix):bisect_left(self.words, prefix + "\U0010ffff")]
+
+    def size(self, prefix):
+        """Number of keys (with repeats) that keys(prefix) yields."""
+        return sum(len(self.postings[word]) for word in self._words(prefix))
+
+    def key_set(self, prefix):
+        """Keys of the words starting with `prefix`, unordered."""
+        return set().union(*(self.postings[word] for word in self._words(prefix)))
+
+    def keys(self, prefix):
+        """Keys of the words starting with `prefix`, in order; a key may repeat."""
+        return heapq.merge(*(self.postings[word] for word in self._words(prefix)))
+
+
+class AutocompleteIndex:
+    """Titles and locations of every listing, with prefix lookups."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None  # shared version the index reflects; None until built
+        self.rebuilding = False
+        self._load({})
+
+    def _load(self, entries):
+        self.entries = entries  # listing id -> (title, location)
+        self.location_counts = Counter(location for _, location in entries.values())
+        keyed = [(_title_key(pk, title), title) for pk, (title, _) in entries.items()]
+        self.titles = PrefixIndex(keyed)
+        # First words only, to rank titles that start with the query first.
+        self.title_starts = PrefixIndex((key, _first_word(title)) for key, title in keyed)
+        self.locations = PrefixIndex((location, location) for location in self.location_counts)
+
+    def _apply(self, listing_id, entry):
+        previous = self.entries.pop(listing_id, None)
+        if previous is not None:
+            title, location = previous
+            self.titles.discard(_title_key(listing_id, title), title)
+            self.title_starts.discard(_title_key(listing_id, title), _first_word(title))
+            self.location_counts[location] -= 1
+            if not self.location_counts[location]:
+                del self.location_counts[location]
+                self.locations.discard(location, location)
+        if entry is not None:
+            title, location = entry
+            self.entries[listing_id] = entry
+            self.titles.add(_title_key(listing_id, title), title)
+            self.title_starts.add(_title_key(listing_id, title), _first_word(title))
+            self.location_counts[location] += 1
+            if self.location_counts[location] == 1:
+                self.locations.add(location, location)
+
+    # ----------------------------
+    # Keeping up to date
+    # ----------------------------
+    def rebuild(self):
+        """Load every listing's title and location from the database."""
+        version = current_version()
+        rows = Listing.objects.values_list("id", "title", "location").iterator(chunk_size=5000)
+        fresh = AutocompleteIndex()
+        fresh._load({pk: (title, location) for pk, title, location in rows})
+        with self.lock:
+            self.entries, self.location_counts = fresh.entries, fresh.location_counts
+            self.titles, self.title_starts, self.locations = fresh.titles, fresh.title_starts, fresh.locations
+            self.version = version
+            self.rebuilding = False
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            with self.lock:
+                self.rebuilding = False
+            raise
+
+    def sync(self):
+        """Apply the changes published since the index was built, or schedule a rebuild."""
+        shared = current_version()
+        with self.lock:
+            if self.rebuilding:
+                return
+            # An index not warmed at startup (version None) is built from scratch.
+            behind = None if self.version is None else shared - self.version
+            if behind == 0:
+                return
+            if behind is not None and 0 < behind <= MAX_CATCH_UP:
+                versions = range(self.version + 1, shared + 1)
+                changes = cache.get_many([_change_key(version) for version in versions])
+                if len(changes) == behind:
+                    for version in versions:
+                        self._apply(*changes[_change_key(version)])
+                    self.version = shared
+                    return
+            self.rebuilding = True
+        if settings.TASK_EXECUTOR_EAGER:
+            self._rebuild_in_background()
+        elif not executor.offer(self._rebuild_in_background):
+            # A busy executor must not push the rebuild onto this request;
+            # keep answering from the stale index and retry on a later sync.
+            logger.warning("Task queue full; autocomplete rebuild deferred")
+            with self.lock:
+                self.rebuilding = False
+
+    # ----------------------------
+    # Lookups
+    # ----------------------------
+    def suggest_titles(self, query, limit=10):
+        """
+        Listings whose title has a word starting with each word of `query`.
+
+        Titles starting with the query's first word come first, then the
+        rest; shorter titles rank first within each group.
+        """
+        prefixes = words(query)
+        if not prefixes:
+            return []
+        with self.lock:
+            # All key streams are in rank order, so each pass runs over the
+            # shortest one that holds every match and stops after `limit`.
+            driver = min(prefixes, key=self.titles.size)
+            if self.title_starts.size(prefixes[0]) <= self.titles.size(driver):
+                starting = self.title_starts.keys(prefixes[0])
+            else:
+                starting = self.titles.keys(driver)
+            passes = (
+                (starting, lambda title: _first_word(title).startswith(prefixes[0])),
+                (self.titles.keys(driver), lambda title: True),
+            )
+            found = []
+            for keys, accept in passes:
+                for key in keys:
+                    if len(found) == limit:
+                        break
+                    listing_id = key & _ID_MASK
+                    title = self.entries[listing_id][0]
+                    if listing_id not in found and accept(title) and _matches(title, prefixes):
+                        found.append(listing_id)
+            return [
+                {"id": listing_id, "title": self.entries[listing_id][0], "location": self.entries[listing_id][1]}
+                for listing_id in found
+            ]
+
+    def suggest_locations(self, query, limit=10):
+        """Locations with a word starting with each word of `query`, most listings first."""
+        prefixes = words(query)
+        if not prefixes:
+            return []
+        with self.lock:
+            counts = self.location_counts
+            driver = min(prefixes, key=self.locations.size)
+            found = self.locations.key_set(driver)
+            if len(prefixes) > 1:
+                found = {location for location in found if _matches(location, prefixes)}
+            best = heapq.nsmallest(limit, found, key=lambda location: (-counts[location], location))
+            return [{"location": location, "listings": counts[location]} for location in best]
+
+    # ----------------------------
+    # Stats
+    # ----------------------------
+    def memory_bytes(self):
+        """Approximate memory held by the index, counting shared objects once."""
+        with self.lock:
+            roots = [
+                self.entries, self.location_counts,
+                self.titles.postings, self.titles.words,
+                self.title_starts.postings, self.title_starts.words,
+                self.locations.postings, self.locations.words,
+            ]
+            seen, total, stack = set(), 0, roots
+            while stack:
+                obj = stack.pop()
+                if id(obj) in seen:
+                    continue
+                seen.add(id(obj))
+                total += sys.getsizeof(obj)
+                if isinstance(obj, dict):
+                    stack.extend(obj.keys())
+                    stack.extend(obj.values())
+                elif isinstance(obj, (list, tuple, set)):
+                    stack.extend(obj)
+            return total
+
+
+index = AutocompleteIndex()
+
+
+def warm():
+    """
+    Build the index at worker start; a database that is not ready yet only
+    delays it to first use.
+
+    The build runs in a thread of its own, which ASGI servers importing the
+    application inside their event loop need, and closes that thread's
+    database connection, so a server forking workers after the import
+    (gunicorn --preload) does not hand them a shared connection.
+    """
+    def build():
+        try:
+            index.rebuild()
+        except DatabaseError:
+            logger.warning("Autocomplete index not built at startup; it will be built on first use.", exc_info=True)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=build, name="autocomplete-warm")
+    thread.start()
+    thread.join()
@@ -0,0 +1,107 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+from .models import Booking
+
+# Booking statuses that hold a listing's capacity for their dates.
+BLOCKING_STATUSES = ("pending", "confirmed", "completed")
+
+
+@dataclass(frozen=True)
+class Availability:
+    """Outcome of an availability check for a listing and stay."""
+    available: bool
+    remaining_capacity: int
+    reason: str = ""
+
+
+def overlapping_bookings(listing, check_in, check_out, exclude_booking_id=None):
+    """
+    Bookings holding capacity on any night in [check_in, check_out).
+
+    Served by the (listing, check_in, check_out, status) index on Booking.
+    """
+    queryset = Booking.objects.filter(
+        listing=listing,
+        check_in__lt=check_out,
+        check_out__gt=check_in,
+        status__in=BLOCKING_STATUSES,
+    )
+    if exclude_booking_id is not None:
+        queryset = queryset.exclude(pk=exclude_booking_id)
+    return queryset
+
+
+def peak_occupancy(stays, check_in, check_out):
+    """Highest number of guests present on any night of the requested stay."""
+    events = []
+    for start, end, guests in stays:
+        events.append((max(start, check_in), guests))
+        events.append((min(end, check_out), -guests))
+
+    # Departures sort before arrivals on the same day, so back-to-back
+    # stays never count as overlapping.
+    events.sort(key=lambda event: (event[0], event[1]))
+    peak = current = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def evaluate_stay(listing, check_in, check_out, guests, stays):
+    """Decide availability given the (check_in, check_out, guests) stays already held."""
+    if check_in >= check_out:
+        return Availability(False, 0, "check_out must be after check_in.")
+    if check_in < listing.available_from or check_out > listing.available_to:
+        return Availability(False, 0, "Requested dates are outside the listing's availability window.")
+    if guests > listing.capacity:
+        return Availability(False, listing.capacity, "Listing cannot host that many guests.")
+
+    remaining = listing.capacity - peak_occupancy(stays, check_in, check_out)
+    if guests > remaining:
+        return Availability(False, max(remaining, 0), "Listing is already booked for those dates.")
+    return Availability(True, remaining)
+
+
+def check_availability(listing, check_in, check_out, guests, exclude_booking_id: Optional[int] = None):
+    """Answer "is `listing` free from check_in to check_out for `guests`?"."""
+    stays = overlapping_bookings(
+        listing, check_in, check_out, exclude_booking_id
+    ).values_list("check_in", "check_out", "guests")
+    return evaluate_stay(listing, check_in, check_out, guests, stays)
+
+
+def check_batch_availability(listings, requests):
+    """
+    Check many (listing_id, check_in, check_out, guests) requests at once.
+
+    Existing bookings for every listing involved are loaded with one range
+    query; each accepted request then counts against the ones after it, so
+    a batch cannot overbook a listing by itself. Returns one Availability
+    per request, in order.
+    """
+    if not requests:
+        return []
+
+    held = defaultdict(list)
+    stays = Booking.objects.filter(
+        listing_id__in={listing_id for listing_id, *_ in requests},
+        check_in__lt=max(check_out for _, _, check_out, _ in requests),
+        check_out__gt=min(check_in for _, check_in, _, _ in requests),
+        status__in=BLOCKING_STATUSES,
+    ).values_list("listing_id", "check_in", "check_out", "guests")
+    for listing_id, check_in, check_out, guests in stays:
+        held[listing_id].append((check_in, check_out, guests))
+
+    results = []
+    for listing_id, check_in, check_out, guests in requests:
+        overlapping = [
+            stay for stay in held[listing_id] if stay[0] < check_out and stay[1] > check_in
+        ]
+        result = evaluate_stay(listings[listing_id], check_in, check_out, guests, overlapping)
+        if result.available:
+            held[listing_id].append((check_in, check_out, guests))
+        results.append(result)
+    return results
@@ -0,0 +1,109 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+# Version of the listing collection; bumped whenever any listing changes.
+LIST_SCOPE = "all"
+
+
+def _version_key(scope):
+    return f"listings:version:{scope}"
+
+
+def get_version(scope):
+    """Current version counter for a cache scope (a listing id or LIST_SCOPE)."""
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Seed evicted or new counters from the clock so they never reuse a
+        # number that cached responses may still be stored under.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope):
+    key = _version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def invalidate_listing(listing_id):
+    """
+    Invalidate the cached detail of one listing and every cached list.
+
+    Versions are bumped immediately and again once the transaction commits,
+    so a response cached from pre-commit data by a concurrent request is
+    discarded too.
+    """
+    def bump():
+        bump_version(listing_id)
+        bump_version(LIST_SCOPE)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_listings(listing_ids):
+    """invalidate_listing for many listings, bumping the list version only once."""
+    listing_ids = list(listing_ids)
+
+    def bump():
+        for listing_id in listing_ids:
+            bump_version(listing_id)
+        bump_version(LIST_SCOPE)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+class VersionedCacheMixin:
+    """
+    Cache `list` and `retrieve` responses under versioned keys.
+
+    Keys combine the listing (or collection) version with the full query
+    string, so a signal bumping the version invalidates exactly the
+    affected responses. Responses carry an ETag derived from the same key;
+    a matching If-None-Match is answered with 304 before any DB work.
+    """
+    cache_timeout = settings.LISTING_CACHE_TIMEOUT
+
+    def _cached(self, request, scope, render):
+        query = request.META.get("QUERY_STRING", "")
+        fingerprint = hashlib.sha1(
+            f"{scope}:{get_version(scope)}:{request.get_host()}{request.path}?{query}".encode()
+        ).hexdigest()
+        etag = f'"{fingerprint}"'
+
+        if etag in request.headers.get("If-None-Match", ""):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = etag
+            return response
+
+        key = f"listings:response:{fingerprint}"
+        data = cache.get(key)
+        if data is None:
+            response = render()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, self.cache_timeout)
+        else:
+            response = Response(data)
+        response["ETag"] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        parent = super().list
+        return self._cached(request, LIST_SCOPE, lambda: parent(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        parent = super().retrieve
+        scope = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return self._cached(request, scope, lambda: parent(request, *args, **kwargs))
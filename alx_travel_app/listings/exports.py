@@ -0,0 +1,142 @@
+"""
+Streaming CSV / NDJSON exports of bookings and payments.
+
+Rows are read as values_list tuples, with the listing title and user
+email joined into the same query, in primary-key chunks of
+EXPORT_CHUNK_SIZE, and written out chunk by chunk. Memory therefore stays
+flat however many rows match. (QuerySet.iterator() only streams from a
+server-side cursor on PostgreSQL and Oracle; MySQL's driver would buffer
+the whole result, so each chunk is its own keyset query.)
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Booking, Payment
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+@dataclass(frozen=True)
+class Export:
+    model: type
+    # (column name, values_list lookup); the primary key must come first.
+    columns: tuple
+
+    @property
+    def headers(self):
+        return [name for name, _ in self.columns]
+
+    @property
+    def lookups(self):
+        return [lookup for _, lookup in self.columns]
+
+    @property
+    def statuses(self):
+        return [choice for choice, _ in self.model._meta.get_field("status").choices]
+
+
+EXPORTS = {
+    "bookings": Export(
+        Booking,
+        (
+            ("id", "id"),
+            ("listing_id", "listing_id"),
+            ("listing_title", "listing__title"),
+            ("user_id", "user_id"),
+            ("user_email", "user__email"),
+            ("check_in", "check_in"),
+            ("check_out", "check_out"),
+            ("guests", "guests"),
+            ("price", "price"),
+            ("status", "status"),
+            ("created_at", "created_at"),
+        ),
+    ),
+    "payments": Export(
+        Payment,
+        (
+            ("id", "id"),
+            ("booking_id", "booking_id"),
+            ("listing_title", "booking__listing__title"),
+            ("user_email", "booking__user__email"),
+            ("amount", "amount"),
+            ("status", "status"),
+            ("transaction_id", "transaction_id"),
+            ("created_at", "created_at"),
+            ("updated_at", "updated_at"),
+        ),
+    ),
+}
+
+
+def export_queryset(export, start=None, end=None, statuses=None):
+    """Rows created between the `start` and `end` dates (inclusive) with one of `statuses`."""
+    queryset = export.model.objects.all()
+    if start:
+        queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end:
+        queryset = queryset.filter(created_at__lte=timezone.make_aware(datetime.combine(end, time.max)))
+    if statuses:
+        queryset = queryset.filter(status__in=sorted(statuses))
+    return queryset
+
+
+def iter_chunks(queryset, lookups, chunk_size):
+    """Yield lists of values_list rows, `chunk_size` at a time, in primary-key order."""
+    queryset = queryset.order_by("pk").values_list(*lookups)
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+_encoder = DjangoJSONEncoder()
+
+
+def _csv_value(value):
+    # Same timestamp format as the NDJSON output.
+    return _encoder.default(value) if isinstance(value, datetime) else value
+
+
+def stream_export(export, queryset, file_format, chunk_size=None, on_chunk=None):
+    """
+    Yield the export as text, one chunk of rows per item.
+
+    `on_chunk(rows)` is called with the number of rows in each chunk.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    headers = export.headers
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if file_format == "csv":
+        writer.writerow(headers)
+        yield buffer.getvalue()
+
+    for rows in iter_chunks(queryset, export.lookups, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        if file_format == "csv":
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder))
+                buffer.write("\n")
+        if on_chunk:
+            on_chunk(len(rows))
+        yield buffer.getvalue()
@@ -0,0 +1,57 @@
+from django.conf import settings
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .geo import filter_near
+from .serializers import ListingSearchSerializer
+
+
+class ListingSearchFilter(BaseFilterBackend):
+    """
+    Filter listings by location, type, price range, guest count, stay window
+    and distance from a point.
+
+    Every condition maps onto a column covered by one of the composite
+    indexes declared on Listing.Meta, so searches never scan the table.
+    Distance is pruned by geohash cell first, then measured exactly.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if view.action not in ("list", "search"):
+            return queryset
+
+        params = ListingSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+
+        if filters.get("listing_type"):
+            queryset = queryset.filter(listing_type__in=sorted(filters["listing_type"]))
+        if "location" in filters:
+            queryset = queryset.filter(location=filters["location"])
+        if "min_price" in filters:
+            queryset = queryset.filter(price__gte=filters["min_price"])
+        if "max_price" in filters:
+            queryset = queryset.filter(price__lte=filters["max_price"])
+        if "guests" in filters:
+            queryset = queryset.filter(capacity__gte=filters["guests"])
+
+        # A listing matches when its availability window covers the stay.
+        if "check_in" in filters:
+            queryset = queryset.filter(available_from__lte=filters["check_in"])
+        if "check_out" in filters:
+            queryset = queryset.filter(available_to__gte=filters["check_out"])
+
+        if "near" in filters:
+            latitude, longitude = filters["near"]
+            radius = filters.get("radius", settings.GEO_DEFAULT_RADIUS_KM)
+            queryset = filter_near(queryset, latitude, longitude, radius)
+        return queryset
+
+
+class StableOrderingFilter(OrderingFilter):
+    """OrderingFilter that appends the primary key so pages never overlap."""
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            ordering = [*ordering, "-id" if ordering[-1].startswith("-") else "id"]
+        return ordering
@@ -0,0 +1,335 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+from alx_travel_app.metrics import record_outbound
+
+try:
+    import httpx
+except ImportError:  # optional: only the async payment views need it
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
+class GatewayUnavailable(requests.RequestException):
+    """Raised without a network call while the circuit breaker is open."""
+
+
+# Everything a gateway call can raise for network or protocol failures.
+GATEWAY_ERRORS = (requests.RequestException,) + ((httpx.HTTPError,) if httpx else ())
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing gateway for a while.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls fail fast for `reset_timeout` seconds; then a single trial call
+    is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+def backoff_delay(backoff, attempt):
+    """Full-jitter exponential backoff before retry number `attempt + 1`."""
+    return random.uniform(0, backoff * (2 ** attempt))
+
+
+class GatewayClient:
+    """
+    Shared HTTP client for the payment gateway.
+
+    Keeps a pooled keep-alive requests.Session, applies connect/read
+    timeouts to every call, retries transient failures a bounded number of
+    times with jittered exponential backoff, and trips a circuit breaker
+    when the gateway keeps failing.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        secret_key="",
+        pool_size=10,
+        connect_timeout=3.05,
+        read_timeout=10.0,
+        max_retries=2,
+        backoff=0.2,
+        breaker=None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.secret_key = secret_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Authorization"] = f"Bearer {secret_key}"
+
+    def _sleep_before_retry(self, attempt):
+        time.sleep(backoff_delay(self.backoff, attempt))
+
+    def _send(self, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            record_outbound(time.perf_counter() - started)
+
+    def request(self, method, path, idempotent=True, **kwargs):
+        """
+        Send a request and return the response.
+
+        Non-idempotent calls are only retried when connecting timed out, so
+        the gateway never sees the same request twice.
+        """
+        if not self.breaker.allow():
+            raise GatewayUnavailable(f"{self.base_url} is unavailable (circuit open)")
+
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            try:
+                response = self._send(method, url, **kwargs)
+            except requests.ConnectTimeout as exc:
+                # The request never reached the gateway; always safe to resend.
+                retryable, error = True, exc
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                retryable, error = idempotent, exc
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self.breaker.record_success()
+                    return response
+                retryable, error = idempotent, None
+
+            if not retryable or attempt >= self.max_retries:
+                self.breaker.record_failure()
+                if error is not None:
+                    raise error
+                return response
+
+            logger.warning("Gateway %s %s failed (attempt %d); retrying", method, path, attempt + 1)
+            self._sleep_before_retry(attempt)
+            attempt += 1
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, idempotent=True, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, idempotent=False, **kwargs)
+
+
+class AsyncGatewayClient:
+    """
+    Async counterpart of GatewayClient for the ASGI payment views.
+
+    Built on a pooled httpx.AsyncClient, with the same timeout, retry and
+    circuit-breaker behaviour, so one event loop can keep many gateway
+    calls in flight.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        secret_key="",
+        pool_size=100,
+        connect_timeout=3.05,
+        read_timeout=10.0,
+        max_retries=2,
+        backoff=0.2,
+        breaker=None,
+    ):
+        if httpx is None:
+            raise ImproperlyConfigured("httpx must be installed to use the async payment views.")
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+        self.client = httpx.AsyncClient(
+            # h11 rejects the trailing space of an empty "Bearer " value.
+            headers={"Authorization": f"Bearer {secret_key}"} if secret_key else {},
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def _send(self, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self.client.request(method, url, **kwargs)
+        finally:
+            record_outbound(time.perf_counter() - started)
+
+    async def request(self, method, path, idempotent=True, **kwargs):
+        if not self.breaker.allow():
+            raise GatewayUnavailable(f"{self.base_url} is unavailable (circuit open)")
+
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        attempt = 0
+        while True:
+            try:
+                response = await self._send(method, url, **kwargs)
+            except httpx.ConnectTimeout as exc:
+                retryable, error = True, exc
+            except httpx.TransportError as exc:
+                retryable, error = idempotent, exc
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self.breaker.record_success()
+                    return response
+                retryable, error = idempotent, None
+
+            if not retryable or attempt >= self.max_retries:
+                self.breaker.record_failure()
+                if error is not None:
+                    raise error
+                return response
+
+            logger.warning("Gateway %s %s failed (attempt %d); retrying", method, path, attempt + 1)
+            await asyncio.sleep(backoff_delay(self.backoff, attempt))
+            attempt += 1
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, idempotent=True, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, idempotent=False, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_client = None
+_client_lock = threading.Lock()
+# httpx clients are bound to the event loop they were first used on:
+# loop -> (client, the generator that closes it with the loop).
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_gateway_client():
+    """Process-wide Chapa client, built from settings on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GatewayClient(
+                    base_url=settings.CHAPA_BASE_URL,
+                    secret_key=settings.CHAPA_SECRET_KEY,
+                    pool_size=settings.CHAPA_POOL_SIZE,
+                    connect_timeout=settings.CHAPA_CONNECT_TIMEOUT,
+                    read_timeout=settings.CHAPA_READ_TIMEOUT,
+                    max_retries=settings.CHAPA_MAX_RETRIES,
+                    breaker=CircuitBreaker(
+                        failure_threshold=settings.CHAPA_BREAKER_THRESHOLD,
+                        reset_timeout=settings.CHAPA_BREAKER_RESET_SECONDS,
+                    ),
+                )
+    return _client
+
+
+async def _close_with_loop(client):
+    """
+    Close `client` when its event loop shuts down.
+
+    Left suspended at the yield, the generator is tracked by the loop, and
+    asyncio.run() finalizes pending generators before closing the loop. Both
+    ASGI servers and Django's async_to_sync (a new loop per request under
+    WSGI) run their loops that way, so no loop leaves open connections behind.
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+def get_async_gateway_client():
+    """Chapa client for the running event loop, built from settings on first use."""
+    loop = asyncio.get_running_loop()
+    client, _ = _async_clients.get(loop, (None, None))
+    if client is None:
+        client = AsyncGatewayClient(
+            base_url=settings.CHAPA_BASE_URL,
+            secret_key=settings.CHAPA_SECRET_KEY,
+            pool_size=settings.CHAPA_ASYNC_POOL_SIZE,
+            connect_timeout=settings.CHAPA_CONNECT_TIMEOUT,
+            read_timeout=settings.CHAPA_READ_TIMEOUT,
+            max_retries=settings.CHAPA_MAX_RETRIES,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.CHAPA_BREAKER_THRESHOLD,
+                reset_timeout=settings.CHAPA_BREAKER_RESET_SECONDS,
+            ),
+        )
+        closer = _close_with_loop(client)
+        try:
+            closer.asend(None).send(None)  # run it to the yield
+        except StopIteration:
+            pass
+        _async_clients[loop] = (client, closer)
+    return client
+
+
+@receiver(setting_changed)
+def reset_gateway_client(setting, **kwargs):
+    """Rebuild the clients when a CHAPA_* setting is overridden (e.g. in tests)."""
+    global _client
+    if setting.startswith("CHAPA_"):
+        _client = None
+        _async_clients.clear()
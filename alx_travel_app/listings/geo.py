@@ -0,0 +1,186 @@
+"""
+Proximity search without a spatial database.
+
+Listings store a latitude, a longitude and the geohash of the point (see
+listings.signals). A geohash names a grid cell, and every point in a cell
+shares the cell's hash as a prefix, so a ?near= query runs in two steps:
+
+1. SQL keeps the listings in the few cells that cover the search circle.
+   Each cell is a range condition on the indexed geohash column, which is
+   a B-tree range scan on both MySQL and SQLite. SQLite's case-insensitive
+   LIKE would not use the index.
+2. NumPy computes the exact haversine distances of those candidates in one
+   pass and keeps the nearest GEO_MAX_RESULTS within the radius.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .cache import invalidate_listings
+from .models import Listing
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9  # about 5 x 5 m cells
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Sorts after every geohash character, closing a prefix's range.
+_PREFIX_END = "~"
+
+# City centres for backfilling listings that only have a location name.
+CITY_COORDINATES = {
+    "Addis Ababa": (9.0054, 38.7636),
+    "Nairobi": (-1.2921, 36.8219),
+    "Lagos": (6.5244, 3.3792),
+    "Abuja": (9.0765, 7.3986),
+    "Accra": (5.6037, -0.1870),
+    "Kigali": (-1.9441, 30.0619),
+    "Cairo": (30.0444, 31.2357),
+    "Cape Town": (-33.9249, 18.4241),
+    "Johannesburg": (-26.2041, 28.0473),
+    "Dakar": (14.7167, -17.4677),
+    "Kampala": (0.3476, 32.5825),
+    "Lusaka": (-15.3875, 28.3228),
+    "Marrakesh": (31.6295, -7.9811),
+    "Zanzibar": (-6.1659, 39.2026),
+    "Mombasa": (-4.0435, 39.6682),
+    "Gondar": (12.6030, 37.4521),
+}
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a point, `precision` characters long."""
+    bounds = {True: [-180.0, 180.0], False: [-90.0, 90.0]}  # keyed by "is longitude"
+    chars, bits, bit_count, is_longitude = [], 0, 0, True
+    while len(chars) < precision:
+        low_high = bounds[is_longitude]
+        value = longitude if is_longitude else latitude
+        middle = (low_high[0] + low_high[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            low_high[0] = middle
+        else:
+            low_high[1] = middle
+        is_longitude = not is_longitude
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = bit_count = 0
+    return "".join(chars)
+
+
+def geohash_for(latitude, longitude):
+    """Stored geohash of a listing's coordinates; empty without them."""
+    if latitude is None or longitude is None:
+        return ""
+    return encode(latitude, longitude)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of the geohash cells of a precision."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def covering_cells(latitude, longitude, radius_km, max_cells=9):
+    """
+    Geohash prefixes of the smallest cells (at most `max_cells` of them)
+    that cover the bounding box of a circle; [""] when that is the world.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+    widest = math.cos(math.radians(max(abs(south), abs(north))))
+    if widest <= 0 or radius_km / (EARTH_RADIUS_KM * widest) >= math.pi:
+        return [""]
+    delta_lng = math.degrees(radius_km / (EARTH_RADIUS_KM * widest))
+    west, east = longitude - delta_lng, longitude + delta_lng  # may cross ±180
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        last_row = round(180.0 / height) - 1
+        rows = range(min(int((south + 90) // height), last_row), min(int((north + 90) // height), last_row) + 1)
+        columns = range(int((west + 180) // width), int((east + 180) // width) + 1)
+        if len(rows) * len(columns) > max_cells:
+            continue
+        return sorted({
+            encode(
+                (row + 0.5) * height - 90,
+                ((column + 0.5) * width) % 360.0 - 180,
+                precision,
+            )
+            for row in rows
+            for column in columns
+        })
+    return [""]
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances in km from one point to arrays of points."""
+    lat1, lng1 = math.radians(latitude), math.radians(longitude)
+    lat2, lng2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def filter_near(queryset, latitude, longitude, radius_km, limit=None):
+    """Listings of `queryset` within `radius_km` of a point; the nearest `limit` (GEO_MAX_RESULTS) of them."""
+    limit = limit or settings.GEO_MAX_RESULTS
+    in_cells = Q()
+    for cell in covering_cells(latitude, longitude, radius_km):
+        in_cells |= Q(geohash__gte=cell, geohash__lt=cell + _PREFIX_END)
+    rows = (
+        queryset.filter(in_cells, latitude__isnull=False, longitude__isnull=False)
+        .order_by()
+        .values_list("pk", "latitude", "longitude")
+    )
+    candidates = np.array(list(rows), dtype=np.float64).reshape(-1, 3)
+
+    distances = haversine_km(latitude, longitude, candidates[:, 1], candidates[:, 2])
+    within = np.flatnonzero(distances <= radius_km)
+    if len(within) > limit:
+        within = within[np.argpartition(distances[within], limit - 1)[:limit]]
+    return queryset.filter(pk__in=candidates[within, 0].astype(np.int64).tolist())
+
+
+def backfill(gazetteer=None, batch_size=1000, recompute=False):
+    """
+    Fill in coordinates and geohashes that listings are missing.
+
+    Listings without coordinates get those of their location from
+    `gazetteer` (location name -> (latitude, longitude), matched without
+    case; CITY_COORDINATES by default), one UPDATE per name. Listings with
+    coordinates but no geohash (written with raw SQL), or every listing with
+    `recompute`, then get theirs in primary-key chunks of `batch_size`.
+    Returns counts of what was done.
+    """
+    report = {"located": 0, "geohashed": 0, "unlocated": 0}
+    for name, (latitude, longitude) in (gazetteer or CITY_COORDINATES).items():
+        with transaction.atomic():
+            unlocated = Listing.objects.filter(location__iexact=name, latitude__isnull=True)
+            ids = list(unlocated.values_list("pk", flat=True))
+            report["located"] += unlocated.update(
+                latitude=latitude, longitude=longitude, geohash=geohash_for(latitude, longitude)
+            )
+            invalidate_listings(ids)
+
+    queryset = Listing.objects.filter(latitude__isnull=False, longitude__isnull=False).order_by("pk")
+    if not recompute:
+        queryset = queryset.filter(geohash="")
+    last_pk = 0
+    while chunk := list(queryset.filter(pk__gt=last_pk).only("latitude", "longitude", "geohash")[:batch_size]):
+        last_pk = chunk[-1].pk
+        changed = []
+        for listing in chunk:
+            geohash = geohash_for(listing.latitude, listing.longitude)
+            if geohash != listing.geohash:
+                listing.geohash = geohash
+                changed.append(listing)
+        with transaction.atomic():
+            Listing.objects.bulk_update(changed, ["geohash"])
+            invalidate_listings(listing.pk for listing in changed)
+        report["geohashed"] += len(changed)
+
+    report["unlocated"] = Listing.objects.filter(latitude__isnull=True).count()
+    return report
@@ -0,0 +1,94 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import IdempotencyKey
+
+# A key whose request never finished (e.g. the worker died) can be reused after this.
+IN_PROGRESS_TIMEOUT = timedelta(minutes=1)
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still in progress."
+    default_code = "idempotency_key_in_use"
+
+
+class IdempotencyKeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = "idempotency_key_mismatch"
+
+
+def request_fingerprint(request):
+    digest = hashlib.sha256()
+    for part in (request.method, request.path, request.body):
+        digest.update(part if isinstance(part, bytes) else part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def begin(key, user, fingerprint, attempts=3):
+    """
+    Claim `key` for `user` before running a request.
+
+    Returns (record, None) when the request should run (pass `record` to
+    finish() afterwards) or (None, stored) when an earlier request with the
+    same key completed and `stored` should be replayed. Raises
+    IdempotencyKeyInUse / IdempotencyKeyMismatch for concurrent or
+    different requests under the same key.
+    """
+    if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+        raise ValidationError({"Idempotency-Key": ["Ensure this header has at most 255 characters."]})
+
+    user_id = getattr(user, "pk", None)
+    for attempt in range(attempts):
+        now = timezone.now()
+        IdempotencyKey.objects.filter(user_id=user_id, key=key).filter(
+            Q(expires_at__lte=now) | Q(status_code__isnull=True, created_at__lt=now - IN_PROGRESS_TIMEOUT)
+        ).delete()
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    key=key,
+                    user_id=user_id,
+                    fingerprint=fingerprint,
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                )
+            return record, None
+        except IntegrityError:
+            stored = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+        if stored is not None:
+            break
+        # The other claimant's row was released (failed request) or purged
+        # in between; claim the key again.
+    else:
+        raise IdempotencyKeyInUse()
+
+    if stored.fingerprint != fingerprint:
+        raise IdempotencyKeyMismatch()
+    if stored.status_code is None:
+        raise IdempotencyKeyInUse()
+    return None, stored
+
+
+def finish(record, status_code, data):
+    """Store the response for replay, or release the key if the request failed server-side."""
+    if status_code >= 500:
+        record.delete()
+        return
+    record.status_code = status_code
+    record.response = data
+    record.save(update_fields=["status_code", "response"])
+
+
+def purge_expired_keys():
+    """Delete expired keys; returns how many were removed."""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
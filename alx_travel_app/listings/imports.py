@@ -0,0 +1,294 @@
+"""
+Bulk import of listings from CSV or NDJSON files.
+
+The file is read one row at a time and handled in chunks of
+LISTING_IMPORT_CHUNK_SIZE rows:
+
+- each row is validated by ListingImportSerializer (ListingSerializer's
+  fields and rules, minus the per-row slug uniqueness query);
+- rows that name a slug update the listing that already has the slug
+  (if the importing user may edit it) with one
+  bulk_create(update_conflicts=True) per set of columns the rows give,
+  so columns a row leaves out keep their stored values; or create it.
+  The ownership check and the writes share a transaction, with the
+  matched listings locked;
+- rows without a slug are new listings; their slugs are generated from
+  the titles with one query per round for the whole chunk.
+
+Rows that fail are skipped and reported by line number; the rest of the
+file is still imported.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils.text import slugify
+from rest_framework.exceptions import ValidationError
+
+from . import autocomplete, geo
+from .cache import invalidate_listings
+from .models import Listing
+from .search import index_listings
+from .serializers import ListingImportSerializer
+
+IMPORT_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+UPDATE_FIELDS = [
+    "title", "description", "location", "listing_type", "price",
+    "capacity", "available_from", "available_to",
+    "latitude", "longitude", "geohash", "pricing_rules",
+]
+SLUG_MAX_LENGTH = Listing._meta.get_field("slug").max_length
+
+
+def format_for(filename):
+    """Import format implied by a file name, or None."""
+    for extension, file_format in IMPORT_FORMATS.items():
+        if filename.lower().endswith(extension):
+            return file_format
+    return None
+
+
+def read_rows(binary_file, file_format):
+    """
+    Yield (line number, row) for each record of an uploaded or opened
+    binary file; `row` is a dict, or an error message for unreadable lines.
+    """
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    try:
+        if file_format == "csv":
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line, raw in enumerate(text, 1):
+            if not raw.strip():
+                continue
+            try:
+                row = json.loads(raw)
+            except ValueError:
+                yield line, "Invalid JSON."
+                continue
+            yield line, row if isinstance(row, dict) else "Expected a JSON object."
+    finally:
+        text.detach()  # leave the underlying file open for its owner
+
+
+def _slug_candidate(base, n):
+    if n == 1:
+        return base
+    suffix = f"-{n}"
+    return f"{base[:SLUG_MAX_LENGTH - len(suffix)]}{suffix}"
+
+
+class ListingImporter:
+    """Import rows from read_rows() for `host`; run() returns the report."""
+
+    def __init__(self, host, chunk_size=None, max_errors=None):
+        self.host = host
+        self.chunk_size = chunk_size or settings.LISTING_IMPORT_CHUNK_SIZE
+        self.max_errors = settings.LISTING_IMPORT_MAX_ERRORS if max_errors is None else max_errors
+        self.serializer = ListingImportSerializer()
+        self.imported = {}  # slug -> line, for slugs written by this import
+        self.slug_counters = {}  # generated slug base -> next suffix to try
+        self.rows = self.created = self.updated = self.failed = 0
+        self.errors = []
+
+    def run(self, rows):
+        rows = iter(rows)
+        while chunk := list(islice(rows, self.chunk_size)):
+            self._import_chunk(chunk)
+        return self.report()
+
+    def report(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            # Capped at LISTING_IMPORT_MAX_ERRORS; `failed` has the full count.
+            "errors": self.errors,
+        }
+
+    def _error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "errors": errors})
+
+    def _validate(self, chunk):
+        valid = []
+        for line, row in chunk:
+            self.rows += 1
+            if isinstance(row, str):
+                self._error(line, {"non_field_errors": [row]})
+                continue
+            # Empty CSV cells mean "not given", so model defaults apply.
+            data = {key: value for key, value in row.items() if key and value not in ("", None)}
+            try:
+                valid.append((line, self.serializer.run_validation(data)))
+            except ValidationError as exc:
+                self._error(line, exc.detail)
+        return valid
+
+    def _import_chunk(self, chunk, attempts=3):
+        valid = self._validate(chunk)
+        for _, attrs in valid:
+            # Set by a pre_save signal elsewhere, which bulk_create skips. The
+            # serializer only accepts coordinates as a pair.
+            if "latitude" in attrs:
+                attrs["geohash"] = geo.geohash_for(attrs["latitude"], attrs["longitude"])
+        named = [(line, attrs) for line, attrs in valid if attrs.get("slug")]
+        inserts = [(line, attrs) for line, attrs in valid if not attrs.get("slug")]
+
+        for attempt in range(attempts):
+            try:
+                with transaction.atomic():
+                    errors, upserts, creates, updated_ids = self._match_slugs(named)
+                    for fields, rows in self._group_by_fields(upserts).items():
+                        Listing.objects.bulk_create(
+                            [Listing(host=self.host, **attrs) for attrs in rows], **self._upsert_options(fields)
+                        )
+                    if creates:
+                        Listing.objects.bulk_create([Listing(host=self.host, **attrs) for _, attrs in creates])
+                    if inserts:
+                        self._insert(inserts)
+                break
+            except IntegrityError:
+                # A slug taken by another import after the lookup; look again.
+                if attempt == attempts - 1:
+                    raise
+        for line, error in errors:
+            self._error(line, error)
+        self.imported.update((attrs["slug"], line) for line, attrs in upserts + creates)
+
+        # bulk_create skips the signals that keep these up to date.
+        slugs = [attrs["slug"] for _, attrs in upserts + creates + inserts]
+        written = list(Listing.objects.filter(slug__in=slugs).values_list("pk", "title", "location"))
+        index_listings([pk for pk, _, _ in written])
+        transaction.on_commit(
+            lambda: autocomplete.publish((pk, (title, location)) for pk, title, location in written)
+        )
+        invalidate_listings(updated_ids)
+        self.updated += len(updated_ids)
+        self.created += len(creates) + len(inserts)
+
+    def _match_slugs(self, named):
+        """
+        Sort the (line, attrs) rows naming a slug into upserts of listings
+        the importing user may edit and creates of new listings, both
+        (line, attrs) too.
+
+        The matched listings stay locked until the chunk is written, so their
+        owner cannot change in between; a slug another import creates in
+        between makes the creates fail instead of updating its listing.
+        Returns (errors as (line, errors), upserts, creates, updated ids).
+        """
+        existing = {
+            slug: (pk, host_id)
+            for pk, slug, host_id in Listing.objects.select_for_update()
+            .filter(slug__in={attrs["slug"] for _, attrs in named})
+            .values_list("pk", "slug", "host_id")
+        }
+        errors, upserts, creates, updated_ids = [], [], [], []
+        seen = {}
+        for line, attrs in named:
+            slug = attrs["slug"]
+            first = self.imported.get(slug) or seen.get(slug)
+            if first:
+                errors.append((line, {"slug": [f"Duplicate of line {first} in this file."]}))
+                continue
+            if slug in existing:
+                pk, host_id = existing[slug]
+                if host_id != self.host.pk and not self.host.is_staff:
+                    errors.append((line, {"slug": ["A listing with this slug belongs to another host."]}))
+                    continue
+                updated_ids.append(pk)
+                upserts.append((line, attrs))
+            else:
+                creates.append((line, attrs))
+            seen[slug] = line
+        return errors, upserts, creates, updated_ids
+
+    @staticmethod
+    def _group_by_fields(upserts):
+        """Group upsert attrs by the UPDATE_FIELDS they give, as {fields: [attrs]}."""
+        groups = defaultdict(list)
+        for _, attrs in upserts:
+            groups[tuple(field for field in UPDATE_FIELDS if field in attrs)].append(attrs)
+        return groups
+
+    @staticmethod
+    def _upsert_options(fields):
+        options = {"update_conflicts": True, "update_fields": list(fields)}
+        # MySQL upserts on any unique key and rejects an explicit target.
+        if connection.features.supports_update_conflicts_with_target:
+            options["unique_fields"] = ["slug"]
+        return options
+
+    def _insert(self, inserts, attempts=3):
+        """Insert new (line, attrs) listings, regenerating slugs if a concurrent writer took one."""
+        for attempt in range(attempts):
+            self._assign_slugs(inserts)
+            try:
+                with transaction.atomic():
+                    Listing.objects.bulk_create([Listing(host=self.host, **attrs) for _, attrs in inserts])
+                return
+            except IntegrityError:
+                if attempt == attempts - 1:
+                    raise
+                for _, attrs in inserts:
+                    self.imported.pop(attrs.pop("slug"), None)
+
+    def _assign_slugs(self, inserts):
+        """
+        Give each row a unique slug derived from its title.
+
+        Rows sharing a base slug get consecutive suffixes. Each round checks
+        a window of candidates per base with batched queries, and the window
+        doubles for bases that are still short, so heavily used titles take
+        a few rounds rather than one per taken suffix.
+        """
+        pending = defaultdict(list)
+        for line, attrs in inserts:
+            base = slugify(attrs["title"])[:SLUG_MAX_LENGTH] or "listing"
+            pending[base].append((line, attrs))
+        window = {base: len(rows) for base, rows in pending.items()}
+
+        while pending:
+            candidates = {}
+            for base in pending:
+                first = self.slug_counters.get(base, 1)
+                candidates[base] = [_slug_candidate(base, n) for n in range(first, first + window[base])]
+            taken = _existing_slugs([slug for slugs in candidates.values() for slug in slugs])
+
+            for base, rows in list(pending.items()):
+                assigned = 0
+                for offset, slug in enumerate(candidates[base]):
+                    if assigned == len(rows):
+                        break
+                    if slug in taken or slug in self.imported:
+                        continue
+                    line, attrs = rows[assigned]
+                    attrs["slug"] = slug
+                    self.imported[slug] = line
+                    assigned += 1
+                else:
+                    offset = len(candidates[base])
+                self.slug_counters[base] = self.slug_counters.get(base, 1) + offset
+                if assigned < len(rows):
+                    pending[base] = rows[assigned:]
+                    window[base] *= 2
+                else:
+                    del pending[base]
+
+
+def _existing_slugs(slugs, batch_size=500):
+    taken = set()
+    for start in range(0, len(slugs), batch_size):
+        taken.update(
+            Listing.objects.filter(slug__in=slugs[start:start + batch_size]).values_list("slug", flat=True)
+        )
+    return taken
@@ -0,0 +1,199 @@
+import logging
+import random
+import time
+from smtplib import SMTPServerDisconnected
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+from .utils import run_in_background
+
+logger = logging.getLogger(__name__)
+
+# A claimed batch that is not finished within this lease is picked up again.
+SENDING_LEASE = timedelta(minutes=5)
+
+
+# ----------------------------
+# Queueing
+# ----------------------------
+def queue_emails(messages):
+    """
+    Put (subject, body, from_email, recipients) tuples in the outbox.
+
+    Delivery happens in batches in drain_outbox(); when no periodic worker
+    is configured (EMAIL_OUTBOX_DRAIN_ON_QUEUE) the outbox is drained in
+    the background as soon as the current transaction commits.
+    """
+    emails = OutboundEmail.objects.bulk_create(
+        [
+            OutboundEmail(
+                subject=subject,
+                body=body,
+                from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+                recipients=list(recipients),
+            )
+            for subject, body, from_email, recipients in messages
+        ]
+    )
+    if emails and settings.EMAIL_OUTBOX_DRAIN_ON_QUEUE:
+        run_in_background(drain_outbox)
+    return len(emails)
+
+
+def queue_email(subject, body, recipients, from_email=None):
+    return queue_emails([(subject, body, from_email, recipients)])
+
+
+# ----------------------------
+# Delivery
+# ----------------------------
+def retry_delay(attempts):
+    """Exponential backoff with jitter for the given number of failed attempts."""
+    base = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+    capped = min(base, settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS)
+    return timedelta(seconds=capped * random.uniform(0.5, 1.0))
+
+
+def _claim_batch(batch_size):
+    """Lease the next due emails so concurrent drainers never send them twice."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=("queued", "sending"), next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if ids:
+            OutboundEmail.objects.filter(pk__in=ids).update(
+                status="sending", next_attempt_at=now + SENDING_LEASE
+            )
+    return list(OutboundEmail.objects.filter(pk__in=ids).order_by("pk"))
+
+
+def _reopen(connection):
+    """Reconnect a connection the server dropped; False if it cannot be reopened."""
+    try:
+        connection.close()
+        connection.open()
+    except Exception as exc:  # noqa: BLE001 - any connect error ends the batch
+        logger.warning("Reopening the mail connection failed: %s", exc)
+        return False
+    return True
+
+
+def _send_batch(connection, emails):
+    """
+    Send claimed emails; returns (sent, failed, released).
+
+    A dropped connection is reopened once per drop and the message retried.
+    If it cannot be reopened, the rest of the batch is released for the next
+    drain without counting an attempt against it.
+    """
+    sent, failed, released = [], [], []
+    for index, email in enumerate(emails):
+        message = EmailMessage(
+            email.subject, email.body, email.from_email, email.recipients, connection=connection
+        )
+        try:
+            try:
+                connection.send_messages([message])
+            except SMTPServerDisconnected:
+                if not _reopen(connection):
+                    released = emails[index:]
+                    break
+                connection.send_messages([message])
+        except Exception as exc:  # noqa: BLE001 - any SMTP error is retried
+            email.attempts += 1
+            email.last_error = str(exc)[:1000]
+            if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                email.status = "failed"
+            else:
+                email.status = "queued"
+                email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+            failed.append(email)
+        else:
+            email.attempts += 1
+            email.status = "sent"
+            email.sent_at = timezone.now()
+            sent.append(email)
+
+    now = timezone.now()
+    for email in released:
+        email.status = "queued"
+        email.next_attempt_at = now
+    OutboundEmail.objects.bulk_update(
+        sent + failed + released, ["status", "attempts", "next_attempt_at", "last_error", "sent_at"]
+    )
+    return sent, failed, released
+
+
+def drain_outbox(batch_size=None, max_batches=None):
+    """
+    Send due outbox emails in batches over a single reused connection.
+
+    Returns a dict with the number of emails sent and failed.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    totals = {"sent": 0, "failed": 0}
+    started = time.monotonic()
+
+    connection = None
+    batches = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            emails = _claim_batch(batch_size)
+            if not emails:
+                break
+            if connection is None:
+                connection = get_connection()
+                connection.open()
+            sent, failed, released = _send_batch(connection, emails)
+            totals["sent"] += len(sent)
+            totals["failed"] += len(failed)
+            record_sent(len(sent))
+            batches += 1
+            if released:
+                # The mail server is unreachable; leave the rest for the next drain.
+                break
+    finally:
+        if connection is not None:
+            connection.close()
+
+    if totals["sent"] or totals["failed"]:
+        logger.info(
+            "Outbox drained: %(sent)d sent, %(failed)d failed in %(elapsed).2fs",
+            {**totals, "elapsed": time.monotonic() - started},
+        )
+    return totals
+
+
+# ----------------------------
+# Throughput metric
+# ----------------------------
+def _minute_key(moment):
+    return f"mailer:sent:{moment:%Y%m%d%H%M}"
+
+
+def record_sent(count):
+    if not count:
+        return
+    key = _minute_key(timezone.now())
+    if not cache.add(key, count, timeout=3600):
+        cache.incr(key, count)
+
+
+def sent_per_minute(minutes=15):
+    """Emails sent in each of the last `minutes` minutes, oldest first."""
+    now = timezone.now()
+    moments = [now - timedelta(minutes=offset) for offset in reversed(range(minutes))]
+    counts = cache.get_many([_minute_key(moment) for moment in moments])
+    return [
+        (f"{moment:%Y-%m-%dT%H:%M}", counts.get(_minute_key(moment), 0)) for moment in moments
+    ]
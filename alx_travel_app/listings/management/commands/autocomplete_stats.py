@@ -0,0 +1,57 @@
+# listings/management/commands/autocomplete_stats.py
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from listings.autocomplete import AutocompleteIndex, words
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the listing autocomplete index as a worker would and report its "
+        "build time, memory (also per 100k listings) and lookup latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lookups", type=int, default=1000, help="Sample lookups to time (default: 1000)"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the sample queries (default: 0)")
+
+    def handle(self, *args, **options):
+        index = AutocompleteIndex()
+        started = time.perf_counter()
+        index.rebuild()
+        build_seconds = time.perf_counter() - started
+        listings = len(index.entries)
+        if not listings:
+            raise CommandError("No listings to index.")
+
+        memory = index.memory_bytes()
+        self.stdout.write(
+            f"Indexed {listings:,} listings, {len(index.titles.words):,} title words and "
+            f"{len(index.location_counts):,} locations in {build_seconds:.1f} s"
+        )
+        self.stdout.write(
+            f"Memory: {memory / 2**20:,.1f} MiB ({memory / listings * 100_000 / 2**20:,.1f} MiB per 100k listings)"
+        )
+
+        # Prefixes of 1-6 characters of real title and location words, as typed.
+        rng = random.Random(options["seed"])
+        entries = list(index.entries.values())
+        for field, suggest in (("title", index.suggest_titles), ("location", index.suggest_locations)):
+            timings = []
+            for _ in range(options["lookups"]):
+                text = rng.choice(entries)[0 if field == "title" else 1]
+                typed = " ".join(words(text))[:rng.randint(1, 6)]
+                start = time.perf_counter()
+                suggest(typed)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f"{field:<9} lookups: p50 {statistics.median(timings):.3f} ms  "
+                f"p99 {timings[max(0, int(len(timings) * 0.99) - 1)]:.3f} ms  max {timings[-1]:.3f} ms"
+            )
+        self.stdout.write(self.style.SUCCESS("✅ Autocomplete index stats complete."))
@@ -0,0 +1,307 @@
+# listings/management/commands/bench_api.py
+
+import json
+import logging
+import math
+import platform
+import random
+import statistics
+import subprocess
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from listings.gateway_stub import StubGateway
+from listings.models import Booking, Listing, Payment, Review
+from listings.synthetic import PREFIX, FixtureSize, seed_fixture
+
+User = get_user_model()
+
+# The stub keeps payments pending, so verify always takes the gateway path.
+PENDING = {"status": "success", "data": {"status": "pending"}}
+
+SCENARIOS = (
+    "listing_list",
+    "listing_list_cached",
+    "listing_detail",
+    "booking_create",
+    "user_list",
+    "payment_verify",
+)
+
+
+class QueryCounter:
+    """connection.execute_wrapper that counts the queries run through it."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of sorted `values`."""
+    return values[max(0, math.ceil(len(values) * pct / 100) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main API endpoints against a synthetic fixture: seeds it "
+        "(once per --seed) and records latency percentiles and query counts per "
+        "scenario. Payment verify runs against a local stub gateway."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=int,
+            default=10_000,
+            help="Listings in the fixture; other tables scale with it (default: 10000)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Fixture and request-mix seed (default: 0)"
+        )
+        parser.add_argument(
+            "--anchor-date",
+            type=date.fromisoformat,
+            help="Day (YYYY-MM-DD) the fixture and booking dates are counted from (default: today)",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=5000, help="Rows per bulk insert (default: 5000)"
+        )
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Timed requests per scenario (default: 200)"
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=10, help="Untimed requests per scenario (default: 10)"
+        )
+        parser.add_argument(
+            "--scenarios",
+            default=",".join(SCENARIOS),
+            help=f"Comma-separated subset of: {', '.join(SCENARIOS)}",
+        )
+        parser.add_argument(
+            "--gateway-delay",
+            type=float,
+            default=0.0,
+            help="Stub gateway delay in seconds (default: 0)",
+        )
+        parser.add_argument("--json", dest="json_path", help="Also write results to this file")
+        parser.add_argument(
+            "--compare", help="Earlier --json results to print p50/p95 changes against"
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options["scenarios"].split(",") if name.strip()]
+        unknown = sorted(set(scenarios) - set(SCENARIOS))
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}")
+        if options["requests"] < 1:
+            raise CommandError("--requests must be at least 1.")
+
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read {options['compare']}: {exc}")
+
+        self.tag = f"{PREFIX}-{options['seed']}"
+        self.anchor = options["anchor_date"] or date.today()
+        counts = self._fixture(options)
+        self.rng = random.Random(options["seed"])
+        self._load_ids()
+
+        results = {
+            "meta": self._meta(options, counts),
+            "scenarios": {},
+        }
+        # Keep benchmark requests out of the request log, and run email tasks
+        # inline into the outbox without sending, so timings are repeatable.
+        request_logger = logging.getLogger("alx_travel_app.requests")
+        previous_level = request_logger.level
+        request_logger.setLevel(logging.WARNING)
+        try:
+            with StubGateway([(200, PENDING, options["gateway_delay"])]) as stub, override_settings(
+                CHAPA_BASE_URL=stub.url,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                TASK_EXECUTOR_EAGER=True,
+                EMAIL_OUTBOX_DRAIN_ON_QUEUE=False,
+                EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            ):
+                for name in scenarios:
+                    row = self._run(name, options["requests"], options["warmup"])
+                    results["scenarios"][name] = row
+                    self.stdout.write(
+                        f"{name:<20}  p50 {row['p50_ms']:>8.2f} ms  p95 {row['p95_ms']:>8.2f} ms"
+                        f"  p99 {row['p99_ms']:>8.2f} ms  queries {row['queries_median']:>3}"
+                        f"  statuses {row['statuses']}"
+                    )
+        finally:
+            request_logger.setLevel(previous_level)
+            self._cleanup()
+
+        if baseline is not None:
+            self._compare(baseline, results)
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(results, fh, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"✅ Results written to {options['json_path']}"))
+
+    # ----------------------------
+    # Fixture
+    # ----------------------------
+    def _fixture(self, options):
+        """Seed the fixture for --seed unless it is already in the database."""
+        if Listing.objects.filter(slug__startswith=f"{self.tag}-").exists():
+            counts = {
+                "users": User.objects.filter(username__startswith=f"{self.tag}-user-").count(),
+                "listings": Listing.objects.filter(slug__startswith=f"{self.tag}-").count(),
+                "bookings": Booking.objects.filter(listing__slug__startswith=f"{self.tag}-").count(),
+                "reviews": Review.objects.filter(listing__slug__startswith=f"{self.tag}-").count(),
+                "payments": Payment.objects.filter(transaction_id__startswith=f"{self.tag}-tx-").count(),
+            }
+            if counts["listings"] != options["scale"]:
+                raise CommandError(
+                    f"The fixture for seed {options['seed']} has {counts['listings']} listings, "
+                    f"not {options['scale']}. Use another --seed or the matching --scale."
+                )
+            self.stdout.write(f"Reusing fixture {self.tag}: {counts}")
+            return counts
+
+        def progress(label, rows, seconds):
+            rate = rows / seconds if seconds else rows
+            self.stdout.write(f"  {label:<12} {rows:>9} rows  {seconds:>7.1f} s  {rate:>9.0f} rows/s")
+
+        self.stdout.write(f"Seeding fixture {self.tag} ({options['scale']} listings)...")
+        return seed_fixture(
+            FixtureSize.for_scale(options["scale"]),
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            progress=progress,
+            anchor=self.anchor,
+        )
+
+    def _load_ids(self):
+        self.listing_ids = list(
+            Listing.objects.filter(slug__startswith=f"{self.tag}-").order_by("pk").values_list("pk", flat=True)
+        )
+        self.transaction_ids = list(
+            Payment.objects.filter(transaction_id__startswith=f"{self.tag}-tx-", status="PENDING")
+            .order_by("pk")
+            .values_list("transaction_id", flat=True)
+        )
+        self.user = User.objects.get(username=f"{self.tag}-user-0")
+        self.started_at = timezone.now()
+
+    def _cleanup(self):
+        """Drop the bookings created by booking_create so reruns see the same fixture."""
+        Booking.objects.filter(user=self.user, created_at__gte=self.started_at).delete()
+
+    def _meta(self, options, counts):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "timestamp": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "seed": options["seed"],
+            "anchor_date": self.anchor.isoformat(),
+            "scale": options["scale"],
+            "rows": counts,
+            "requests": options["requests"],
+            "warmup": options["warmup"],
+            "gateway_delay_s": options["gateway_delay"],
+        }
+
+    # ----------------------------
+    # Scenarios
+    # ----------------------------
+    def _request(self, name):
+        """Next (method, path, body, cold) for a scenario; cold requests start with an empty cache."""
+        rng = self.rng
+        if name == "listing_list":
+            return "get", "/api/listings/", None, True
+        if name == "listing_list_cached":
+            return "get", "/api/listings/", None, False
+        if name == "listing_detail":
+            return "get", f"/api/listings/{rng.choice(self.listing_ids)}/", None, True
+        if name == "booking_create":
+            check_in = self.anchor + timedelta(days=rng.randint(200, 360))
+            return "post", "/api/bookings/", {
+                "listing_id": rng.choice(self.listing_ids),
+                "check_in": check_in.isoformat(),
+                "check_out": (check_in + timedelta(days=rng.randint(1, 5))).isoformat(),
+                "guests": 1,
+                "price": "100.00",
+            }, False
+        if name == "user_list":
+            return "get", "/api/users/", None, False
+        if not self.transaction_ids:
+            raise CommandError("The fixture has no PENDING payments to verify.")
+        return "get", f"/api/payments/verify/{rng.choice(self.transaction_ids)}/", None, True
+
+    def _run(self, name, total, warmup):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        timings, queries, statuses = [], [], Counter()
+
+        for n in range(warmup + total):
+            method, path, body, cold = self._request(name)
+            if cold:
+                cache.clear()
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                start = time.perf_counter()
+                response = getattr(client, method)(path, body, format="json", secure=True)
+                elapsed = (time.perf_counter() - start) * 1000
+            if n < warmup:
+                continue
+            timings.append(elapsed)
+            queries.append(counter.count)
+            statuses[str(response.status_code)] += 1
+
+        timings.sort()
+        return {
+            "requests": total,
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "mean_ms": round(statistics.fmean(timings), 2),
+            "max_ms": round(timings[-1], 2),
+            "queries_median": statistics.median_low(queries),
+            "queries_max": max(queries),
+            "statuses": dict(sorted(statuses.items())),
+        }
+
+    def _compare(self, baseline, results):
+        self.stdout.write(f"\nChange against {baseline.get('meta', {}).get('commit') or 'baseline'}:")
+        for name, row in results["scenarios"].items():
+            before = baseline.get("scenarios", {}).get(name)
+            if before is None:
+                continue
+            changes = []
+            for key in ("p50_ms", "p95_ms"):
+                delta = (row[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+                changes.append(f"{key[:3]} {before[key]:>8.2f} -> {row[key]:>8.2f} ms ({delta:+6.1f}%)")
+            self.stdout.write(f"{name:<20}  " + "  ".join(changes))
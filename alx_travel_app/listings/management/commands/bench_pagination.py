@@ -0,0 +1,108 @@
+# listings/management/commands/bench_pagination.py
+
+import json
+import statistics
+import time
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory, force_authenticate
+from listings.views import BookingViewSet, ListingViewSet
+
+User = get_user_model()
+
+ENDPOINTS = {
+    "listings": ListingViewSet,
+    "bookings": BookingViewSet,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure list latency at increasing page depths for cursor and page-number "
+        "pagination. Run it against a seeded database (see the seed command)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="listings")
+        parser.add_argument(
+            "--depths",
+            default="1,10,100,1000",
+            help="Comma-separated page numbers to sample (default: 1,10,100,1000)",
+        )
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Samples per depth and mode (default: 5)"
+        )
+        parser.add_argument("--json", dest="json_path", help="Also write results to this file")
+
+    def handle(self, *args, **options):
+        try:
+            depths = sorted({int(d) for d in options["depths"].split(",")})
+        except ValueError:
+            raise CommandError("--depths must be a comma-separated list of integers.")
+
+        self.factory = APIRequestFactory(HTTP_HOST="localhost")
+        self.view = ENDPOINTS[options["endpoint"]].as_view({"get": "list"})
+        self.user = User.objects.filter(is_superuser=True).first() or User.objects.first()
+        self.path = f"/api/{options['endpoint']}/"
+        page_size = options["page_size"]
+
+        results = {"endpoint": options["endpoint"], "page_size": page_size, "samples": []}
+        for mode in ("cursor", "page"):
+            for depth, timings in self._measure(mode, depths, page_size, options["repeat"]):
+                row = {
+                    "mode": mode,
+                    "depth": depth,
+                    "median_ms": round(statistics.median(timings), 2),
+                    "max_ms": round(max(timings), 2),
+                }
+                results["samples"].append(row)
+                self.stdout.write(
+                    f"{mode:>6}  page {depth:>6}  median {row['median_ms']:>8.2f} ms"
+                    f"  max {row['max_ms']:>8.2f} ms"
+                )
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Results written to {options['json_path']}"))
+
+    def _get(self, params):
+        request = self.factory.get(self.path, params)
+        if self.user is not None:
+            force_authenticate(request, user=self.user)
+        start = time.perf_counter()
+        response = self.view(request)
+        response.render()
+        elapsed = (time.perf_counter() - start) * 1000
+        return response, elapsed
+
+    def _measure(self, mode, depths, page_size, repeat):
+        if mode == "page":
+            for depth in depths:
+                timings = []
+                for _ in range(repeat):
+                    response, elapsed = self._get({"page": depth, "page_size": page_size})
+                    if response.status_code != 200:
+                        return
+                    timings.append(elapsed)
+                yield depth, timings
+            return
+
+        # Cursors are not random access: walk forward and re-time each
+        # sampled page through its own cursor.
+        params = {"page_size": page_size}
+        for page in range(1, depths[-1] + 1):
+            response, _ = self._get(params)
+            if page in depths:
+                yield page, [self._get(params)[1] for _ in range(repeat)]
+            next_link = response.data.get("next")
+            if not next_link:
+                return
+            params = {"page_size": page_size, "cursor": _cursor_from(next_link)}
+
+
+def _cursor_from(link):
+    return parse_qs(urlparse(link).query)["cursor"][0]
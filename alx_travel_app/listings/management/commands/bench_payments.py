@@ -0,0 +1,128 @@
+# listings/management/commands/bench_payments.py
+
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from listings.gateway import get_async_gateway_client
+from listings.gateway_stub import StubGateway
+from listings.models import Booking, Payment
+
+# The stub keeps the payment pending, so no emails are sent.
+PENDING = {"status": "success", "data": {"status": "pending"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare payment-verify throughput of the sync (WSGI) and async (ASGI) views "
+        "against a local stub gateway that answers after a fixed delay. Needs at "
+        "least one booking in the database (see the seed command)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Requests per mode (default: 200)"
+        )
+        parser.add_argument(
+            "--delay", type=float, default=0.1, help="Stub gateway delay in seconds (default: 0.1)"
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=16,
+            help="WSGI worker threads, like a threaded gunicorn worker (default: 16)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=200,
+            help="Requests in flight on the single ASGI event loop (default: 200)",
+        )
+        parser.add_argument("--json", dest="json_path", help="Also write results to this file")
+
+    def handle(self, *args, **options):
+        booking = Booking.objects.first()
+        if booking is None:
+            raise CommandError("No bookings found. Seed the database first.")
+
+        payment = Payment.objects.create(
+            booking=booking, amount=booking.price, transaction_id=f"bench-{uuid.uuid4().hex}"
+        )
+        results = {"requests": options["requests"], "gateway_delay_s": options["delay"], "modes": []}
+        try:
+            with StubGateway([(200, PENDING, options["delay"])]) as stub, override_settings(
+                CHAPA_BASE_URL=stub.url, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+            ):
+                for mode, run in (("wsgi", self._run_wsgi), ("asgi", self._run_asgi)):
+                    row = self._measure(mode, run, payment.transaction_id, options)
+                    results["modes"].append(row)
+                    self.stdout.write(
+                        f"{mode}  {row['workers']:>4} in flight  {row['requests_per_s']:>8.1f} req/s"
+                        f"  p50 {row['p50_ms']:>8.1f} ms  p95 {row['p95_ms']:>8.1f} ms"
+                        f"  errors {row['errors']}"
+                    )
+        finally:
+            payment.delete()
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Results written to {options['json_path']}"))
+
+    def _measure(self, mode, run, transaction_id, options):
+        workers = options["threads"] if mode == "wsgi" else options["concurrency"]
+        start = time.perf_counter()
+        outcomes = run(transaction_id, options["requests"], workers)
+        elapsed = time.perf_counter() - start
+
+        timings = sorted(ms for ms, status in outcomes)
+        return {
+            "mode": mode,
+            "workers": workers,
+            "requests_per_s": round(len(outcomes) / elapsed, 1),
+            "p50_ms": round(statistics.median(timings), 1),
+            "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 1),
+            "errors": sum(1 for ms, status in outcomes if status != 200),
+        }
+
+    def _run_wsgi(self, transaction_id, total, workers):
+        path = f"/api/payments/verify/{transaction_id}/"
+
+        def call(_):
+            client = Client()
+            start = time.perf_counter()
+            try:
+                status = client.get(path, secure=True).status_code
+            finally:
+                connections.close_all()
+            return (time.perf_counter() - start) * 1000, status
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(call, range(total)))
+
+    def _run_asgi(self, transaction_id, total, concurrency):
+        path = f"/api/payments/async/verify/{transaction_id}/"
+
+        async def main():
+            client = AsyncClient()
+            slots = asyncio.Semaphore(concurrency)
+
+            async def call():
+                async with slots:
+                    start = time.perf_counter()
+                    response = await client.get(path, secure=True)
+                    return (time.perf_counter() - start) * 1000, response.status_code
+
+            try:
+                return await asyncio.gather(*(call() for _ in range(total)))
+            finally:
+                await get_async_gateway_client().aclose()
+
+        return asyncio.run(main())
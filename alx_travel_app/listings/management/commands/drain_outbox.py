@@ -0,0 +1,37 @@
+# listings/management/commands/drain_outbox.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from listings.mailer import drain_outbox, sent_per_minute
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued outbox emails in batches over one SMTP connection. "
+        "Use --loop to keep draining when Celery beat is not available."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Emails claimed per batch")
+        parser.add_argument("--loop", action="store_true", help="Keep draining until interrupted")
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=30.0,
+            help="Seconds to wait between drains with --loop (default: 30)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            totals = drain_outbox(batch_size=options["batch_size"])
+            throughput = ", ".join(f"{count}" for _, count in sent_per_minute(5))
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✅ Sent {totals['sent']}, failed {totals['failed']} "
+                    f"(sent/min, last 5 min: {throughput})"
+                )
+            )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
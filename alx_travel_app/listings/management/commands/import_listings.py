@@ -0,0 +1,62 @@
+# listings/management/commands/import_listings.py
+
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from listings.imports import ListingImporter, format_for, read_rows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update listings from a CSV or NDJSON file, upserting by slug. "
+        "Invalid rows are skipped and reported by line number."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or NDJSON file to import")
+        parser.add_argument("--host", required=True, help="Username that owns the imported listings")
+        parser.add_argument(
+            "--format", dest="file_format", choices=["csv", "ndjson"], help="Default: from the file extension"
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, help="Rows per batch (default: LISTING_IMPORT_CHUNK_SIZE)"
+        )
+        parser.add_argument("--errors", help="Write the full error report to this JSON file")
+
+    def handle(self, *args, **options):
+        try:
+            host = User.objects.get(username=options["host"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['host']!r}.")
+        file_format = options["file_format"] or format_for(options["path"])
+        if file_format is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+
+        importer = ListingImporter(
+            host,
+            chunk_size=options["chunk_size"],
+            max_errors=None if not options["errors"] else float("inf"),
+        )
+        started = time.perf_counter()
+        try:
+            with open(options["path"], "rb") as fh:
+                report = importer.run(read_rows(fh, file_format))
+        except OSError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Imported {report['rows']} rows in {elapsed:.1f} s "
+            f"({report['rows'] / elapsed if elapsed else report['rows']:,.0f} rows/s): "
+            f"{report['created']} created, {report['updated']} updated, {report['failed']} failed."
+        ))
+        for error in report["errors"][:10]:
+            self.stdout.write(self.style.WARNING(f"⚠️ Line {error['line']}: {json.dumps(error['errors'])}"))
+        if options["errors"]:
+            with open(options["errors"], "w") as fh:
+                json.dump(report["errors"], fh, indent=2)
+            self.stdout.write(f"Error report written to {options['errors']}")
@@ -0,0 +1,27 @@
+# listings/management/commands/rebuild_occupancy.py
+
+from django.core.management.base import BaseCommand
+from listings.occupancy import rebuild_occupancy
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-night ListingOccupancy table from active bookings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--listing",
+            type=int,
+            action="append",
+            dest="listings",
+            help="Only rebuild this listing id (may be repeated)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows read and inserted per batch (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_occupancy(options["listings"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {rows} occupancy rows."))
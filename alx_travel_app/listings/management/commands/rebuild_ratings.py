@@ -0,0 +1,34 @@
+# listings/management/commands/rebuild_ratings.py
+
+from django.core.management.base import BaseCommand
+from listings.models import Listing
+from listings.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored review aggregates (count, sum, average) on every Listing."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of listings updated per statement (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        ids = Listing.objects.order_by("pk").values_list("pk", flat=True)
+
+        total = 0
+        last_pk = 0
+        while True:
+            chunk = list(ids.filter(pk__gt=last_pk)[:batch_size])
+            if not chunk:
+                break
+            total += rebuild_rating_aggregates(
+                Listing.objects.filter(pk__gte=chunk[0], pk__lte=chunk[-1])
+            )
+            last_pk = chunk[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt rating aggregates for {total} listings."))
@@ -0,0 +1,19 @@
+# listings/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand
+from listings.models import Listing
+from listings.search import get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the listing full-text search index from the listing table, "
+        "e.g. after listings were written with raw SQL."
+    )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Search index rebuilt for {Listing.objects.count()} listings ({type(backend).__name__})."
+        ))
@@ -0,0 +1,40 @@
+# listings/management/commands/reconcile_payments.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from listings.payments import reconcile_pending_payments
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify stale PENDING payments with Chapa in batches and settle the ones it "
+        "has decided. Use --loop to keep reconciling when Celery beat is not available."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Payments claimed per batch")
+        parser.add_argument("--concurrency", type=int, help="Gateway calls in flight at once")
+        parser.add_argument("--loop", action="store_true", help="Keep reconciling until interrupted")
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=300.0,
+            help="Seconds to wait between runs with --loop (default: 300)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            totals = reconcile_pending_payments(
+                batch_size=options["batch_size"], concurrency=options["concurrency"]
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✅ Checked {totals['checked']}: {totals['completed']} completed, "
+                    f"{totals['failed']} failed, {totals['pending']} still pending, "
+                    f"{totals['errors']} errors"
+                )
+            )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
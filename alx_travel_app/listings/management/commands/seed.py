@@ -1,100 +1,147 @@
 # listings/management/commands/seed.py
 
-from django.core.management.base import BaseCommand
-from listings.models import Listing, Booking, Review, Payment
-from django.contrib.auth import get_user_model
-from faker import Faker
-from django.utils.text import slugify
-from datetime import timedelta, date
-from decimal import Decimal
 import random
+import time
 import uuid
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from listings.models import Listing, Booking, Review, Payment
+from listings import seeding
+from django.contrib.auth import get_user_model
 
 User = get_user_model()
-fake = Faker()
 
 
 class Command(BaseCommand):
-    help = "Seed the database with sample data (Listings, Bookings, Reviews, Payments)"
+    help = (
+        "Seed the database with sample data (Listings, Bookings, Reviews, Payments). "
+        "Rows are generated in memory and bulk inserted, so large counts are practical; "
+        "--workers spreads the generation over several processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=0, help="New users to create first (default: 0)"
+        )
+        parser.add_argument(
+            "--listings", type=int, default=10, help="Listings to create (default: 10)"
+        )
+        parser.add_argument(
+            "--bookings",
+            type=int,
+            help="Bookings to create, each with a payment (default: one per listing)",
+        )
+        parser.add_argument(
+            "--reviews", type=int, help="Reviews to create (default: one per listing)"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Rows per bulk insert (default: 1000)"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=f"Processes generating shards of {seeding.SHARD_SIZE} rows in parallel (default: 1)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            help=(
+                "Random seed; the same seed and --anchor-date reproduce the same rows "
+                "with any --workers"
+            ),
+        )
+        parser.add_argument(
+            "--anchor-date",
+            type=date.fromisoformat,
+            help=(
+                "Day (YYYY-MM-DD) that availability, check-in and payment dates are "
+                "counted from (default: today)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        self.workers = options["workers"]
+        if batch_size < 1 or self.workers < 1:
+            raise CommandError("--batch-size and --workers must be at least 1.")
+        bookings_count = options["bookings"]
+        reviews_count = options["reviews"]
+        if bookings_count is None:
+            bookings_count = options["listings"]
+        if reviews_count is None:
+            reviews_count = options["listings"]
+
+        seed = options["seed"]
+        if seed is None:
+            seed = random.randrange(2**32)
+            self.stdout.write(f"ℹ️ Seed {seed} (pass --seed {seed} to reproduce this data)")
+        anchor = options["anchor_date"]
+        if anchor is None:
+            anchor = date.today()
+            self.stdout.write(f"ℹ️ Dates from {anchor} (pass --anchor-date {anchor} to reproduce them)")
+        run_id = uuid.uuid4().hex
+
+        # --- Seed Users ---
+        if options["users"]:
+            shards = seeding.plan_user_shards(
+                run_id, seed, seeding.next_id(User), options["users"], seeding.seeded_password(seed)
+            )
+            totals = self._run(seeding.run_user_shard, shards, batch_size)
+            self.stdout.write(self.style.SUCCESS(f"✅ Successfully seeded {totals['users']} users."))
 
-    def handle(self, *args, **kwargs):
         if not User.objects.exists():
             self.stdout.write(self.style.ERROR(
                 "❌ No users found. Create a user first to act as host and customer."
             ))
             return
 
-        host = User.objects.first()
-        users = list(User.objects.all())
-
-        listing_types = ["hotel", "tour", "rental", "activity"]
-        listings = []
-
-        # --- Seed Listings ---
-        for _ in range(10):  # create 10 sample listings
-            title = fake.sentence(nb_words=4)
-            slug = slugify(title)
-
-            # Ensure slug uniqueness
-            original_slug = slug
-            counter = 1
-            while Listing.objects.filter(slug=slug).exists():
-                slug = f"{original_slug}-{counter}"
-                counter += 1
-
-            listing = Listing.objects.create(
-                title=title,
-                slug=slug,
-                description=fake.paragraph(nb_sentences=5),
-                host=host,
-                location=fake.city(),
-                listing_type=random.choice(listing_types),
-                price=Decimal(random.randint(50, 500)),
-                capacity=random.randint(1, 10),
-                available_from=date.today(),
-                available_to=date.today() + timedelta(days=random.randint(30, 90)),
-            )
-            listings.append(listing)
-
-        self.stdout.write(self.style.SUCCESS("✅ Successfully seeded 10 listings."))
-
-        # --- Seed Bookings ---
-        for listing in listings:
-            customer = random.choice(users)
-            check_in = date.today() + timedelta(days=random.randint(1, 20))
-            check_out = check_in + timedelta(days=random.randint(1, 7))
-
-            booking = Booking.objects.create(
-                listing=listing,
-                user=customer,
-                user_email=customer.email or fake.email(),
-                check_in=check_in,
-                check_out=check_out,
-                guests=random.randint(1, listing.capacity),
-                price=listing.price * Decimal(random.randint(1, 3)),  # total price
-                status=random.choice([c[0] for c in Booking.STATUS_CHOICES]),
-            )
+        existing = []
+        if not options["listings"]:
+            # Add bookings and reviews to the listings already there.
+            existing = list(Listing.objects.order_by("pk").values_list("pk", "price", "capacity"))
+            if not existing:
+                self.stdout.write(self.style.ERROR("❌ No listings found to book or review."))
+                return
+
+        # --- Seed Listings, Bookings, Payments and Reviews ---
+        # Ids are handed out per shard up front, so foreign keys between
+        # rows written by different workers are valid.
+        shards = seeding.plan_listing_shards(
+            run_id,
+            seed,
+            {model: seeding.next_id(model) for model in (Listing, Booking, Payment, Review)},
+            options["listings"],
+            bookings_count,
+            reviews_count,
+            existing,
+            users_below=seeding.next_id(User),
+            anchor=anchor,
+        )
+        totals = self._run(seeding.run_listing_shard, shards, batch_size)
+        seeding.reset_sequences(User, Listing, Booking, Payment, Review)
+
+        if totals["listings"]:
+            self.stdout.write(self.style.SUCCESS(f"✅ Successfully seeded {totals['listings']} listings."))
+        if totals["bookings"]:
+            self.stdout.write(self.style.SUCCESS("✅ Successfully seeded Bookings and Payments."))
+        if totals["reviews"]:
+            self.stdout.write(self.style.SUCCESS("✅ Successfully seeded Reviews."))
+        self.stdout.write(self.style.SUCCESS("🎉 Database seeding complete!"))
 
-            # --- Seed Payment ---
-            Payment.objects.create(
-                booking=booking,
-                status=random.choice([c[0] for c in Payment.PAYMENT_STATUS_CHOICES]),
-                amount=booking.price,
-                transaction_id=str(uuid.uuid4()),
+    def _run(self, func, shards, batch_size):
+        """Run shards on --workers processes, reporting rows/s as each one finishes."""
+        totals = Counter()
+        started = time.perf_counter()
+        for done, counts in enumerate(seeding.run_shards(func, shards, batch_size, self.workers), 1):
+            totals.update(counts)
+            elapsed = time.perf_counter() - started
+            rows = sum(totals.values())
+            self.stdout.write(
+                f"  shard {done}/{len(shards)}: "
+                + ", ".join(f"{count:,} {table}" for table, count in totals.items())
+                + f" in {elapsed:.1f} s ({rows / elapsed if elapsed else rows:,.0f} rows/s)"
             )
-
-        self.stdout.write(self.style.SUCCESS("✅ Successfully seeded Bookings and Payments."))
-
-        # --- Seed Reviews ---
-        for listing in listings:
-            reviewer = random.choice(users)
-            if not Review.objects.filter(listing=listing, user=reviewer).exists():
-                Review.objects.create(
-                    listing=listing,
-                    user=reviewer,
-                    rating=random.randint(1, 5),
-                    comment=fake.paragraph(nb_sentences=3),
-                )
-
-        self.stdout.write(self.style.SUCCESS("✅ Successfully seeded Reviews."))
-        self.stdout.write(self.style.SUCCESS("🎉 Database seeding complete!"))
+        return totals
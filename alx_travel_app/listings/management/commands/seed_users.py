@@ -1,10 +1,9 @@
 # listings/management/commands/seed_users.py
 
 from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
 from faker import Faker
+from listings.seeding import DEFAULT_PASSWORD, create_users, rate_reporter
 
-User = get_user_model()
 fake = Faker()
 
 
@@ -18,30 +17,27 @@ class Command(BaseCommand):
             default=5,
             help="Number of users to create (default: 5)",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Users per bulk insert (default: 1000)",
+        )
 
     def handle(self, *args, **options):
-        count = options["count"]
-        created_users = []
-
-        for _ in range(count):
-            username = fake.user_name()
-            email = fake.email()
-            password = "password123"  # simple default password
-
-            if not User.objects.filter(username=username).exists():
-                user = User.objects.create_user(
-                    username=username,
-                    email=email,
-                    password=password,
-                )
-                created_users.append(user)
+        created = create_users(
+            fake,
+            options["count"],
+            options["batch_size"],
+            progress=rate_reporter(self.stdout.write, "users"),
+        )
 
-        if created_users:
+        if created:
             self.stdout.write(
-                self.style.SUCCESS(f"✅ Created {len(created_users)} fake users.")
+                self.style.SUCCESS(f"✅ Created {created} fake users.")
             )
             self.stdout.write(
-                self.style.WARNING("ℹ️ All users have default password: password123")
+                self.style.WARNING(f"ℹ️ All users have default password: {DEFAULT_PASSWORD}")
             )
         else:
             self.stdout.write(self.style.WARNING("⚠️ No new users were created."))
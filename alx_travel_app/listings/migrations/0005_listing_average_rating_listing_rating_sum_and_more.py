@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:28
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    Review = apps.get_model('listings', 'Review')
+
+    reviews = Review.objects.filter(listing=OuterRef('pk')).values('listing')
+    Listing.objects.update(
+        reviews_count=Coalesce(Subquery(reviews.annotate(total=Count('pk')).values('total')), 0),
+        rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+    )
+    Listing.objects.update(
+        average_rating=Case(
+            When(reviews_count=0, then=Value(None, output_field=FloatField())),
+            default=Cast(F('rating_sum'), FloatField()) / F('reviews_count'),
+            output_field=FloatField(),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_remove_payment_booking_reference_booking_user_email_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='average_rating',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='reviews_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
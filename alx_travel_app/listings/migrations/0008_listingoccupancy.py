@@ -0,0 +1,51 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:31
+
+import django.db.models.deletion
+from collections import Counter
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_occupancy(apps, schema_editor):
+    Booking = apps.get_model('listings', 'Booking')
+    ListingOccupancy = apps.get_model('listings', 'ListingOccupancy')
+
+    per_night = Counter()
+    stays = Booking.objects.filter(status__in=['pending', 'confirmed', 'completed']).values_list(
+        'listing_id', 'check_in', 'check_out', 'guests'
+    )
+    for listing_id, check_in, check_out, guests in stays.iterator(chunk_size=1000):
+        for n in range((check_out - check_in).days):
+            per_night[(listing_id, check_in + timedelta(days=n))] += guests
+
+    ListingOccupancy.objects.bulk_create(
+        (
+            ListingOccupancy(listing_id=listing_id, date=night, booked_guests=guests)
+            for (listing_id, night), guests in per_night.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_booking_booking_listing_dates_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booked_guests', models.PositiveIntegerField(default=0)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='listings.listing')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('listing', 'date'), name='unique_listing_occupancy_date')],
+            },
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
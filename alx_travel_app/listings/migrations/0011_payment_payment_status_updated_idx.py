@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'updated_at'], name='payment_status_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Full-text index over listing titles, descriptions and locations; see listings.search.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+COLUMNS = 'title, description, location'
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(
+            f'CREATE FULLTEXT INDEX listing_fulltext_idx ON listings_listing ({COLUMNS})'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE listings_listing_fts USING fts5({COLUMNS}, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO listings_listing_fts (rowid, {COLUMNS}) SELECT id, {COLUMNS} FROM listings_listing'
+        )
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute('DROP INDEX listing_fulltext_idx ON listings_listing')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE listings_listing_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_payment_checkout_url_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+        migrations.CreateModel(
+            name='ListingSearchEntry',
+            fields=[
+                ('listing', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='listings.listing')),
+                ('title', models.TextField()),
+                ('description', models.TextField()),
+                ('location', models.TextField()),
+            ],
+            options={
+                'db_table': 'listings_listing_fts',
+                'managed': False,
+            },
+        ),
+    ]
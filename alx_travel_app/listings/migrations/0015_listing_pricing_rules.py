@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0014_listing_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='pricing_rules',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
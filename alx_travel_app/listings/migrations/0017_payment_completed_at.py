@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:00
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_completed_at(apps, schema_editor):
+    # Best available guess for payments completed before the field existed.
+    Payment = apps.get_model('listings', 'Payment')
+    Payment.objects.filter(status='COMPLETED').update(completed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0016_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
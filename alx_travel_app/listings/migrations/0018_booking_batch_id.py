@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0017_payment_completed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='batch_id',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
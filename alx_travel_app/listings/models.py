@@ -2,6 +2,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from datetime import date
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -25,6 +26,33 @@ class Listing(models.Model):
     available_to = models.DateField(default=date.today)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Denormalized review aggregates, maintained by listings.signals
+    reviews_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.FloatField(null=True, blank=True, editable=False)
+
+    # Coordinates, and their geohash for proximity search (listings.geo)
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    geohash = models.CharField(max_length=12, blank=True, default="", editable=False)
+
+    # Adjustments to `price` for quotes and bookings (listings.pricing)
+    pricing_rules = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["listing_type", "price"], name="listing_type_price_idx"),
+            models.Index(fields=["location", "price"], name="listing_location_price_idx"),
+            models.Index(fields=["available_from", "available_to"], name="listing_availability_idx"),
+            models.Index(fields=["price", "capacity"], name="listing_price_capacity_idx"),
+            models.Index(fields=["-created_at", "-id"], name="listing_created_idx"),
+            models.Index(fields=["geohash"], name="listing_geohash_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -45,11 +73,55 @@ class Booking(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Watermark column for the analytics rollups (listings.analytics)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Tags the rows of one bulk insert on backends that return no ids (MySQL)
+    batch_id = models.UUIDField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["listing", "check_in", "check_out", "status"],
+                name="booking_listing_dates_idx",
+            ),
+            models.Index(fields=["-created_at", "-id"], name="booking_created_idx"),
+            models.Index(fields=["updated_at"], name="booking_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} booked {self.listing} from {self.check_in} to {self.check_out}"
 
 
+class ListingSearchEntry(models.Model):
+    """Row of the SQLite FTS5 search table (see listings.search); unused on MySQL."""
+    listing = models.OneToOneField(
+        Listing, primary_key=True, db_column='rowid', db_constraint=False,
+        on_delete=models.DO_NOTHING, related_name='+',
+    )
+    title = models.TextField()
+    description = models.TextField()
+    location = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'listings_listing_fts'
+
+
+class ListingOccupancy(models.Model):
+    """Guests booked on a listing for one night, derived from active bookings."""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='occupancy')
+    date = models.DateField()
+    booked_guests = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'date'], name='unique_listing_occupancy_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing} on {self.date}: {self.booked_guests} guests"
+
+
 class Review(models.Model):
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews')
@@ -62,9 +134,14 @@ class Review(models.Model):
     )
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Watermark column for the analytics rollups (listings.analytics)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['listing', 'user']
+        indexes = [
+            models.Index(fields=["updated_at"], name="review_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} rated {self.listing} {self.rating}/5"
@@ -86,8 +163,150 @@ class Payment(models.Model):
     status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='PENDING')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     transaction_id = models.CharField(max_length=100, unique=True)
+    # Chapa checkout page, reused while the payment is PENDING
+    checkout_url = models.URLField(max_length=500, blank=True, default="")
+    # Set on the move to COMPLETED; the analytics rollups book revenue on this day
+    completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Stale PENDING payments picked up by listings.payments.reconcile_pending_payments
+            models.Index(fields=["status", "updated_at"], name="payment_status_updated_idx"),
+            # Changed payments picked up by the analytics rollups
+            models.Index(fields=["updated_at"], name="payment_updated_idx"),
+        ]
+
     def __str__(self):
         return f"{self.booking} - {self.status}" 
+
+
+
+class OutboundEmail(models.Model):
+    """An email waiting in the outbox for the batched mailer (listings.mailer)."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response stored under a client-supplied Idempotency-Key header.
+
+    A retried request with the same key replays the stored response instead
+    of running again. Rows expire after IDEMPOTENCY_KEY_TTL seconds and are
+    purged by listings.idempotency.purge_expired_keys.
+    """
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    fingerprint = models.CharField(max_length=64)  # sha256 of method, path and body
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # None while in progress
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_user_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code or 'in progress'})"
+
+
+class DailyStats(models.Model):
+    """
+    Activity of one day, pre-aggregated for host analytics (listings.analytics).
+
+    Bookings are counted on the day they were made, by their current status;
+    payments on the day they completed; reviews on the day they were posted.
+    booked_guests is the guests staying that night.
+    """
+    date = models.DateField()
+    bookings_pending = models.PositiveIntegerField(default=0)
+    bookings_confirmed = models.PositiveIntegerField(default=0)
+    bookings_cancelled = models.PositiveIntegerField(default=0)
+    bookings_completed = models.PositiveIntegerField(default=0)
+    booked_guests = models.PositiveIntegerField(default=0)
+    payments_completed = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    reviews_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ListingDailyStats(DailyStats):
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'date'], name='unique_listing_daily_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing} on {self.date}"
+
+
+class HostDailyStats(DailyStats):
+    host = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+    # Listings with guests staying that night
+    occupied_listings = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['host', 'date'], name='unique_host_daily_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.host} on {self.date}"
+
+
+class RollupInvalidation(models.Model):
+    """
+    A listing whose rollups must be recomputed because a booking, payment or
+    review of it (or the listing itself) was deleted, or because it moved to
+    another host; neither leaves an updated_at behind for the watermark to
+    find.
+    """
+    listing_id = models.IntegerField()
+    # Host whose rows must also be recomputed: of a deleted listing, or the
+    # previous host of a moved one
+    host_id = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class AnalyticsWatermark(models.Model):
+    """Up to when the analytics rollups have processed changed rows."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
@@ -0,0 +1,142 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+
+from .availability import BLOCKING_STATUSES
+from .models import Booking, Listing, ListingOccupancy
+
+
+def stay_nights(check_in, check_out):
+    """Every night of a stay; check_out itself is not occupied."""
+    return [check_in + timedelta(days=n) for n in range((check_out - check_in).days)]
+
+
+def apply_occupancy_delta(listing_id, check_in, check_out, guests_delta):
+    """Add `guests_delta` to each night of a stay in the occupancy table."""
+    nights = stay_nights(check_in, check_out)
+    if not nights or not guests_delta:
+        return
+    with transaction.atomic():
+        # Make sure every night has a row, then shift them all in one UPDATE
+        # so concurrent changes to overlapping stays never lose an increment.
+        if guests_delta > 0:
+            ListingOccupancy.objects.bulk_create(
+                [ListingOccupancy(listing_id=listing_id, date=night) for night in nights],
+                ignore_conflicts=True,
+            )
+        ListingOccupancy.objects.filter(
+            listing_id=listing_id, date__gte=nights[0], date__lte=nights[-1]
+        ).update(booked_guests=F("booked_guests") + guests_delta)
+
+
+def booking_contribution(listing_id, check_in, check_out, guests, status):
+    """The (listing, stay, guests) a booking adds to occupancy, if any."""
+    if status not in BLOCKING_STATUSES or not listing_id or not guests:
+        return None
+    return (listing_id, check_in, check_out, guests)
+
+
+def apply_booking_change(previous, current):
+    """Move occupancy from a booking's previous contribution to its current one."""
+    if previous == current:
+        return
+    if previous:
+        listing_id, check_in, check_out, guests = previous
+        apply_occupancy_delta(listing_id, check_in, check_out, -guests)
+    if current:
+        listing_id, check_in, check_out, guests = current
+        apply_occupancy_delta(listing_id, check_in, check_out, guests)
+
+
+def apply_bookings(bookings):
+    """Add the occupancy of freshly inserted bookings in a few set-based queries."""
+    per_night = Counter()
+    for booking in bookings:
+        if booking_contribution(
+            booking.listing_id, booking.check_in, booking.check_out, booking.guests, booking.status
+        ):
+            for night in stay_nights(booking.check_in, booking.check_out):
+                per_night[(booking.listing_id, night)] += booking.guests
+    if not per_night:
+        return
+
+    # Nights sharing a listing and increment are shifted by a single UPDATE.
+    groups = defaultdict(list)
+    for (listing_id, night), guests in per_night.items():
+        groups[(listing_id, guests)].append(night)
+
+    with transaction.atomic():
+        ListingOccupancy.objects.bulk_create(
+            [ListingOccupancy(listing_id=l_id, date=night) for l_id, night in per_night],
+            ignore_conflicts=True,
+        )
+        for (listing_id, guests), nights in groups.items():
+            ListingOccupancy.objects.filter(listing_id=listing_id, date__in=nights).update(
+                booked_guests=F("booked_guests") + guests
+            )
+
+
+def rebuild_occupancy(listing_ids=None, batch_size=1000):
+    """Recompute the occupancy table from the Booking table."""
+    bookings = Booking.objects.filter(status__in=BLOCKING_STATUSES)
+    listings = Listing.objects.all()
+    if listing_ids is not None:
+        bookings = bookings.filter(listing_id__in=listing_ids)
+        listings = listings.filter(pk__in=listing_ids)
+
+    per_night = Counter()
+    for listing_id, check_in, check_out, guests in bookings.values_list(
+        "listing_id", "check_in", "check_out", "guests"
+    ).iterator(chunk_size=batch_size):
+        for night in stay_nights(check_in, check_out):
+            per_night[(listing_id, night)] += guests
+
+    with transaction.atomic():
+        ListingOccupancy.objects.filter(listing__in=listings).delete()
+        ListingOccupancy.objects.bulk_create(
+            (
+                ListingOccupancy(listing_id=listing_id, date=night, booked_guests=guests)
+                for (listing_id, night), guests in per_night.items()
+            ),
+            batch_size=batch_size,
+        )
+    return len(per_night)
+
+
+def listing_calendars(listings, start, end):
+    """
+    Per-night booked and remaining capacity for many listings at once.
+
+    Reads the whole range for every listing with a single occupancy query.
+    Nights outside a listing's availability window have no capacity.
+    """
+    nights = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    booked = {
+        (listing_id, night): guests
+        for listing_id, night, guests in ListingOccupancy.objects.filter(
+            listing__in=[listing.pk for listing in listings],
+            date__gte=start,
+            date__lte=end,
+        ).values_list("listing_id", "date", "booked_guests")
+    }
+
+    calendars = []
+    for listing in listings:
+        booked_guests = [booked.get((listing.pk, night), 0) for night in nights]
+        remaining = [
+            max(listing.capacity - guests, 0)
+            if listing.available_from <= night < listing.available_to
+            else 0
+            for night, guests in zip(nights, booked_guests)
+        ]
+        calendars.append(
+            {
+                "listing_id": listing.pk,
+                "capacity": listing.capacity,
+                "booked_guests": booked_guests,
+                "remaining": remaining,
+            }
+        )
+    return calendars
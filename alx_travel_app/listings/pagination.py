@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class LegacyPageNumberPagination(PageNumberPagination):
+    """The original ?page=N pagination, kept for existing clients."""
+    page_size_query_param = "page_size"
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class SearchPagination(LegacyPageNumberPagination):
+    """Page numbers for relevance-ranked search results; a float rank makes a poor cursor."""
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination ordered by (created_at, id).
+
+    Each page is a range scan that starts where the previous one ended, so
+    deep pages cost the same as the first one and no COUNT(*) is issued.
+    Requests carrying ?page=N keep the old page-number behaviour, as do
+    orderings led by a nullable column, which cannot be used as a cursor.
+    """
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    legacy_class = LegacyPageNumberPagination
+
+    def __init__(self):
+        self.legacy = None
+
+    def _needs_legacy(self, queryset, request, view):
+        if self.legacy_class.page_query_param in request.query_params:
+            return True
+        leading = self.get_ordering(request, queryset, view)[0].lstrip("-")
+        try:
+            return queryset.model._meta.get_field(leading).null
+        except FieldDoesNotExist:
+            return False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self._needs_legacy(queryset, request, view):
+            self.legacy = self.legacy_class()
+            if not queryset.ordered:
+                queryset = queryset.order_by(*self.ordering)
+            page = self.legacy.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.legacy.display_page_controls
+            return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.legacy is not None:
+            return self.legacy.to_html()
+        return super().to_html()
@@ -0,0 +1,303 @@
+import hashlib
+import hmac
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .gateway import GATEWAY_ERRORS, get_gateway_client
+from .models import Payment
+from .tasks import send_payment_confirmation_email
+from .utils import run_task
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------
+# Chapa Payment Helpers
+# ----------------------------
+# Chapa transaction status (verify responses and webhooks) -> Payment.status
+PAYMENT_STATUS_MAP = {
+    "successful": "COMPLETED",
+    "success": "COMPLETED",
+    "failed": "FAILED",
+}
+
+# Statuses Chapa can no longer change; verify serves them without a gateway call.
+TERMINAL_STATUSES = ("COMPLETED", "FAILED", "REFUNDED")
+
+# Our reference for a checkout (tx_ref), echoed back in webhooks: this + booking id.
+TX_REF_PREFIX = "booking-"
+
+
+def chapa_initiate_payload(booking):
+    """Body of the Chapa payment initiation request for a booking."""
+    return {
+        "amount": str(booking.price),
+        "currency": "ETB",
+        "email": booking.user.email,
+        "first_name": booking.user.first_name,
+        "last_name": booking.user.last_name,
+        "tx_ref": f"{TX_REF_PREFIX}{booking.id}",
+        "callback_url": f"{settings.FRONTEND_URL}/payment/callback/",
+    }
+
+
+def chapa_initiate_payment(booking):
+    """Prepare and send payment initiation request to Chapa."""
+    response = get_gateway_client().post(
+        "transaction/initialize", json=chapa_initiate_payload(booking)
+    )
+    return response.json(), response.status_code
+
+
+def chapa_verify_payment(transaction_id):
+    """Verify payment status with Chapa."""
+    response = get_gateway_client().get(f"transaction/verify/{transaction_id}")
+    return response.json(), response.status_code
+
+
+# ----------------------------
+# Status Transitions
+# ----------------------------
+def settle_payment(payment, status):
+    """
+    Move a PENDING payment to `status` exactly once.
+
+    The transition is a conditional UPDATE, so duplicate webhooks,
+    reconciliation runs and verify calls racing each other cannot apply it
+    (or send the confirmation email) twice. Returns True if this call made
+    the change.
+    """
+    if status == "PENDING":
+        return False
+    now = timezone.now()
+    completed_at = now if status == "COMPLETED" else None
+    changed = Payment.objects.filter(pk=payment.pk, status="PENDING").update(
+        status=status, completed_at=completed_at, updated_at=now
+    )
+    if not changed:
+        # Settled elsewhere first; report what it was settled to.
+        payment.refresh_from_db(fields=["status", "completed_at"])
+        return False
+
+    payment.status = status
+    payment.completed_at = completed_at
+    if status == "COMPLETED" and payment.booking and payment.booking.user.email:
+        run_task(
+            send_payment_confirmation_email,
+            payment.booking.user.email,
+            payment.booking.id,
+        )
+    return True
+
+
+# ----------------------------
+# Verification Cache
+# ----------------------------
+def status_cache_key(transaction_id):
+    return f"payment:status:{transaction_id}"
+
+
+def remember_status(payment):
+    """Cache a terminal status so repeated verify calls skip the DB and gateway."""
+    if payment.status in TERMINAL_STATUSES:
+        cache.set(
+            status_cache_key(payment.transaction_id),
+            payment.status,
+            settings.PAYMENT_STATUS_CACHE_TIMEOUT,
+        )
+
+
+def forget_status(transaction_id):
+    cache.delete(status_cache_key(transaction_id))
+
+
+# ----------------------------
+# Idempotent Initiation
+# ----------------------------
+def reuse_checkout(booking_id):
+    """
+    Answer an initiate call from the booking's existing payment, if any.
+
+    Returns (data, status_code), or None when a new checkout is needed.
+    """
+    payments = Payment.objects.filter(booking_id=booking_id)
+    paid = payments.filter(status="COMPLETED").first()
+    if paid is not None:
+        return {"error": "Booking is already paid.", "payment_id": paid.id}, 409
+    pending = payments.filter(status="PENDING").exclude(checkout_url="").order_by("-created_at").first()
+    if pending is not None:
+        return {
+            "message": "Payment already initiated.",
+            "payment_id": pending.id,
+            "payment_link": pending.checkout_url,
+        }, 200
+    return None
+
+
+def record_checkout(booking, response_data):
+    """Store the PENDING payment for a successful Chapa initiation."""
+    payment = Payment.objects.create(
+        transaction_id=response_data["data"]["id"],
+        amount=booking.price,
+        status="PENDING",
+        booking=booking,
+        checkout_url=response_data["data"]["checkout_url"],
+    )
+    return {
+        "message": "Payment initiated successfully.",
+        "payment_id": payment.id,
+        "payment_link": payment.checkout_url,
+    }, 200
+
+
+def _initiation_lock_key(booking_id):
+    return f"payment:initiate:{booking_id}"
+
+
+def lock_initiation(booking_id):
+    """
+    Let one initiate call per booking reach the gateway at a time.
+
+    Returns False if another call holds the lock. The lock lives in the
+    cache, so it spans processes when CACHE_URL points at a shared cache.
+    """
+    timeout = settings.CHAPA_CONNECT_TIMEOUT + settings.CHAPA_READ_TIMEOUT
+    return cache.add(_initiation_lock_key(booking_id), 1, timeout=int(timeout) + 1)
+
+
+def unlock_initiation(booking_id):
+    cache.delete(_initiation_lock_key(booking_id))
+
+
+# ----------------------------
+# Webhook
+# ----------------------------
+def webhook_signature(body):
+    """Hex HMAC-SHA256 of a raw webhook body under CHAPA_WEBHOOK_SECRET."""
+    return hmac.new(settings.CHAPA_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_webhook_signature(body, signature):
+    if not settings.CHAPA_WEBHOOK_SECRET or not signature:
+        return False
+    return hmac.compare_digest(webhook_signature(body), signature)
+
+
+def _booking_id(tx_ref):
+    """Booking id of a tx_ref sent by chapa_initiate_payload, or None."""
+    tx_ref = str(tx_ref or "")
+    booking_id = tx_ref[len(TX_REF_PREFIX):]
+    return int(booking_id) if tx_ref.startswith(TX_REF_PREFIX) and booking_id.isdigit() else None
+
+
+def apply_webhook_event(event):
+    """
+    Apply a Chapa webhook event to its payment.
+
+    The payment is found by the event's `reference` (Chapa's transaction
+    id, stored as transaction_id), or else as the latest payment of the
+    booking named by `tx_ref`. Returns the payment (None if the event
+    matches no payment) and whether its status changed.
+    """
+    payments = Payment.objects.select_related("booking__user")
+    payment = None
+    if event.get("reference"):
+        payment = payments.filter(transaction_id=event["reference"]).first()
+    booking_id = _booking_id(event.get("tx_ref"))
+    if payment is None and booking_id is not None:
+        # While a payment is pending no new one is opened (reuse_checkout),
+        # so the latest is the checkout this event is about.
+        payment = payments.filter(booking_id=booking_id).order_by("-created_at", "-pk").first()
+    if payment is None:
+        return None, False
+
+    status = PAYMENT_STATUS_MAP.get(str(event.get("status", "")).lower(), "PENDING")
+    return payment, settle_payment(payment, status)
+
+
+# ----------------------------
+# Reconciliation
+# ----------------------------
+def _claim_stale(batch_size, stale_after):
+    """
+    Lease the oldest PENDING payments not touched for `stale_after`.
+
+    Bumping updated_at moves them to the back of the queue, so a payment
+    the gateway still reports as pending is not re-checked on every run
+    and concurrent runs never pick the same rows.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Payment.objects.select_for_update(skip_locked=True)
+            .filter(status="PENDING", updated_at__lt=now - stale_after)
+            .order_by("updated_at", "pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if ids:
+            Payment.objects.filter(pk__in=ids).update(updated_at=now)
+    return list(Payment.objects.filter(pk__in=ids).select_related("booking__user"))
+
+
+def _gateway_status(transaction_id):
+    try:
+        data, status_code = chapa_verify_payment(transaction_id)
+    except GATEWAY_ERRORS as exc:
+        logger.warning("Reconciling payment %s failed: %s", transaction_id, exc)
+        return None
+    if status_code != 200 or data.get("status") != "success":
+        return "PENDING"
+    try:
+        return PAYMENT_STATUS_MAP.get(data["data"]["status"].lower(), "PENDING")
+    except (KeyError, TypeError, AttributeError):
+        # A malformed body for one payment must not abort the whole run.
+        logger.warning("Reconciling payment %s got a malformed response: %r", transaction_id, data)
+        return None
+
+
+def reconcile_pending_payments(batch_size=None, concurrency=None, stale_after=None, max_batches=None):
+    """
+    Verify stale PENDING payments with Chapa and settle the ones it has decided.
+
+    Each batch is verified with at most `concurrency` gateway calls in
+    flight. Returns a dict counting checked, completed, failed, still
+    pending and errored payments.
+    """
+    batch_size = batch_size or settings.PAYMENT_RECONCILE_BATCH_SIZE
+    concurrency = concurrency or settings.PAYMENT_RECONCILE_CONCURRENCY
+    stale_after = stale_after or timedelta(seconds=settings.PAYMENT_RECONCILE_STALE_SECONDS)
+
+    totals = {"checked": 0, "completed": 0, "failed": 0, "pending": 0, "errors": 0}
+    batches = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while max_batches is None or batches < max_batches:
+            payments = _claim_stale(batch_size, stale_after)
+            if not payments:
+                break
+            # Only the gateway calls run on the pool; DB writes stay here.
+            statuses = pool.map(_gateway_status, [payment.transaction_id for payment in payments])
+            for payment, status in zip(payments, statuses):
+                totals["checked"] += 1
+                if status is None:
+                    totals["errors"] += 1
+                    continue
+                if status == "PENDING":
+                    totals["pending"] += 1
+                elif settle_payment(payment, status):
+                    # Payments a webhook settled first are checked, not counted again.
+                    totals[status.lower()] += 1
+            batches += 1
+
+    if totals["checked"]:
+        logger.info(
+            "Reconciled %(checked)d payments: %(completed)d completed, %(failed)d failed, "
+            "%(pending)d pending, %(errors)d errors",
+            totals,
+        )
+    return totals
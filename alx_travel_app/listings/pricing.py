@@ -0,0 +1,131 @@
+"""
+Booking quotes from per-listing pricing rules.
+
+A listing's `price` is its base nightly rate; `pricing_rules` (validated by
+PricingRulesSerializer) may adjust it:
+
+- weekend_multiplier: applied to Friday and Saturday nights;
+- seasons: [{start, end, multiplier}], applied to the nights between the
+  two dates (inclusive); where seasons overlap, the later-starting one wins;
+- stay_discounts: [{min_nights, percent}], the best one the stay qualifies
+  for comes off the nightly total;
+- included_guests / extra_guest_fee: every guest above included_guests adds
+  extra_guest_fee per night, after any discount.
+
+Each night's rate is rounded to the cent, so a quote is the sum of what a
+nightly breakdown would show. quote_stays() prices many stays at once: the
+nights of every stay are laid out in one NumPy array, so the work per night
+is array arithmetic rather than Python; only the rules are looped over.
+"""
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+
+# Longest stay a quote request may ask for.
+MAX_NIGHTS = 365
+# Nights that count as the weekend (Monday is 0): Friday and Saturday.
+WEEKEND_NIGHTS = (4, 5)
+# datetime64 day numbers count from 1970-01-01, a Thursday.
+_EPOCH_WEEKDAY = date(1970, 1, 1).weekday()
+
+
+@dataclass(frozen=True)
+class Quote:
+    """Price of a stay at a listing; amounts are Decimals in the listing's currency."""
+    listing_id: int
+    check_in: date
+    check_out: date
+    guests: int
+    nights: int
+    nightly_total: Decimal
+    discount: Decimal
+    guest_fees: Decimal
+    total: Decimal
+
+
+def _cents(amount):
+    return int(round(Decimal(amount) * 100))
+
+
+def _money(cents):
+    return (Decimal(int(cents)) / 100).quantize(Decimal("0.01"))
+
+
+def quote_stays(stays):
+    """
+    Quotes for (listing, check_in, check_out, guests) stays, in order.
+
+    Stays of the same listing share its rules; check_out must be after
+    check_in.
+    """
+    stays = list(stays)
+    if not stays:
+        return []
+    listings = [listing for listing, _, _, _ in stays]
+    rules = [listing.pricing_rules or {} for listing in listings]
+    check_ins = np.array([check_in for _, check_in, _, _ in stays], dtype="datetime64[D]")
+    check_outs = np.array([check_out for _, _, check_out, _ in stays], dtype="datetime64[D]")
+    guests = np.array([count for _, _, _, count in stays], dtype=np.int64)
+    nights = (check_outs - check_ins).astype(np.int64)
+
+    # One entry per night of every stay: the stay it belongs to and its date.
+    stay_of_night = np.repeat(np.arange(len(stays)), nights)
+    first_night = np.cumsum(nights) - nights
+    dates = check_ins[stay_of_night] + (np.arange(len(stay_of_night)) - first_night[stay_of_night])
+    weekdays = (dates.astype(np.int64) + _EPOCH_WEEKDAY) % 7
+
+    base = np.array([_cents(listing.price) for listing in listings], dtype=np.float64)
+    weekend = np.array([float(rule.get("weekend_multiplier", 1)) for rule in rules])
+    multiplier = np.where(np.isin(weekdays, WEEKEND_NIGHTS), weekend[stay_of_night], 1.0)
+
+    season_multiplier = np.ones(len(dates))
+    for index, rule in enumerate(rules):
+        seasons = sorted(rule.get("seasons", ()), key=lambda season: season["start"])
+        if not seasons:
+            continue
+        # A stay's nights are contiguous in the arrays.
+        stay = slice(first_night[index], first_night[index] + nights[index])
+        stay_dates, stay_multiplier = dates[stay], season_multiplier[stay]
+        for season in seasons:
+            in_season = (stay_dates >= np.datetime64(season["start"])) & (stay_dates <= np.datetime64(season["end"]))
+            stay_multiplier[in_season] = float(season["multiplier"])
+
+    rates = np.rint(base[stay_of_night] * multiplier * season_multiplier)
+    nightly_totals = np.bincount(stay_of_night, weights=rates, minlength=len(stays)).astype(np.int64)
+
+    percents = np.array([
+        max(
+            (float(discount["percent"]) for discount in rule.get("stay_discounts", ())
+             if count >= discount["min_nights"]),
+            default=0.0,
+        )
+        for rule, count in zip(rules, nights.tolist())
+    ])
+    discounts = np.rint(nightly_totals * percents / 100).astype(np.int64)
+
+    included = np.array([rule.get("included_guests", 1) for rule in rules], dtype=np.int64)
+    guest_fee = np.array([_cents(rule.get("extra_guest_fee", 0)) for rule in rules], dtype=np.int64)
+    guest_fees = np.maximum(guests - included, 0) * guest_fee * nights
+
+    totals = nightly_totals - discounts + guest_fees
+    return [
+        Quote(
+            listing_id=listing.pk,
+            check_in=check_in,
+            check_out=check_out,
+            guests=count,
+            nights=int(nights[index]),
+            nightly_total=_money(nightly_totals[index]),
+            discount=_money(discounts[index]),
+            guest_fees=_money(guest_fees[index]),
+            total=_money(totals[index]),
+        )
+        for index, (listing, check_in, check_out, count) in enumerate(stays)
+    ]
+
+
+def quote_stay(listing, check_in, check_out, guests):
+    """Quote for a single stay."""
+    return quote_stays([(listing, check_in, check_out, guests)])[0]
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Listing, Review
+
+
+def _average_rating_expression():
+    """SQL expression deriving average_rating from the stored sum and count."""
+    return Case(
+        When(reviews_count=0, then=Value(None, output_field=FloatField())),
+        default=Cast(F("rating_sum"), FloatField()) / F("reviews_count"),
+        output_field=FloatField(),
+    )
+
+
+def apply_rating_delta(listing_id, count_delta, rating_delta):
+    """
+    Adjust a listing's stored review aggregates by the given deltas.
+
+    Uses F-expressions so concurrent reviews never overwrite each other; the
+    first UPDATE locks the row, so the average is computed from final totals.
+    """
+    if not count_delta and not rating_delta:
+        return
+    with transaction.atomic():
+        updated = Listing.objects.filter(pk=listing_id).update(
+            reviews_count=F("reviews_count") + count_delta,
+            rating_sum=F("rating_sum") + rating_delta,
+        )
+        if updated:
+            Listing.objects.filter(pk=listing_id).update(
+                average_rating=_average_rating_expression()
+            )
+
+
+def rebuild_rating_aggregates(queryset=None):
+    """Recompute stored review aggregates from the Review table in bulk."""
+    if queryset is None:
+        queryset = Listing.objects.all()
+
+    reviews = Review.objects.filter(listing=OuterRef("pk")).values("listing")
+    count_sq = reviews.annotate(total=Count("pk")).values("total")
+    sum_sq = reviews.annotate(total=Sum("rating")).values("total")
+
+    with transaction.atomic():
+        updated = queryset.update(
+            reviews_count=Coalesce(Subquery(count_sq), 0),
+            rating_sum=Coalesce(Subquery(sum_sq), 0),
+        )
+        queryset.update(average_rating=_average_rating_expression())
+    return updated
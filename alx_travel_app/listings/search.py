@@ -0,0 +1,161 @@
+"""
+Full-text search over listing titles, descriptions and locations.
+
+The index lives in the database and depends on its vendor:
+
+- MySQL: a FULLTEXT index over the three columns (migration 0013),
+  queried with MATCH ... AGAINST in natural language mode. InnoDB keeps it
+  current, so there is nothing to sync.
+- SQLite: an FTS5 shadow table, listings_listing_fts (ListingSearchEntry),
+  whose rowid is the listing id, ranked with bm25() with title matches
+  weighted highest. listings.signals keeps it in sync for saves and
+  deletes; bulk writes, which send no signals, call index_listings().
+- anything else: case-insensitive containment, unranked.
+
+A listing matches when any search term does; listings matching more (and
+rarer) terms rank first. LISTING_SEARCH_BACKEND may name another backend
+class.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Listing, ListingSearchEntry
+
+MAX_TERMS = 10
+FTS_TABLE = "listings_listing_fts"
+FULLTEXT_COLUMNS = "title, description, location"
+# bm25() weights of the FTS5 columns, in FULLTEXT_COLUMNS order
+BM25_WEIGHTS = "10.0, 1.0, 5.0"
+
+
+def search_terms(query):
+    """Lower-cased words of a search query; punctuation and operators are dropped."""
+    return re.findall(r"\w+", query.lower())[:MAX_TERMS]
+
+
+class ContainsBackend:
+    """Fallback: match any term anywhere in the text, without ranking."""
+
+    def search(self, queryset, terms):
+        condition = Q()
+        for term in terms:
+            condition |= Q(title__icontains=term) | Q(description__icontains=term) | Q(location__icontains=term)
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        ).order_by("-created_at", "-id")
+
+    def index(self, listing_ids):
+        pass
+
+    def remove(self, listing_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class MySQLFullTextBackend(ContainsBackend):
+    """MATCH ... AGAINST over the FULLTEXT index; InnoDB maintains it."""
+
+    def search(self, queryset, terms):
+        rank = RawSQL(
+            f"MATCH ({FULLTEXT_COLUMNS}) AGAINST (%s IN NATURAL LANGUAGE MODE)",
+            [" ".join(terms)],
+            output_field=FloatField(),
+        )
+        return queryset.annotate(search_rank=rank).filter(search_rank__gt=0).order_by("-search_rank", "-id")
+
+
+class RankedListings:
+    """Listings of a ranked ListingSearchEntry queryset, sliceable and countable for pagination."""
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def count(self):
+        return self.entries.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        listings = []
+        for entry in self.entries[index]:
+            entry.listing.search_rank = entry.search_rank
+            listings.append(entry.listing)
+        return listings
+
+
+class SQLiteFTS5Backend(ContainsBackend):
+    """The FTS5 shadow table, ranked with bm25() weighted towards titles."""
+
+    def search(self, queryset, terms):
+        expression = " OR ".join(f'"{term}"' for term in terms)
+        listings_sql, params = queryset.order_by().values("pk").query.sql_with_params()
+        # The query runs from the MATCH, and the listing filters come in as a
+        # subquery. Joined the other way, SQLite starts from the filters' index
+        # and reruns the MATCH for every listing. The unary + keeps it from
+        # pushing the IN list into FTS5 as one lookup per id.
+        entries = ListingSearchEntry.objects.extra(
+            where=[f"{FTS_TABLE} MATCH %s", f"+{FTS_TABLE}.rowid IN ({listings_sql})"],
+            params=[expression, *params],
+            # bm25() is lower for better matches; flip it so higher ranks first.
+            select={"search_rank": f"-bm25({FTS_TABLE}, {BM25_WEIGHTS})"},
+        )
+        return RankedListings(entries.select_related("listing__host").order_by("-search_rank", "-listing_id"))
+
+    def index(self, listing_ids, batch_size=500):
+        listing_ids = list(listing_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(listing_ids), batch_size):
+                chunk = listing_ids[start:start + batch_size]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} (rowid, {FULLTEXT_COLUMNS}) "
+                    f"SELECT id, {FULLTEXT_COLUMNS} FROM {Listing._meta.db_table} WHERE id IN ({placeholders})",
+                    chunk,
+                )
+
+    def remove(self, listing_ids):
+        listing_ids = list(listing_ids)
+        if listing_ids:
+            placeholders = ", ".join(["%s"] * len(listing_ids))
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", listing_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, {FULLTEXT_COLUMNS}) "
+                f"SELECT id, {FULLTEXT_COLUMNS} FROM {Listing._meta.db_table}"
+            )
+
+
+BACKENDS = {"mysql": MySQLFullTextBackend, "sqlite": SQLiteFTS5Backend}
+
+
+def get_backend():
+    """The configured search backend, or the one matching the database."""
+    if settings.LISTING_SEARCH_BACKEND:
+        return import_string(settings.LISTING_SEARCH_BACKEND)()
+    return BACKENDS.get(connection.vendor, ContainsBackend)()
+
+
+def search_listings(queryset, query):
+    """
+    Listings of `queryset` matching `query`, best matches first, each with
+    a `search_rank`. The result is a queryset or, on SQLite, a sequence
+    that slices and counts like one.
+    """
+    return get_backend().search(queryset, search_terms(query))
+
+
+def index_listings(listing_ids):
+    """Bring the index up to date for listings written without signals."""
+    get_backend().index(listing_ids)
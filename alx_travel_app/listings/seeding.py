@@ -0,0 +1,492 @@
+"""
+Bulk row generation for the seed and seed_users commands.
+
+Rows are built in memory with explicit primary keys from a range above
+the current maximum, so bookings, payments and reviews can point at the
+rows they belong to without reading ids back, and are written with
+bulk_create in chunks. Slugs, usernames and transaction ids carry the
+row's id, which keeps them unique without a query per row, even when a
+seed is run again; the rare slug or username clash with an existing row
+is resolved against a set loaded once. The shared default password is
+hashed once. bulk_create skips signals, so review aggregates,
+the occupancy table and the search indexes are rebuilt by rebuild_derived().
+
+Dates are counted from an anchor date rather than the clock, so a seed
+reproduces the same rows on any day as long as the anchor is the same.
+"""
+import itertools
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.text import slugify
+from faker import Faker
+
+from . import autocomplete, geo
+from .models import Booking, Listing, Payment, Review
+from .occupancy import rebuild_occupancy
+from .ratings import rebuild_rating_aggregates
+from .search import index_listings
+
+User = get_user_model()
+
+DEFAULT_PASSWORD = "password123"
+
+LISTING_TYPES = [choice for choice, _ in Listing.LISTING_TYPE_CHOICES]
+BOOKING_STATUSES = [choice for choice, _ in Booking.STATUS_CHOICES]
+PAYMENT_STATUSES = [choice for choice, _ in Payment.PAYMENT_STATUS_CHOICES]
+SLUG_MAX_LENGTH = Listing._meta.get_field("slug").max_length
+USERNAME_MAX_LENGTH = User._meta.get_field("username").max_length
+
+
+# ----------------------------
+# Ids and unique values
+# ----------------------------
+def next_id(model):
+    """First primary key above every existing row of `model`."""
+    return (model.objects.aggregate(top=Max("pk"))["top"] or 0) + 1
+
+
+def reset_sequences(*models):
+    """Move id sequences past explicitly inserted keys (PostgreSQL; a no-op on SQLite/MySQL)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def unique(value, taken):
+    """`value`, or `value` with a counter appended if it is in `taken`; the result is added to `taken`."""
+    candidate, counter = value, 1
+    while candidate in taken:
+        candidate = f"{value}-{counter}"
+        counter += 1
+    taken.add(candidate)
+    return candidate
+
+
+def with_id(text, pk, max_length):
+    """`text` suffixed with `-pk`, truncated to fit `max_length`."""
+    suffix = f"-{pk}"
+    return f"{text[:max_length - len(suffix)]}{suffix}"
+
+
+def existing_slugs(below=None):
+    listings = Listing.objects.exclude(slug=None)
+    if below is not None:
+        listings = listings.filter(pk__lt=below)
+    return set(listings.values_list("slug", flat=True).iterator())
+
+
+def existing_usernames(below=None):
+    users = User.objects.all() if below is None else User.objects.filter(pk__lt=below)
+    return set(users.values_list("username", flat=True).iterator())
+
+
+def anchor_time(anchor):
+    """Midnight at the start of the `anchor` date, in the current time zone."""
+    return timezone.make_aware(datetime.combine(anchor, datetime.min.time()))
+
+
+# ----------------------------
+# Bulk insert
+# ----------------------------
+def bulk_insert(model, rows, batch_size, progress=None):
+    """
+    bulk_create `rows` (any iterable) in chunks of `batch_size`.
+
+    `progress(done, final)` is called once before the first row and after
+    each chunk. Returns the number of rows written.
+    """
+    done = 0
+    batch = []
+    if progress:
+        progress(done, False)
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            done += len(batch)
+            batch = []
+            if progress:
+                progress(done, False)
+    if batch:
+        model.objects.bulk_create(batch)
+        done += len(batch)
+    if progress:
+        progress(done, True)
+    return done
+
+
+def rate_reporter(write, label, interval=1.0):
+    """bulk_insert progress callback writing rows done and rows/s at most every `interval` seconds."""
+    started = last = None
+    reported = 0
+
+    def report(done, final):
+        nonlocal started, last, reported
+        now = time.perf_counter()
+        if started is None:
+            started = last = now  # timing starts with the first row
+            return
+        if (final and done != reported) or now - last >= interval:
+            last, reported = now, done
+            elapsed = now - started
+            rate = done / elapsed if elapsed else done
+            write(f"  {label}: {done:,} rows in {elapsed:.1f} s ({rate:,.0f} rows/s)")
+
+    return report
+
+
+def rebuild_derived(listing_ids, batch_size=1000):
+    """Recompute review aggregates, occupancy and search indexes for bulk-inserted listings."""
+    listing_ids = list(listing_ids)
+    for start in range(0, len(listing_ids), batch_size):
+        chunk = listing_ids[start:start + batch_size]
+        rebuild_rating_aggregates(Listing.objects.filter(pk__in=chunk))
+        rebuild_occupancy(listing_ids=chunk, batch_size=batch_size)
+        index_listings(chunk)
+    if listing_ids:
+        autocomplete.invalidate()
+
+
+# ----------------------------
+# Row generators
+# ----------------------------
+# Each generator draws from `fake` (a Faker instance) and its fake.random,
+# so seeding the Faker instance fixes every generated value.
+def user_rows(fake, first_id, count, password, taken, out=None):
+    """
+    Users with ids first_id.. and the already-hashed `password`.
+
+    (id, email) of each user is appended to `out` for the rows that refer to it.
+    """
+    for pk in range(first_id, first_id + count):
+        username = unique(with_id(fake.user_name(), pk, USERNAME_MAX_LENGTH), taken)
+        email = fake.email()
+        if out is not None:
+            out.append((pk, email))
+        yield User(pk=pk, username=username, email=email, password=password)
+
+
+def listing_rows(fake, first_id, count, host_ids, taken, out, anchor):
+    """
+    Listings with ids first_id.., available from the `anchor` date;
+    (id, price, capacity) of each is appended to `out`.
+    """
+    rng = fake.random
+    for pk in range(first_id, first_id + count):
+        title = fake.sentence(nb_words=4)
+        price = Decimal(rng.randint(50, 500))
+        capacity = rng.randint(1, 10)
+        latitude, longitude = round(rng.uniform(-60, 70), 6), round(rng.uniform(-180, 180), 6)
+        out.append((pk, price, capacity))
+        yield Listing(
+            pk=pk,
+            title=title,
+            slug=unique(with_id(slugify(title), pk, SLUG_MAX_LENGTH), taken),
+            description=fake.paragraph(nb_sentences=5),
+            host_id=rng.choice(host_ids),
+            location=fake.city(),
+            latitude=latitude,
+            longitude=longitude,
+            geohash=geo.geohash_for(latitude, longitude),
+            listing_type=rng.choice(LISTING_TYPES),
+            price=price,
+            capacity=capacity,
+            available_from=anchor,
+            available_to=anchor + timedelta(days=rng.randint(30, 90)),
+        )
+
+
+def booking_rows(fake, first_id, count, listings, customers, out, anchor):
+    """
+    Bookings with ids first_id.. on `listings`, checking in after the
+    `anchor` date; (id, price) of each is appended to `out`.
+    """
+    rng = fake.random
+    for pk in range(first_id, first_id + count):
+        listing_id, listing_price, capacity = rng.choice(listings)
+        customer_id, email = rng.choice(customers)
+        check_in = anchor + timedelta(days=rng.randint(1, 20))
+        price = listing_price * rng.randint(1, 3)  # total price
+        out.append((pk, price))
+        yield Booking(
+            pk=pk,
+            listing_id=listing_id,
+            user_id=customer_id,
+            user_email=email or fake.email(),
+            check_in=check_in,
+            check_out=check_in + timedelta(days=rng.randint(1, 7)),
+            guests=rng.randint(1, capacity),
+            price=price,
+            status=rng.choice(BOOKING_STATUSES),
+        )
+
+
+def payment_rows(fake, first_id, bookings, anchor):
+    """One payment per (booking id, price), with ids first_id..; completed ones at the `anchor` date."""
+    rng = fake.random
+    completed_at = anchor_time(anchor)
+    for pk, (booking_id, price) in enumerate(bookings, first_id):
+        status = rng.choice(PAYMENT_STATUSES)
+        yield Payment(
+            pk=pk,
+            booking_id=booking_id,
+            status=status,
+            completed_at=completed_at if status == "COMPLETED" else None,
+            amount=price,
+            transaction_id=f"{uuid.UUID(int=rng.getrandbits(128), version=4)}-{pk}",
+        )
+
+
+def review_rows(fake, first_id, count, listing_ids, user_ids, seen=None, max_attempts=5):
+    """
+    Up to `count` reviews spread over `listing_ids`, one per (listing, user),
+    with ids from first_id.
+
+    `seen` holds (listing id, user id) pairs already reviewed. A review
+    whose random reviewer already reviewed the listing is retried with
+    another reviewer, then skipped.
+    """
+    rng = fake.random
+    seen = set() if seen is None else seen
+    pk = first_id
+    for n in range(count):
+        listing_id = listing_ids[n % len(listing_ids)]
+        for _ in range(max_attempts):
+            pair = (listing_id, rng.choice(user_ids))
+            if pair not in seen:
+                seen.add(pair)
+                yield Review(
+                    pk=pk,
+                    listing_id=listing_id,
+                    user_id=pair[1],
+                    rating=rng.randint(1, 5),
+                    comment=fake.paragraph(nb_sentences=3),
+                )
+                pk += 1
+                break
+
+
+def create_users(fake, count, batch_size, progress=None, out=None):
+    """Insert `count` users sharing DEFAULT_PASSWORD (hashed once); returns how many were written."""
+    rows = user_rows(fake, next_id(User), count, make_password(DEFAULT_PASSWORD), existing_usernames(), out)
+    written = bulk_insert(User, rows, batch_size, progress)
+    reset_sequences(User)
+    return written
+
+
+# ----------------------------
+# Sharded seeding
+# ----------------------------
+# Work is cut into shards of SHARD_SIZE rows whatever the number of
+# workers. Each shard draws from its own Faker instance seeded with
+# (seed, table, shard index) and writes a precomputed id range, so a seed
+# yields the same rows in one process or across a pool, and rows can refer
+# to rows of an earlier phase (users before listings) by id.
+SHARD_SIZE = 10_000
+
+
+@dataclass(frozen=True)
+class UserShard:
+    run_id: str
+    seed: int
+    index: int
+    first_id: int
+    count: int
+    password: str  # already hashed
+    existing_below: int  # first id of the run; lower ids are existing users
+
+
+@dataclass(frozen=True)
+class ListingShard:
+    run_id: str
+    seed: int
+    index: int
+    listing_first_id: int
+    listings: int
+    existing: tuple  # (id, price, capacity) of existing listings, when listings == 0
+    booking_first_id: int
+    bookings: int
+    payment_first_id: int
+    review_first_id: int
+    reviews: int
+    existing_below: int  # first new listing id
+    users_below: int  # hosts and customers are the users below this id
+    anchor: date  # generated dates are counted from this day
+
+
+def shard_faker(seed, *key):
+    fake = Faker()
+    fake.seed_instance(":".join(str(part) for part in (seed, *key)))
+    return fake
+
+
+def seeded_password(seed):
+    """DEFAULT_PASSWORD hashed with a salt derived from `seed`, so reseeding reproduces it."""
+    return make_password(DEFAULT_PASSWORD, salt=f"seed{seed}")
+
+
+def plan_user_shards(run_id, seed, first_id, count, password):
+    return [
+        UserShard(
+            run_id=run_id,
+            seed=seed,
+            index=index,
+            first_id=first_id + start,
+            count=min(SHARD_SIZE, count - start),
+            password=password,
+            existing_below=first_id,
+        )
+        for index, start in enumerate(range(0, count, SHARD_SIZE))
+    ]
+
+
+def plan_listing_shards(run_id, seed, first_ids, listings, bookings, reviews, existing, users_below, anchor):
+    """
+    Shards of up to SHARD_SIZE listings with their share of the bookings
+    (each with a payment) and reviews.
+
+    `first_ids` maps Listing, Booking, Payment and Review to the first id
+    of the run. With `listings` == 0 the shards cover the `existing`
+    listings instead. Dates are counted from the `anchor` date.
+    """
+    total = listings or len(existing)
+    shards = []
+    for index, start in enumerate(range(0, total, SHARD_SIZE)):
+        end = min(start + SHARD_SIZE, total)
+        booking_start, booking_end = bookings * start // total, bookings * end // total
+        review_start, review_end = reviews * start // total, reviews * end // total
+        shards.append(ListingShard(
+            run_id=run_id,
+            seed=seed,
+            index=index,
+            listing_first_id=first_ids[Listing] + start,
+            listings=end - start if listings else 0,
+            existing=() if listings else tuple(existing[start:end]),
+            booking_first_id=first_ids[Booking] + booking_start,
+            bookings=booking_end - booking_start,
+            payment_first_id=first_ids[Payment] + booking_start,
+            review_first_id=first_ids[Review] + review_start,
+            reviews=review_end - review_start,
+            existing_below=first_ids[Listing],
+            users_below=users_below,
+            anchor=anchor,
+        ))
+    return shards
+
+
+# Lookups shared by the shards of one run, loaded once per process.
+_run_state = {}
+
+
+def _state(run_id):
+    if _run_state.get("run_id") != run_id:
+        _run_state.clear()
+        _run_state["run_id"] = run_id
+    return _run_state
+
+
+def _reviewed(listing_ids, batch_size=1000):
+    pairs = set()
+    for start in range(0, len(listing_ids), batch_size):
+        pairs.update(
+            Review.objects.filter(listing_id__in=listing_ids[start:start + batch_size])
+            .values_list("listing_id", "user_id")
+        )
+    return pairs
+
+
+def run_user_shard(shard, batch_size):
+    state = _state(shard.run_id)
+    if "usernames" not in state:
+        state["usernames"] = existing_usernames(below=shard.existing_below)
+    fake = shard_faker(shard.seed, "users", shard.index)
+    rows = user_rows(fake, shard.first_id, shard.count, shard.password, state["usernames"])
+    return {"users": bulk_insert(User, rows, batch_size)}
+
+
+def run_listing_shard(shard, batch_size):
+    state = _state(shard.run_id)
+    if "customers" not in state:
+        state["customers"] = list(
+            User.objects.filter(pk__lt=shard.users_below).order_by("pk").values_list("pk", "email")
+        )
+        state["user_ids"] = [pk for pk, _ in state["customers"]]
+    customers, user_ids = state["customers"], state["user_ids"]
+    fake = shard_faker(shard.seed, "listings", shard.index)
+    counts = {}
+
+    if shard.listings:
+        if "slugs" not in state:
+            state["slugs"] = existing_slugs(below=shard.existing_below)
+        listings = []  # (id, price, capacity)
+        counts["listings"] = bulk_insert(
+            Listing,
+            listing_rows(
+                fake, shard.listing_first_id, shard.listings, user_ids, state["slugs"], listings, shard.anchor
+            ),
+            batch_size,
+        )
+        reviewed = set()
+    else:
+        listings = list(shard.existing)
+        reviewed = _reviewed([pk for pk, _, _ in listings])
+    listing_ids = [pk for pk, _, _ in listings]
+
+    if shard.bookings:
+        bookings = []  # (id, price)
+        counts["bookings"] = bulk_insert(
+            Booking,
+            booking_rows(
+                fake, shard.booking_first_id, shard.bookings, listings, customers, bookings, shard.anchor
+            ),
+            batch_size,
+        )
+        counts["payments"] = bulk_insert(
+            Payment, payment_rows(fake, shard.payment_first_id, bookings, shard.anchor), batch_size
+        )
+    if shard.reviews:
+        counts["reviews"] = bulk_insert(
+            Review,
+            review_rows(fake, shard.review_first_id, shard.reviews, listing_ids, user_ids, reviewed),
+            batch_size,
+        )
+
+    # bulk_create skips the signals that maintain these.
+    rebuild_derived(listing_ids, batch_size)
+    return counts
+
+
+def run_shards(func, shards, batch_size, workers=1):
+    """
+    Yield func(shard, batch_size) for each shard, in shard order.
+
+    With more than one worker the shards run on a pool of spawned
+    processes, each with its own database connection (django.setup runs
+    before a worker unpickles its first shard). A failed shard raises
+    here; rows written by other shards are kept.
+    """
+    if workers <= 1 or len(shards) <= 1:
+        for shard in shards:
+            yield func(shard, batch_size)
+        return
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(shards)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    ) as pool:
+        yield from pool.map(func, shards, itertools.repeat(batch_size))
@@ -1,6 +1,20 @@
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
 from rest_framework import serializers
-from .models import Listing, Booking
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .availability import BLOCKING_STATUSES, check_batch_availability
+from .cache import invalidate_listing
+from .analytics import METRICS
+from .models import HostDailyStats, Listing, ListingDailyStats, Booking
+from .occupancy import apply_bookings
+from .pricing import MAX_NIGHTS, quote_stays
+from .search import search_terms
 
 
 User = get_user_model()
@@ -22,10 +36,42 @@ class UserSignupSerializer(serializers.ModelSerializer):
         )
         return user
     
+class SeasonSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    multiplier = serializers.DecimalField(
+        max_digits=4, decimal_places=2, min_value=Decimal("0.01"), max_value=Decimal("10")
+    )
+
+    def validate(self, attrs):
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("end must not be before start.")
+        return attrs
+
+
+class StayDiscountSerializer(serializers.Serializer):
+    min_nights = serializers.IntegerField(min_value=2)
+    percent = serializers.DecimalField(
+        max_digits=4, decimal_places=2, min_value=Decimal("0"), max_value=Decimal("90")
+    )
+
+
+class PricingRulesSerializer(serializers.Serializer):
+    """The `pricing_rules` of a listing; see listings.pricing for how they apply."""
+    weekend_multiplier = serializers.DecimalField(
+        max_digits=4, decimal_places=2, min_value=Decimal("0.01"), max_value=Decimal("10"), required=False
+    )
+    seasons = serializers.ListField(child=SeasonSerializer(), max_length=50, required=False)
+    stay_discounts = serializers.ListField(child=StayDiscountSerializer(), max_length=10, required=False)
+    included_guests = serializers.IntegerField(min_value=1, required=False)
+    extra_guest_fee = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal("0"), required=False
+    )
+
+
 class ListingSerializer(serializers.ModelSerializer):
     host = serializers.StringRelatedField(read_only=True)
-    reviews_count = serializers.IntegerField(source='reviews.count', read_only=True)
-    average_rating = serializers.FloatField(read_only=True)
+    pricing_rules = serializers.JSONField(required=False)
 
     class Meta:
         model = Listing
@@ -33,24 +79,364 @@ class ListingSerializer(serializers.ModelSerializer):
             'id', 'title', 'slug', 'description', 'host',
             'location', 'listing_type', 'price',
             'capacity', 'available_from', 'available_to',
+            'latitude', 'longitude', 'pricing_rules',
             'created_at', 'reviews_count', 'average_rating'
         ]
 
+    def validate_pricing_rules(self, value):
+        rules = PricingRulesSerializer(data=value)
+        rules.is_valid(raise_exception=True)
+        return rules.data  # JSON-ready: dates and decimals as strings
+
+    def validate(self, attrs):
+        latitude = attrs.get("latitude", getattr(self.instance, "latitude", None))
+        longitude = attrs.get("longitude", getattr(self.instance, "longitude", None))
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError("latitude and longitude must be given together.")
+        return attrs
+
+
+class ListingImportSerializer(ListingSerializer):
+    """
+    ListingSerializer rules for bulk imports (listings.imports).
+
+    Slug uniqueness is not validated per row: the importer upserts by slug
+    and generates missing slugs for a whole chunk at once.
+    """
+
+    class Meta(ListingSerializer.Meta):
+        extra_kwargs = {"slug": {"validators": []}}
+
+
+def _largest(field):
+    """Largest value a DecimalField can store."""
+    step = Decimal(1).scaleb(-field.decimal_places)
+    return Decimal(10) ** (field.max_digits - field.decimal_places) - step
+
+
+MAX_BOOKING_PRICE = _largest(Booking._meta.get_field('price'))
+
+
+def booking_price_error(total):
+    """Why a quoted total cannot be stored as a booking's price, or None."""
+    if total > MAX_BOOKING_PRICE:
+        return f"The stay costs {total}, more than a booking can hold ({MAX_BOOKING_PRICE})."
+    return None
+
 
 class BookingSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     listing = serializers.StringRelatedField(read_only=True)
+    listing_id = serializers.PrimaryKeyRelatedField(
+        source='listing', queryset=Listing.objects.all()
+    )
+    guests = serializers.IntegerField(min_value=1)
 
     class Meta:
         model = Booking
         fields = [
-            'id', 'user', 'listing', 'check_in', 'check_out',
+            'id', 'user', 'listing', 'listing_id', 'check_in', 'check_out',
             'guests', 'price', 'status', 'created_at'
         ]
+        # Computed from the listing's pricing rules (listings.pricing).
+        read_only_fields = ['price']
+
+    def validate(self, attrs):
+        check_in = attrs.get('check_in', getattr(self.instance, 'check_in', None))
+        check_out = attrs.get('check_out', getattr(self.instance, 'check_out', None))
+        if check_in and check_out and check_in >= check_out:
+            raise serializers.ValidationError("check_out must be after check_in.")
+        if check_in and check_out and (check_out - check_in).days > MAX_NIGHTS:
+            raise serializers.ValidationError(f"Stays may last at most {MAX_NIGHTS} nights.")
+        return attrs
+
+
+class BookingBulkListSerializer(serializers.ListSerializer):
+    """Validate and insert many bookings with a handful of set-based queries."""
+
+    def to_internal_value(self, data):
+        # Errors raised here stay aligned with the submitted items.
+        attrs = super().to_internal_value(data)
+        listing_ids = {item['listing_id'] for item in attrs}
+        known = set(Listing.objects.filter(pk__in=listing_ids).values_list('pk', flat=True))
+        errors = [
+            {} if item['listing_id'] in known
+            else {'listing_id': [f"Invalid pk \"{item['listing_id']}\" - object does not exist."]}
+            for item in attrs
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        listing_ids = sorted({item['listing_id'] for item in validated_data})
+        with transaction.atomic():
+            # Lock every listing involved, in a fixed order to avoid deadlocks.
+            listings = {
+                listing.pk: listing
+                for listing in Listing.objects.select_for_update().filter(pk__in=listing_ids).order_by('pk')
+            }
+            blocking = [
+                index for index, item in enumerate(validated_data)
+                if item.get('status', 'pending') in BLOCKING_STATUSES
+            ]
+            results = check_batch_availability(
+                listings,
+                [
+                    (
+                        validated_data[index]['listing_id'],
+                        validated_data[index]['check_in'],
+                        validated_data[index]['check_out'],
+                        validated_data[index]['guests'],
+                    )
+                    for index in blocking
+                ],
+            )
+            errors = [{} for _ in validated_data]
+            for index, result in zip(blocking, results):
+                if not result.available:
+                    errors[index] = {'non_field_errors': [result.reason]}
+            if any(errors):
+                raise serializers.ValidationError(errors)
+
+            quotes = quote_stays(
+                (listings[item['listing_id']], item['check_in'], item['check_out'], item['guests'])
+                for item in validated_data
+            )
+            errors = [
+                {'non_field_errors': [error]} if (error := booking_price_error(quote.total)) else {}
+                for quote in quotes
+            ]
+            if any(errors):
+                raise serializers.ValidationError(errors)
+            # Backends without INSERT ... RETURNING (MySQL) leave the pks unset;
+            # the rows are read back by a tag unique to this insert, in pk
+            # order, which is insertion order within one statement.
+            batch_id = None if connection.features.can_return_rows_from_bulk_insert else uuid.uuid4()
+            bookings = [
+                Booking(listing=listings[item.pop('listing_id')], price=quote.total, batch_id=batch_id, **item)
+                for item, quote in zip(validated_data, quotes)
+            ]
+            Booking.objects.bulk_create(bookings)
+            if batch_id is not None:
+                inserted = (
+                    Booking.objects.filter(listing_id__in=listing_ids, batch_id=batch_id)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)
+                )
+                for booking, pk in zip(bookings, inserted):
+                    booking.pk = pk
+
+            # bulk_create sends no signals, so update derived data explicitly.
+            apply_bookings(bookings)
+            for listing_id in listing_ids:
+                invalidate_listing(listing_id)
+        return bookings
+
+
+class BookingBulkItemSerializer(BookingSerializer):
+    """One entry of a bulk booking request; listings are resolved in bulk."""
+    listing_id = serializers.IntegerField(min_value=1)
+
+    class Meta(BookingSerializer.Meta):
+        list_serializer_class = BookingBulkListSerializer
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    """Validate the query parameters of the listing availability action."""
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    guests = serializers.IntegerField(min_value=1, default=1)
+
+    def validate(self, attrs):
+        if attrs['check_in'] >= attrs['check_out']:
+            raise serializers.ValidationError("check_out must be after check_in.")
+        return attrs
+
+
+class QuoteRequestListSerializer(serializers.ListSerializer):
+    """Resolve the listings of every requested quote with one query."""
+
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        listings = Listing.objects.in_bulk({item['listing_id'] for item in attrs})
+        errors = [
+            {} if item['listing_id'] in listings
+            else {'listing_id': [f"Invalid pk \"{item['listing_id']}\" - object does not exist."]}
+            for item in attrs
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        for item in attrs:
+            item['listing'] = listings[item['listing_id']]
+        return attrs
+
+
+class QuoteRequestSerializer(serializers.Serializer):
+    """One stay to price with the listing quote action."""
+    listing_id = serializers.IntegerField(min_value=1)
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    guests = serializers.IntegerField(min_value=1, default=1)
+
+    class Meta:
+        list_serializer_class = QuoteRequestListSerializer
+
+    def validate(self, attrs):
+        if attrs['check_in'] >= attrs['check_out']:
+            raise serializers.ValidationError("check_out must be after check_in.")
+        if (attrs['check_out'] - attrs['check_in']).days > MAX_NIGHTS:
+            raise serializers.ValidationError(f"Stays are quoted for at most {MAX_NIGHTS} nights.")
+        return attrs
+
+
+class QuoteSerializer(serializers.Serializer):
+    """A listings.pricing.Quote."""
+    listing_id = serializers.IntegerField()
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    guests = serializers.IntegerField()
+    nights = serializers.IntegerField()
+    nightly_total = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    guest_fees = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Validate the query parameters of the booking/payment exports."""
+    start = serializers.DateField(required=False, help_text="Created on or after this date")
+    end = serializers.DateField(required=False, help_text="Created on or before this date")
+    status = serializers.CharField(required=False, help_text="Comma-separated statuses")
+
+    def validate_status(self, value):
+        statuses = {part.strip() for part in value.split(",") if part.strip()}
+        unknown = sorted(statuses - set(self.context["statuses"]))
+        if unknown:
+            raise serializers.ValidationError(f"Unknown status: {', '.join(unknown)}.")
+        return statuses
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("end must not be before start.")
+        return attrs
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """Validate the date range of the analytics endpoints; the last 30 days by default."""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    host = serializers.IntegerField(min_value=1, required=False, help_text="Staff only: another host's id")
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.localdate())
+        attrs.setdefault("start", attrs["end"] - timedelta(days=29))
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("end must not be before start.")
+        if (attrs["end"] - attrs["start"]).days >= settings.ANALYTICS_MAX_DAYS:
+            raise serializers.ValidationError(f"Ask for at most {settings.ANALYTICS_MAX_DAYS} days.")
+        return attrs
+
+
+class ListingDailyStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ListingDailyStats
+        fields = ['date', *METRICS]
+
+
+class HostDailyStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HostDailyStats
+        fields = ['date', *METRICS, 'occupied_listings']
 
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "username", "email", "first_name", "last_name", "is_staff"]
-        read_only_fields = ["id", "is_staff"]
\ No newline at end of file
+        read_only_fields = ["id", "is_staff"]
+
+class ListingSearchSerializer(serializers.Serializer):
+    """Validate the query parameters accepted by the listing search filter."""
+    location = serializers.CharField(required=False, max_length=255)
+    listing_type = serializers.MultipleChoiceField(
+        choices=Listing.LISTING_TYPE_CHOICES, required=False
+    )
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    guests = serializers.IntegerField(min_value=1, required=False)
+    check_in = serializers.DateField(required=False)
+    check_out = serializers.DateField(required=False)
+    # ?near=lat,lng&radius=km (listings.geo)
+    near = serializers.CharField(required=False)
+    radius = serializers.FloatField(
+        min_value=0.1, max_value=settings.GEO_MAX_RADIUS_KM, required=False
+    )
+
+    def validate_near(self, value):
+        try:
+            latitude, longitude = (float(part) for part in value.split(","))
+        except ValueError:
+            raise serializers.ValidationError("Expected near=latitude,longitude.")
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise serializers.ValidationError("Coordinates out of range.")
+        return latitude, longitude
+
+    def to_internal_value(self, data):
+        # Allow ?listing_type=hotel,tour as well as repeated parameters.
+        if hasattr(data, "getlist") and "listing_type" in data:
+            values = [v for raw in data.getlist("listing_type") for v in raw.split(",") if v]
+            data = data.copy()
+            data.setlist("listing_type", values)
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        min_price, max_price = attrs.get("min_price"), attrs.get("max_price")
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise serializers.ValidationError("min_price cannot be greater than max_price.")
+
+        check_in, check_out = attrs.get("check_in"), attrs.get("check_out")
+        if check_in and check_out and check_in > check_out:
+            raise serializers.ValidationError("check_in must be on or before check_out.")
+
+        if "radius" in attrs and "near" not in attrs:
+            raise serializers.ValidationError("radius requires near.")
+        return attrs
+
+
+class ListingTextSearchSerializer(ListingSearchSerializer):
+    """Validate the keyword search query on top of the listing filters."""
+    q = serializers.CharField(max_length=200)
+
+    def validate_q(self, value):
+        if not search_terms(value):
+            raise serializers.ValidationError("Enter at least one word to search for.")
+        return value
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    """Validate the query parameters of the autocomplete action."""
+    q = serializers.CharField(max_length=100, trim_whitespace=False)
+    field = serializers.ChoiceField(choices=["title", "location"], default="title")
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=10)
+
+
+class CalendarQuerySerializer(serializers.Serializer):
+    """Validate the query parameters of the batch calendar action."""
+    MAX_LISTINGS = 100
+    MAX_DAYS = 366
+
+    ids = serializers.CharField(help_text="Comma-separated listing ids")
+    start = serializers.DateField(required=False)
+    days = serializers.IntegerField(min_value=1, max_value=MAX_DAYS, default=90)
+
+    def validate_ids(self, value):
+        try:
+            ids = list(dict.fromkeys(int(part) for part in value.split(",") if part.strip()))
+        except ValueError:
+            raise serializers.ValidationError("ids must be a comma-separated list of integers.")
+        if not ids:
+            raise serializers.ValidationError("At least one listing id is required.")
+        if len(ids) > self.MAX_LISTINGS:
+            raise serializers.ValidationError(f"At most {self.MAX_LISTINGS} listings per request.")
+        return ids
@@ -0,0 +1,229 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import autocomplete, geo
+from .cache import invalidate_listing
+from .models import Booking, Listing, Payment, Review, RollupInvalidation
+from .occupancy import apply_booking_change, booking_contribution
+from .payments import forget_status
+from .ratings import apply_rating_delta
+from .search import get_backend as get_search_backend
+
+
+def _deleted_with_listing(origin):
+    """
+    True for rows removed in the cascade of their listing's own deletion.
+
+    Everything derived from them (occupancy, rating, cache, rollups) belongs
+    to the listing and goes with it, so the per-row bookkeeping is skipped;
+    the listing's own post_delete handlers cover it once.
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is Listing
+    return isinstance(origin, Listing)
+
+
+# ----------------------------
+# Review aggregates
+# ----------------------------
+@receiver(pre_save, sender=Review)
+def remember_previous_review(sender, instance, **kwargs):
+    """Keep the stored listing/rating of an edited review to compute deltas."""
+    instance._previous_rating = None
+    if not instance._state.adding and instance.pk:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk)
+            .values_list("listing_id", "rating")
+            .first()
+        )
+    instance._previous_listing_id = instance._previous_rating and instance._previous_rating[0]
+
+
+@receiver(post_save, sender=Review)
+def update_listing_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_rating", None)
+    if created or previous is None:
+        apply_rating_delta(instance.listing_id, 1, instance.rating)
+        return
+
+    old_listing_id, old_rating = previous
+    if old_listing_id == instance.listing_id:
+        apply_rating_delta(instance.listing_id, 0, instance.rating - old_rating)
+    else:
+        apply_rating_delta(old_listing_id, -1, -old_rating)
+        apply_rating_delta(instance.listing_id, 1, instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def update_listing_rating_on_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_with_listing(origin):
+        return
+    apply_rating_delta(instance.listing_id, -1, -instance.rating)
+
+
+# ----------------------------
+# Booking occupancy
+# ----------------------------
+def _contribution(booking):
+    return booking_contribution(
+        booking.listing_id, booking.check_in, booking.check_out, booking.guests, booking.status
+    )
+
+
+@receiver(pre_save, sender=Booking)
+def remember_previous_booking(sender, instance, **kwargs):
+    """Keep the stored occupancy contribution of an edited booking."""
+    instance._previous_occupancy = None
+    instance._previous_listing_id = None
+    if not instance._state.adding and instance.pk:
+        stored = Booking.objects.filter(pk=instance.pk).first()
+        if stored is not None:
+            instance._previous_occupancy = _contribution(stored)
+            instance._previous_listing_id = stored.listing_id
+
+
+@receiver(post_save, sender=Booking)
+def update_occupancy_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    apply_booking_change(getattr(instance, "_previous_occupancy", None), _contribution(instance))
+
+
+@receiver(post_delete, sender=Booking)
+def update_occupancy_on_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_with_listing(origin):
+        return
+    apply_booking_change(_contribution(instance), None)
+
+
+# ----------------------------
+# Geohash
+# ----------------------------
+@receiver(pre_save, sender=Listing)
+def set_listing_geohash(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance.geohash = geo.geohash_for(instance.latitude, instance.longitude)
+
+
+# ----------------------------
+# Response cache invalidation
+# ----------------------------
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def invalidate_cached_listing(sender, instance, **kwargs):
+    invalidate_listing(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_cached_listing_of_related(sender, instance, origin=None, **kwargs):
+    if _deleted_with_listing(origin):
+        return
+    invalidate_listing(instance.listing_id)
+    previous_listing_id = getattr(instance, "_previous_listing_id", None)
+    if previous_listing_id and previous_listing_id != instance.listing_id:
+        invalidate_listing(previous_listing_id)
+
+
+# ----------------------------
+# Full-text search index
+# ----------------------------
+@receiver(post_save, sender=Listing)
+def index_saved_listing(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    get_search_backend().index([instance.pk])
+
+
+@receiver(post_delete, sender=Listing)
+def unindex_deleted_listing(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+# ----------------------------
+# Autocomplete index
+# ----------------------------
+@receiver(post_save, sender=Listing)
+def publish_autocomplete_entry(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    change = (instance.pk, (instance.title, instance.location))
+    transaction.on_commit(lambda: autocomplete.publish([change]))
+
+
+@receiver(post_delete, sender=Listing)
+def publish_autocomplete_removal(sender, instance, **kwargs):
+    change = (instance.pk, None)
+    transaction.on_commit(lambda: autocomplete.publish([change]))
+
+
+# ----------------------------
+# Payment status cache
+# ----------------------------
+@receiver(pre_save, sender=Payment)
+def stamp_payment_completion(sender, instance, raw=False, **kwargs):
+    """Date payments saved as COMPLETED outside settle_payment (e.g. in the admin)."""
+    if raw:
+        return
+    if instance.status == "COMPLETED" and instance.completed_at is None:
+        instance.completed_at = timezone.now()
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def forget_cached_payment_status(sender, instance, **kwargs):
+    """Drop a cached terminal status when the payment is edited (e.g. refunded)."""
+    forget_status(instance.transaction_id)
+
+
+# ----------------------------
+# Analytics rollups
+# ----------------------------
+# Changes are found through updated_at; deletions and host moves leave
+# none, so they are recorded for the next listings.analytics.refresh_rollups
+# run.
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Review)
+def invalidate_rollups_of_related(sender, instance, origin=None, **kwargs):
+    if _deleted_with_listing(origin):
+        return
+    RollupInvalidation.objects.create(listing_id=instance.listing_id)
+
+
+@receiver(post_delete, sender=Payment)
+def invalidate_rollups_of_payment(sender, instance, origin=None, **kwargs):
+    if _deleted_with_listing(origin):
+        return
+    listing_id = Booking.objects.filter(pk=instance.booking_id).values_list("listing_id", flat=True).first()
+    if listing_id is not None:  # else the booking's own deletion is recorded
+        RollupInvalidation.objects.create(listing_id=listing_id)
+
+
+@receiver(post_delete, sender=Listing)
+def invalidate_rollups_of_listing(sender, instance, **kwargs):
+    RollupInvalidation.objects.create(listing_id=instance.pk, host_id=instance.host_id)
+
+
+@receiver(pre_save, sender=Listing)
+def remember_previous_host(sender, instance, raw=False, **kwargs):
+    instance._previous_host_id = None
+    if not raw and not instance._state.adding and instance.pk:
+        instance._previous_host_id = (
+            Listing.objects.filter(pk=instance.pk).values_list("host_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Listing)
+def invalidate_rollups_of_moved_listing(sender, instance, raw=False, **kwargs):
+    """A listing moved to another host leaves the old host's rows to recompute."""
+    previous_host_id = getattr(instance, "_previous_host_id", None)
+    if not raw and previous_host_id is not None and previous_host_id != instance.host_id:
+        RollupInvalidation.objects.create(listing_id=instance.pk, host_id=previous_host_id)
@@ -0,0 +1,191 @@
+"""
+Large synthetic fixtures for benchmarks and load tests.
+
+Rows are generated in memory from a seeded random.Random (Faker is far
+too slow at a million rows) and inserted with seeding.bulk_insert, so the
+same seed and anchor date always produce the same data;
+seeding.rebuild_derived then catches up the data signals would have
+maintained.
+"""
+import random
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db.models import Max
+
+from . import geo
+from .models import Booking, Listing, Payment, Review
+from .seeding import anchor_time, bulk_insert, rebuild_derived
+
+User = get_user_model()
+
+PREFIX = "bench"
+PASSWORD = "password123"
+
+WORDS = (
+    "sunny", "quiet", "cozy", "modern", "rustic", "grand", "hidden", "coastal",
+    "urban", "garden", "lake", "mountain", "river", "desert", "forest", "island",
+    "villa", "loft", "cabin", "suite", "studio", "lodge", "retreat", "house",
+)
+CITIES = (
+    "Addis Ababa", "Nairobi", "Lagos", "Accra", "Kigali", "Cairo", "Cape Town",
+    "Dakar", "Kampala", "Lusaka", "Marrakesh", "Zanzibar", "Mombasa", "Gondar",
+)
+LISTING_TYPES = [choice for choice, _ in Listing.LISTING_TYPE_CHOICES]
+
+
+@dataclass(frozen=True)
+class FixtureSize:
+    users: int
+    listings: int
+    bookings: int
+    reviews: int
+    payments: int
+
+    @classmethod
+    def for_scale(cls, listings):
+        """Row counts for a fixture with `listings` listings."""
+        return cls(
+            users=max(listings // 10, 100),
+            listings=listings,
+            bookings=listings * 2,
+            reviews=listings,
+            payments=listings,
+        )
+
+
+def _max_id(model):
+    return model.objects.aggregate(top=Max("pk"))["top"] or 0
+
+
+def _insert(model, rows, batch_size):
+    """bulk_create `rows` in batches; returns the primary keys of the new rows."""
+    before = _max_id(model)
+    bulk_insert(model, rows, batch_size)
+    # Auto-increment keys only grow, so the new rows are the ones above `before`
+    # (MySQL's bulk_create does not return them).
+    return list(model.objects.filter(pk__gt=before).order_by("pk").values_list("pk", flat=True))
+
+
+def seed_fixture(size, seed=0, batch_size=5000, progress=None, anchor=None):
+    """
+    Insert a synthetic fixture of `size` rows; returns the row counts.
+
+    Usernames, slugs and transaction ids are tagged with PREFIX and `seed`,
+    so a fixture can be told apart from real data (and seeding the same
+    seed twice fails on the unique constraints). Dates are counted from
+    the `anchor` date (default: today). `progress(label, rows, seconds)`
+    is called after each table.
+    """
+    rng = random.Random(seed)
+    tag = f"{PREFIX}-{seed}"
+    anchor = anchor or date.today()
+
+    def timed(label, insert):
+        started = time.perf_counter()
+        ids = insert()
+        if progress:
+            progress(label, len(ids), time.perf_counter() - started)
+        return ids
+
+    password = make_password(PASSWORD)  # one PBKDF2 run shared by every user
+    user_ids = timed("users", lambda: _insert(User, (
+        User(
+            username=f"{tag}-user-{n}",
+            email=f"{tag}-user-{n}@example.com",
+            password=password,
+        )
+        for n in range(size.users)
+    ), batch_size))
+
+    def listing(n):
+        words = rng.sample(WORDS, 3)
+        city = rng.choice(CITIES)
+        # Within about 20 km of the city centre.
+        centre_lat, centre_lng = geo.CITY_COORDINATES[city]
+        latitude = round(centre_lat + rng.uniform(-0.15, 0.15), 6)
+        longitude = round(centre_lng + rng.uniform(-0.15, 0.15), 6)
+        return Listing(
+            title=" ".join(words).title(),
+            slug=f"{tag}-{'-'.join(words)}-{n}",
+            description=" ".join(rng.choices(WORDS, k=30)),
+            host_id=rng.choice(user_ids),
+            location=city,
+            latitude=latitude,
+            longitude=longitude,
+            geohash=geo.geohash_for(latitude, longitude),
+            listing_type=rng.choice(LISTING_TYPES),
+            price=Decimal(rng.randint(50, 500)),
+            capacity=rng.randint(1, 10),
+            available_from=anchor - timedelta(days=30),
+            available_to=anchor + timedelta(days=365),
+        )
+
+    listing_ids = timed("listings", lambda: _insert(
+        Listing, (listing(n) for n in range(size.listings)), batch_size
+    ))
+
+    statuses = [choice for choice, _ in Booking.STATUS_CHOICES]
+    booking_prices = []  # in insertion order, i.e. the order of booking_ids
+
+    def booking(n):
+        check_in = anchor + timedelta(days=rng.randint(0, 180))
+        nights = rng.randint(1, 7)
+        booking_prices.append(rng.randint(50, 500) * nights)
+        return Booking(
+            listing_id=rng.choice(listing_ids),
+            user_id=rng.choice(user_ids),
+            check_in=check_in,
+            check_out=check_in + timedelta(days=nights),
+            guests=rng.randint(1, 2),
+            price=Decimal(booking_prices[-1]),
+            status=rng.choice(statuses),
+        )
+
+    booking_ids = timed("bookings", lambda: _insert(
+        Booking, (booking(n) for n in range(size.bookings)), batch_size
+    ))
+
+    # (listing, user) pairs are unique as long as reviews <= listings * users.
+    def review(n):
+        return Review(
+            listing_id=listing_ids[n % len(listing_ids)],
+            user_id=user_ids[(n // len(listing_ids)) % len(user_ids)],
+            rating=rng.randint(1, 5),
+            comment=" ".join(rng.choices(WORDS, k=12)),
+        )
+
+    review_count = min(size.reviews, len(listing_ids) * len(user_ids))
+    timed("reviews", lambda: _insert(Review, (review(n) for n in range(review_count)), batch_size))
+
+    completed_at = anchor_time(anchor)
+
+    def payment(n):
+        status = rng.choice(("PENDING", "COMPLETED", "COMPLETED", "FAILED"))
+        return Payment(
+            booking_id=booking_ids[n],
+            amount=Decimal(booking_prices[n]),
+            status=status,
+            completed_at=completed_at if status == "COMPLETED" else None,
+            transaction_id=f"{tag}-tx-{n}",
+        )
+
+    payment_count = min(size.payments, len(booking_ids))
+    timed("payments", lambda: _insert(Payment, (payment(n) for n in range(payment_count)), batch_size))
+
+    started = time.perf_counter()
+    rebuild_derived(listing_ids, batch_size=batch_size)
+    if progress:
+        progress("derived data", len(listing_ids), time.perf_counter() - started)
+
+    return asdict(FixtureSize(
+        users=len(user_ids),
+        listings=len(listing_ids),
+        bookings=len(booking_ids),
+        reviews=review_count,
+        payments=payment_count,
+    ))
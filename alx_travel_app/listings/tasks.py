@@ -1,7 +1,11 @@
 import os
-from django.core.mail import send_mail
 from django.conf import settings
 
+from .analytics import refresh_rollups
+from .idempotency import purge_expired_keys
+from .mailer import drain_outbox, queue_email, queue_emails
+from .models import Booking
+
 # Check if Celery should be used
 USE_CELERY = os.getenv("USE_CELERY", "False").lower() == "true"
 
@@ -18,23 +22,54 @@ def send_payment_confirmation_email(user_email, booking_id):
     """Notify user that payment was successful"""
     subject = "Payment Successful"
     message = f"✅ Your payment for booking {booking_id} was successful."
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user_email])
+    queue_email(subject, message, [user_email])
+
+
+def booking_confirmation_message(booking_id):
+    """Subject and body of the guest's booking confirmation"""
+    return (
+        "Booking Confirmation",
+        f"🎉 Your booking with ID {booking_id} has been created successfully!",
+    )
+
+
+def host_notification_message(booking_id, guest_name):
+    """Subject and body of the host's new-booking notification"""
+    return (
+        "New Booking on Your Listing",
+        f"📢 You have a new booking (ID {booking_id}) from guest: {guest_name}.",
+    )
 
 
 @shared_task
 def send_booking_confirmation_email(to_email, booking_id):
     """Notify user when a booking is created"""
-    subject = "Booking Confirmation"
-    message = f"🎉 Your booking with ID {booking_id} has been created successfully!"
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [to_email])
+    subject, message = booking_confirmation_message(booking_id)
+    queue_email(subject, message, [to_email])
 
 
 @shared_task
 def send_host_notification_email(host_email, booking_id, guest_name):
     """Notify host when a new booking is created"""
-    subject = "New Booking on Your Listing"
-    message = f"📢 You have a new booking (ID {booking_id}) from guest: {guest_name}."
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [host_email])
+    subject, message = host_notification_message(booking_id, guest_name)
+    queue_email(subject, message, [host_email])
+
+
+@shared_task
+def send_bulk_booking_notifications(booking_ids):
+    """Notify guests and hosts about a batch of new bookings"""
+    messages = []
+    bookings = Booking.objects.filter(pk__in=booking_ids).select_related("user", "listing__host")
+    for booking in bookings:
+        if booking.user.email:
+            subject, message = booking_confirmation_message(booking.id)
+            messages.append((subject, message, settings.DEFAULT_FROM_EMAIL, [booking.user.email]))
+        host = booking.listing.host
+        if host and host.email:
+            guest_name = booking.user.get_full_name() or booking.user.username
+            subject, message = host_notification_message(booking.id, guest_name)
+            messages.append((subject, message, settings.DEFAULT_FROM_EMAIL, [host.email]))
+    return queue_emails(messages)
 
 
 @shared_task
@@ -57,4 +92,30 @@ Enjoy your travels! ✈️
 CODED-SOMETHING Travel Team
 """
     from_email = settings.DEFAULT_FROM_EMAIL or "noreply@alxtravel.com"
-    send_mail(subject, message, from_email, [email], fail_silently=False)
+    queue_email(subject, message, [email], from_email=from_email)
+
+
+@shared_task
+def drain_email_outbox():
+    """Deliver queued outbox emails in batches (scheduled by Celery beat)"""
+    return drain_outbox()
+
+
+@shared_task
+def reconcile_payments():
+    """Verify stale PENDING payments with Chapa (scheduled by Celery beat)"""
+    from .payments import reconcile_pending_payments  # payments imports this module
+
+    return reconcile_pending_payments()
+
+
+@shared_task
+def purge_idempotency_keys():
+    """Delete expired Idempotency-Key records (scheduled by Celery beat)"""
+    return purge_expired_keys()
+
+
+@shared_task
+def refresh_analytics_rollups():
+    """Fold changed bookings, payments and reviews into the analytics rollups (scheduled by Celery beat)"""
+    return refresh_rollups()
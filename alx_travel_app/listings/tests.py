@@ -1,3 +1,1889 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from smtplib import SMTPServerDisconnected
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+import requests
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from alx_travel_app import metrics
+
+from . import analytics, autocomplete, geo, idempotency, payments, seeding, views
+from .availability import check_availability, peak_occupancy
+from .gateway import CircuitBreaker, GatewayClient, GatewayUnavailable, get_async_gateway_client
+from .gateway_stub import StubGateway
+from .idempotency import purge_expired_keys
+from .imports import ListingImporter
+from .mailer import drain_outbox, queue_email, queue_emails, sent_per_minute
+from .models import (
+    Booking, HostDailyStats, IdempotencyKey, Listing, ListingDailyStats, ListingOccupancy,
+    OutboundEmail, Payment, Review, RollupInvalidation,
+)
+from .payments import reconcile_pending_payments, webhook_signature
+from .pricing import quote_stay, quote_stays
+from .synthetic import FixtureSize, seed_fixture
+from .utils import BackgroundExecutor, run_task
+from .views import QuoteRateThrottle
+
+User = get_user_model()
+
+
+def make_listing(host, **kwargs):
+    """Create a listing with sensible defaults for tests."""
+    defaults = {
+        "title": "Test Listing",
+        "description": "A place to stay.",
+        "host": host,
+        "location": "Lagos",
+        "listing_type": "hotel",
+        "price": Decimal("100.00"),
+        "capacity": 2,
+    }
+    defaults.update(kwargs)
+    return Listing.objects.create(**defaults)
+
+
+class ListingListQueryTests(TestCase):
+    """The listing list endpoint must not issue per-row queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.reviewers = [
+            User.objects.create_user(username=f"reviewer{i}", password="pass12345")
+            for i in range(3)
+        ]
+
+    def _seed(self, count):
+        for i in range(count):
+            host = User.objects.create_user(username=f"host{Listing.objects.count()}")
+            listing = make_listing(host, title=f"Listing {i}")
+            for offset, reviewer in enumerate(self.reviewers):
+                Review.objects.create(listing=listing, user=reviewer, rating=1 + offset)
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/listings/")
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_query_count_is_independent_of_page_size(self):
+        self._seed(2)
+        small_count, small = self._count_list_queries()
+        self.assertEqual(len(small["results"]), 2)
+
+        self._seed(8)
+        full_count, full = self._count_list_queries()
+        self.assertEqual(len(full["results"]), 10)
+
+        self.assertEqual(small_count, full_count)
+
+    def test_list_includes_review_aggregates(self):
+        self._seed(1)
+        _, data = self._count_list_queries()
+        row = data["results"][0]
+        self.assertEqual(row["reviews_count"], 3)
+        self.assertAlmostEqual(row["average_rating"], 2.0)
+        self.assertEqual(row["host"], "host0")
+
+
+class ListingRatingAggregateTests(TestCase):
+    """Stored review aggregates follow Review create/update/delete."""
+
+    def setUp(self):
+        self.host = User.objects.create_user(username="host")
+        self.listing = make_listing(self.host)
+        self.alice = User.objects.create_user(username="alice")
+        self.bob = User.objects.create_user(username="bob")
+
+    def assertAggregates(self, listing, count, total, average):
+        listing.refresh_from_db()
+        self.assertEqual(listing.reviews_count, count)
+        self.assertEqual(listing.rating_sum, total)
+        if average is None:
+            self.assertIsNone(listing.average_rating)
+        else:
+            self.assertAlmostEqual(listing.average_rating, average)
+
+    def test_create_update_delete(self):
+        review = Review.objects.create(listing=self.listing, user=self.alice, rating=5)
+        Review.objects.create(listing=self.listing, user=self.bob, rating=2)
+        self.assertAggregates(self.listing, 2, 7, 3.5)
+
+        review.rating = 3
+        review.save()
+        self.assertAggregates(self.listing, 2, 5, 2.5)
+
+        review.delete()
+        self.assertAggregates(self.listing, 1, 2, 2.0)
+
+        Review.objects.all().delete()
+        self.assertAggregates(self.listing, 0, 0, None)
+
+    def test_moving_review_between_listings(self):
+        other = make_listing(self.host, title="Other")
+        review = Review.objects.create(listing=self.listing, user=self.alice, rating=4)
+
+        review.listing = other
+        review.save()
+        self.assertAggregates(self.listing, 0, 0, None)
+        self.assertAggregates(other, 1, 4, 4.0)
+
+    def test_rebuild_command(self):
+        Review.objects.create(listing=self.listing, user=self.alice, rating=4)
+        Review.objects.create(listing=self.listing, user=self.bob, rating=1)
+        empty = make_listing(self.host, title="Empty")
+        Listing.objects.update(reviews_count=99, rating_sum=99, average_rating=1.0)
+
+        call_command("rebuild_ratings", "--batch-size", "1", stdout=StringIO())
+
+        self.assertAggregates(self.listing, 2, 5, 2.5)
+        self.assertAggregates(empty, 0, 0, None)
+
+
+class ListingSearchFilterTests(TestCase):
+    """Server-side filtering and ordering on the listing list endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        host = User.objects.create_user(username="host")
+        today = date.today()
+        self.cheap_hotel = make_listing(
+            host, title="Cheap hotel", price=Decimal("50"), capacity=2,
+            available_from=today, available_to=today + timedelta(days=30),
+        )
+        self.pricey_hotel = make_listing(
+            host, title="Pricey hotel", price=Decimal("400"), capacity=6,
+            available_from=today, available_to=today + timedelta(days=60),
+        )
+        self.tour = make_listing(
+            host, title="Tour", listing_type="tour", location="Abuja",
+            price=Decimal("120"), capacity=10,
+            available_from=today + timedelta(days=10), available_to=today + timedelta(days=20),
+        )
+
+    def _titles(self, params):
+        response = self.client.get("/api/listings/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["title"] for row in response.json()["results"]]
+
+    def test_filters(self):
+        self.assertEqual(self._titles({"listing_type": "tour"}), ["Tour"])
+        self.assertCountEqual(
+            self._titles({"listing_type": "tour,hotel", "max_price": "150"}),
+            ["Tour", "Cheap hotel"],
+        )
+        self.assertEqual(self._titles({"location": "Abuja"}), ["Tour"])
+        self.assertCountEqual(self._titles({"guests": 5}), ["Pricey hotel", "Tour"])
+
+    def test_stay_window(self):
+        today = date.today()
+        params = {
+            "check_in": (today + timedelta(days=40)).isoformat(),
+            "check_out": (today + timedelta(days=45)).isoformat(),
+        }
+        self.assertEqual(self._titles(params), ["Pricey hotel"])
+
+    def test_ordering(self):
+        self.assertEqual(
+            self._titles({"ordering": "-price"}), ["Pricey hotel", "Tour", "Cheap hotel"]
+        )
+
+    def test_invalid_params_rejected(self):
+        response = self.client.get("/api/listings/", {"min_price": "10", "max_price": "5"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/listings/", {"listing_type": "castle"})
+        self.assertEqual(response.status_code, 400)
+
+
+class BookingAvailabilityTests(TestCase):
+    """Overlap- and capacity-aware availability checks."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.guest = User.objects.create_user(username="guest", password="pass12345")
+        self.client.force_authenticate(self.guest)
+        self.today = date.today()
+        self.listing = make_listing(
+            User.objects.create_user(username="host"),
+            capacity=4,
+            available_from=self.today,
+            available_to=self.today + timedelta(days=30),
+        )
+
+    def day(self, offset):
+        return self.today + timedelta(days=offset)
+
+    def book(self, start, end, guests, status="pending"):
+        return Booking.objects.create(
+            listing=self.listing, user=self.guest, check_in=self.day(start),
+            check_out=self.day(end), guests=guests, price=Decimal("100"), status=status,
+        )
+
+    def post_booking(self, start, end, guests):
+        return self.client.post(
+            "/api/bookings/",
+            {
+                "listing_id": self.listing.pk,
+                "check_in": self.day(start).isoformat(),
+                "check_out": self.day(end).isoformat(),
+                "guests": guests,
+                "price": "100.00",
+            },
+        )
+
+    def test_peak_occupancy_counts_overlapping_nights_only(self):
+        stays = [
+            (self.day(1), self.day(3), 2),
+            (self.day(3), self.day(5), 2),  # starts the day the first leaves
+            (self.day(2), self.day(4), 1),
+        ]
+        self.assertEqual(peak_occupancy(stays, self.day(0), self.day(10)), 3)
+        self.assertEqual(peak_occupancy(stays, self.day(4), self.day(10)), 2)
+
+    def test_capacity_is_shared_by_overlapping_bookings(self):
+        self.book(1, 5, 3)
+        self.book(5, 8, 4)
+        self.book(1, 8, 4, status="cancelled")
+
+        self.assertTrue(check_availability(self.listing, self.day(2), self.day(4), 1).available)
+        result = check_availability(self.listing, self.day(2), self.day(6), 1)
+        self.assertFalse(result.available)
+        self.assertEqual(result.remaining_capacity, 0)
+
+    def test_window_and_capacity_limits(self):
+        self.assertFalse(check_availability(self.listing, self.day(25), self.day(35), 1).available)
+        self.assertFalse(check_availability(self.listing, self.day(1), self.day(2), 5).available)
+
+    def test_availability_action(self):
+        self.book(1, 5, 3)
+        response = self.client.get(
+            f"/api/listings/{self.listing.pk}/availability/",
+            {"check_in": self.day(2).isoformat(), "check_out": self.day(3).isoformat(), "guests": 2},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["available"])
+        self.assertEqual(response.json()["remaining_capacity"], 1)
+
+        response = self.client.get(f"/api/listings/{self.listing.pk}/availability/")
+        self.assertEqual(response.status_code, 400)
+
+    def test_create_rejects_double_booking(self):
+        self.assertEqual(self.post_booking(1, 4, 3).status_code, 201)
+        response = self.post_booking(3, 6, 2)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(self.post_booking(4, 6, 4).status_code, 201)
+
+    def test_update_excludes_the_booking_itself(self):
+        booking = self.book(1, 4, 4)
+        response = self.client.patch(f"/api/bookings/{booking.pk}/", {"check_out": self.day(5).isoformat()})
+        self.assertEqual(response.status_code, 200, response.content)
+
+
+class OccupancyCalendarTests(TestCase):
+    """Per-night occupancy follows bookings and feeds the batch calendar."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.guest = User.objects.create_user(username="guest")
+        self.today = date.today()
+        host = User.objects.create_user(username="host")
+        window = {"available_from": self.today, "available_to": self.today + timedelta(days=60)}
+        self.first = make_listing(host, capacity=4, **window)
+        self.second = make_listing(host, title="Second", capacity=2, **window)
+
+    def day(self, offset):
+        return self.today + timedelta(days=offset)
+
+    def book(self, listing, start, end, guests, status="pending"):
+        return Booking.objects.create(
+            listing=listing, user=self.guest, check_in=self.day(start),
+            check_out=self.day(end), guests=guests, price=Decimal("100"), status=status,
+        )
+
+    def occupancy(self, listing):
+        return dict(
+            ListingOccupancy.objects.filter(listing=listing, booked_guests__gt=0)
+            .values_list("date", "booked_guests")
+        )
+
+    def test_occupancy_follows_booking_status_and_dates(self):
+        booking = self.book(self.first, 1, 3, 2)
+        self.book(self.first, 2, 4, 1)
+        self.assertEqual(self.occupancy(self.first), {self.day(1): 2, self.day(2): 3, self.day(3): 1})
+
+        booking.status = "cancelled"
+        booking.save()
+        self.assertEqual(self.occupancy(self.first), {self.day(2): 1, self.day(3): 1})
+
+        booking.status = "confirmed"
+        booking.check_in, booking.check_out = self.day(3), self.day(5)
+        booking.save()
+        self.assertEqual(self.occupancy(self.first), {self.day(2): 1, self.day(3): 3, self.day(4): 2})
+
+        Booking.objects.all().delete()
+        self.assertEqual(self.occupancy(self.first), {})
+
+    def test_rebuild_command(self):
+        self.book(self.first, 0, 2, 3)
+        ListingOccupancy.objects.all().delete()
+        call_command("rebuild_occupancy", stdout=StringIO())
+        self.assertEqual(self.occupancy(self.first), {self.day(0): 3, self.day(1): 3})
+
+    def test_batch_calendar_uses_constant_queries(self):
+        self.book(self.first, 0, 2, 3)
+        self.book(self.second, 1, 2, 2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                "/api/listings/calendar/",
+                {"ids": f"{self.second.pk},{self.first.pk}", "start": self.today.isoformat(), "days": 90},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        second, first = response.json()["listings"]
+        self.assertEqual(first["listing_id"], self.first.pk)
+        self.assertEqual(len(first["remaining"]), 90)
+        self.assertEqual(first["booked_guests"][:3], [3, 3, 0])
+        self.assertEqual(first["remaining"][:3], [1, 1, 4])
+        self.assertEqual(second["remaining"][:2], [2, 0])
+        self.assertEqual(first["remaining"][-1], 0)  # beyond available_to
+
+    def test_calendar_rejects_bad_ids(self):
+        response = self.client.get("/api/listings/calendar/", {"ids": "1,abc"})
+        self.assertEqual(response.status_code, 400)
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pagination by default, page numbers on request."""
+
+    def setUp(self):
+        self.client = APIClient()
+        host = User.objects.create_user(username="host")
+        self.listings = [make_listing(host, title=f"Listing {i}") for i in range(7)]
+
+    def test_cursor_walks_every_row_once(self):
+        seen = []
+        url, params = "/api/listings/", {"page_size": 3}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertNotIn("count", body)
+            seen += [row["id"] for row in body["results"]]
+            url, params = body["next"], None
+        expected = [listing.pk for listing in reversed(self.listings)]
+        self.assertEqual(seen, expected)
+
+    def test_page_number_mode_is_still_available(self):
+        response = self.client.get("/api/listings/", {"page": 2, "page_size": 5})
+        body = response.json()
+        self.assertEqual(body["count"], 7)
+        self.assertEqual(len(body["results"]), 2)
+
+    def test_page_size_is_capped(self):
+        response = self.client.get("/api/listings/", {"page_size": 10_000})
+        self.assertEqual(len(response.json()["results"]), 7)
+
+    def test_nullable_ordering_falls_back_to_pages(self):
+        response = self.client.get("/api/listings/", {"ordering": "average_rating"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 7)
+
+    def test_bench_command_runs(self):
+        out = StringIO()
+        call_command("bench_pagination", "--depths", "1,2", "--repeat", "1", "--page-size", "3", stdout=out)
+        self.assertIn("cursor", out.getvalue())
+        self.assertIn("page", out.getvalue())
+
+
+class ListingResponseCacheTests(TestCase):
+    """Versioned caching and conditional GETs on the listing read endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.host = User.objects.create_user(username="host")
+        self.listing = make_listing(self.host)
+
+    def test_cache_hit_skips_the_database(self):
+        first = self.client.get("/api/listings/")
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get("/api/listings/")
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_query_string_is_part_of_the_key(self):
+        make_listing(self.host, title="Tour", listing_type="tour")
+        self.assertEqual(len(self.client.get("/api/listings/").json()["results"]), 2)
+        self.assertEqual(len(self.client.get("/api/listings/?listing_type=tour").json()["results"]), 1)
+
+    def test_listing_and_review_changes_invalidate(self):
+        url = f"/api/listings/{self.listing.pk}/"
+        self.assertEqual(self.client.get(url).json()["title"], "Test Listing")
+
+        Listing.objects.filter(pk=self.listing.pk).update(title="Stale")
+        self.assertEqual(self.client.get(url).json()["title"], "Test Listing")
+
+        self.listing.refresh_from_db()
+        self.listing.title = "Renamed"
+        self.listing.save()
+        self.assertEqual(self.client.get(url).json()["title"], "Renamed")
+        self.assertEqual(self.client.get("/api/listings/").json()["results"][0]["title"], "Renamed")
+
+        Review.objects.create(listing=self.listing, user=self.host, rating=4)
+        self.assertEqual(self.client.get(url).json()["reviews_count"], 1)
+
+    def test_if_none_match_returns_304(self):
+        url = f"/api/listings/{self.listing.pk}/"
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Review.objects.create(listing=self.listing, user=self.host, rating=4)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+@override_settings(TASK_EXECUTOR_EAGER=True)
+class BulkBookingTests(TestCase):
+    """POST /api/bookings/bulk/ validates, checks and inserts as a set."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.guest = User.objects.create_user(username="guest", email="guest@example.com")
+        self.client.force_authenticate(self.guest)
+        self.today = date.today()
+        host = User.objects.create_user(username="host", email="host@example.com")
+        window = {"available_from": self.today, "available_to": self.today + timedelta(days=60)}
+        self.listings = [make_listing(host, title=f"L{i}", capacity=4, **window) for i in range(3)]
+
+    def item(self, listing, start, end, guests):
+        return {
+            "listing_id": listing.pk,
+            "check_in": (self.today + timedelta(days=start)).isoformat(),
+            "check_out": (self.today + timedelta(days=end)).isoformat(),
+            "guests": guests,
+            "price": "100.00",
+        }
+
+    def post(self, items):
+        return self.client.post("/api/bookings/bulk/", items, format="json")
+
+    def test_bulk_create_with_bounded_queries(self):
+        small = [self.item(self.listings[0], 1, 2, 1)]
+        with CaptureQueriesContext(connection) as small_ctx:
+            self.assertEqual(self.post(small).status_code, 201)
+
+        large = [self.item(listing, n, n + 1, 1) for listing in self.listings for n in range(3, 13)]
+        with CaptureQueriesContext(connection) as large_ctx:
+            response = self.post(large)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(response.json()), 30)
+        self.assertTrue(all(row["id"] for row in response.json()))
+        self.assertEqual(Booking.objects.count(), 31)
+        # Only the per-listing occupancy updates grow with the batch.
+        self.assertLessEqual(len(large_ctx.captured_queries), len(small_ctx.captured_queries) + 5)
+
+        occupied = ListingOccupancy.objects.filter(listing=self.listings[2], booked_guests=1).count()
+        self.assertEqual(occupied, 10)
+
+    def test_bulk_create_reads_back_ids_without_returning_rows(self):
+        Booking.objects.create(
+            listing=self.listings[0], user=self.guest, check_in=self.today + timedelta(days=20),
+            check_out=self.today + timedelta(days=21), guests=1, price=Decimal("100"),
+        )
+        items = [self.item(listing, 1, 2, n + 1) for n, listing in enumerate(self.listings)]
+        with patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            response = self.post(items)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Booking.objects.exclude(batch_id=None).count(), 3)
+        for row, listing in zip(response.json(), self.listings):
+            self.assertEqual(Booking.objects.get(pk=row["id"]).listing_id, listing.pk)
+            self.assertEqual(row["guests"], Booking.objects.get(pk=row["id"]).guests)
+
+    def test_notifications_are_sent_in_batches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post([self.item(self.listings[0], n, n + 1, 1) for n in range(5)])
+        self.assertEqual(len(mail.outbox), 10)
+
+    def test_batch_cannot_overbook_itself(self):
+        response = self.post([
+            self.item(self.listings[0], 1, 4, 3),
+            self.item(self.listings[1], 1, 4, 3),
+            self.item(self.listings[0], 2, 3, 2),
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn("non_field_errors", errors[2])
+        self.assertEqual(Booking.objects.count(), 0)
+
+    def test_unknown_listing_reported_per_item(self):
+        bad = self.item(self.listings[0], 1, 2, 1)
+        bad["listing_id"] = 999999
+        response = self.post([self.item(self.listings[0], 1, 2, 1), bad])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("listing_id", response.json()[1])
+
+
+class CountingEmailBackend(LocmemEmailBackend):
+    """Locmem backend that counts opened connections and can fail on demand."""
+    opened = 0
+    fail_for = set()
+    disconnect_for = set()  # dropped once each
+    refuse_reopen = False
+
+    def open(self):
+        if CountingEmailBackend.opened and self.refuse_reopen:
+            raise ConnectionRefusedError("SMTP unreachable")
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.fail_for:
+                raise ConnectionError("SMTP unavailable")
+            if set(message.to) & self.disconnect_for:
+                CountingEmailBackend.disconnect_for -= set(message.to)
+                raise SMTPServerDisconnected("Connection unexpectedly closed")
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND="listings.tests.CountingEmailBackend",
+    TASK_EXECUTOR_EAGER=True,
+    EMAIL_OUTBOX_DRAIN_ON_QUEUE=False,
+    EMAIL_OUTBOX_BATCH_SIZE=3,
+)
+class OutboxMailerTests(TestCase):
+    """Queued emails are delivered in batches over one reused connection."""
+
+    def setUp(self):
+        cache.clear()
+        CountingEmailBackend.opened = 0
+        CountingEmailBackend.fail_for = set()
+        CountingEmailBackend.disconnect_for = set()
+        CountingEmailBackend.refuse_reopen = False
+
+    def test_drain_sends_all_batches_over_one_connection(self):
+        queue_emails([("Hi", f"Body {i}", None, [f"user{i}@example.com"]) for i in range(7)])
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(drain_outbox(), {"sent": 7, "failed": 0})
+        self.assertEqual(len(mail.outbox), 7)
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(OutboundEmail.objects.filter(status="sent").count(), 7)
+        self.assertEqual(sent_per_minute(1)[-1][1], 7)
+
+        self.assertEqual(drain_outbox(), {"sent": 0, "failed": 0})
+
+    def test_failures_are_retried_with_backoff(self):
+        CountingEmailBackend.fail_for = {"down@example.com"}
+        queue_email("Hi", "Body", ["down@example.com"])
+        queue_email("Hi", "Body", ["up@example.com"])
+
+        self.assertEqual(drain_outbox(), {"sent": 1, "failed": 1})
+        email = OutboundEmail.objects.get(status="queued")
+        self.assertEqual(email.attempts, 1)
+        self.assertIn("SMTP unavailable", email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        # Not due yet, so nothing is retried.
+        self.assertEqual(drain_outbox(), {"sent": 0, "failed": 0})
+
+        CountingEmailBackend.fail_for = set()
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(drain_outbox(), {"sent": 1, "failed": 0})
+
+    def test_dropped_connection_is_reopened_and_the_message_retried(self):
+        CountingEmailBackend.disconnect_for = {"user1@example.com"}
+        queue_emails([("Hi", "Body", None, [f"user{i}@example.com"]) for i in range(3)])
+
+        self.assertEqual(drain_outbox(), {"sent": 3, "failed": 0})
+        self.assertEqual(CountingEmailBackend.opened, 2)
+        self.assertEqual(set(OutboundEmail.objects.values_list("attempts", flat=True)), {1})
+
+    def test_unreachable_server_releases_the_rest_of_the_batch(self):
+        CountingEmailBackend.disconnect_for = {"user1@example.com"}
+        CountingEmailBackend.refuse_reopen = True
+        queue_emails([("Hi", "Body", None, [f"user{i}@example.com"]) for i in range(5)])
+
+        self.assertEqual(drain_outbox(), {"sent": 1, "failed": 0})
+        # The rest of the first batch is due again with no attempt counted,
+        # and the second batch was never claimed.
+        queued = OutboundEmail.objects.filter(status="queued")
+        self.assertEqual(queued.count(), 4)
+        self.assertEqual(set(queued.values_list("attempts", flat=True)), {0})
+        self.assertFalse(queued.filter(next_attempt_at__gt=timezone.now()).exists())
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=1)
+    def test_gives_up_after_max_attempts(self):
+        CountingEmailBackend.fail_for = {"down@example.com"}
+        queue_email("Hi", "Body", ["down@example.com"])
+        drain_outbox()
+        self.assertEqual(OutboundEmail.objects.get().status, "failed")
+
+    @override_settings(EMAIL_OUTBOX_DRAIN_ON_QUEUE=True)
+    def test_drain_on_queue_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_email("Hi", "Body", ["user@example.com"])
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class BackgroundExecutorTests(TestCase):
+    """Sync-mode tasks run off the request thread, after commit."""
+
+    def test_tasks_run_on_worker_threads_and_drain_on_shutdown(self):
+        executor = BackgroundExecutor(workers=2, queue_size=10)
+        seen = []
+        for n in range(5):
+            executor.submit(lambda n=n: seen.append((n, threading.current_thread().name)))
+        executor.shutdown(timeout=5)
+
+        self.assertCountEqual([n for n, _ in seen], range(5))
+        self.assertTrue(all(name.startswith("task-executor-") for _, name in seen))
+
+    def test_full_queue_runs_inline(self):
+        executor = BackgroundExecutor(workers=1, queue_size=1)
+        release = threading.Event()
+        executor.submit(release.wait)  # occupies the only worker
+        time.sleep(0.05)
+        executor.submit(lambda: None)  # fills the queue
+
+        caller = []
+        executor.submit(lambda: caller.append(threading.current_thread()))
+        self.assertEqual(caller, [threading.current_thread()])
+
+        release.set()
+        executor.shutdown(timeout=5)
+
+    def test_shutdown_with_a_full_queue_returns_by_the_deadline(self):
+        executor = BackgroundExecutor(workers=1, queue_size=1)
+        release = threading.Event()
+        executor.submit(release.wait)  # the only worker is stuck
+        time.sleep(0.05)
+        executor.submit(lambda: None)  # no room left for a sentinel
+
+        started = time.monotonic()
+        executor.shutdown(timeout=0.2)
+        self.assertLess(time.monotonic() - started, 2)
+        release.set()
+
+    def test_offer_declines_a_full_queue(self):
+        executor = BackgroundExecutor(workers=1, queue_size=1)
+        release = threading.Event()
+        executor.submit(release.wait)
+        time.sleep(0.05)
+        self.assertTrue(executor.offer(lambda: None))
+
+        caller = []
+        self.assertFalse(executor.offer(caller.append, "inline"))
+        self.assertEqual(caller, [])
+
+        release.set()
+        executor.shutdown(timeout=5)
+
+    @override_settings(USE_CELERY=False, TASK_EXECUTOR_EAGER=True)
+    def test_run_task_waits_for_commit(self):
+        calls = []
+        with self.captureOnCommitCallbacks() as callbacks:
+            run_task(calls.append, "sent")
+            self.assertEqual(calls, [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(calls, ["sent"])
+
+
+class GatewayClientTests(TestCase):
+    """Pooling, timeouts, retries and the circuit breaker against a stub server."""
+
+    OK = (200, {"status": "success"}, 0)
+    DOWN = (503, {"status": "unavailable"}, 0)
+
+    def client_for(self, stub, **kwargs):
+        kwargs.setdefault("backoff", 0.001)
+        return GatewayClient(stub.url, secret_key="sk", **kwargs)
+
+    def test_connections_are_reused(self):
+        with StubGateway([self.OK]) as stub:
+            client = self.client_for(stub)
+            for _ in range(5):
+                self.assertEqual(client.get("transaction/verify/tx").status_code, 200)
+        self.assertEqual(len({address for _, _, address, _ in stub.requests}), 1)
+
+    def test_transient_errors_are_retried(self):
+        with StubGateway([self.DOWN, self.DOWN, self.OK]) as stub:
+            response = self.client_for(stub, max_retries=2).get("transaction/verify/tx")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(stub.requests), 3)
+
+    def test_posts_are_not_retried_after_reaching_the_gateway(self):
+        with StubGateway([self.DOWN, self.OK]) as stub:
+            response = self.client_for(stub, max_retries=2).post("transaction/initialize", json={})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_read_timeout(self):
+        with StubGateway([(200, {}, 0.5)]) as stub:
+            client = self.client_for(stub, read_timeout=0.05, max_retries=0)
+            with self.assertRaises(requests.Timeout):
+                client.get("transaction/verify/tx")
+
+    def test_circuit_breaker_fails_fast_then_recovers(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+        with StubGateway([self.DOWN, self.DOWN, self.OK]) as stub:
+            client = self.client_for(stub, max_retries=0, breaker=breaker)
+            client.get("a")
+            client.get("b")
+            self.assertEqual(breaker.state, "open")
+
+            with self.assertRaises(GatewayUnavailable):
+                client.get("c")
+            self.assertEqual(len(stub.requests), 2)
+
+            time.sleep(0.25)
+            self.assertEqual(client.get("d").status_code, 200)
+            self.assertEqual(breaker.state, "closed")
+
+    def test_async_client_is_closed_with_its_loop(self):
+        async def use_client():
+            client = get_async_gateway_client()
+            self.assertIs(get_async_gateway_client(), client)
+            return client
+
+        with StubGateway([self.OK]) as stub, override_settings(CHAPA_BASE_URL=stub.url):
+            first, second = asyncio.run(use_client()), asyncio.run(use_client())
+        self.assertIsNot(first, second)
+        self.assertTrue(first.client.is_closed)
+        self.assertTrue(second.client.is_closed)
+
+
+@override_settings(TASK_EXECUTOR_EAGER=True)
+class ChapaVerifyPaymentTests(TestCase):
+    """The Chapa helpers go through the shared gateway client."""
+
+    def setUp(self):
+        guest = User.objects.create_user(username="guest", email="guest@example.com")
+        listing = make_listing(User.objects.create_user(username="host"))
+        booking = Booking.objects.create(
+            listing=listing, user=guest, check_in=date.today(),
+            check_out=date.today() + timedelta(days=1), guests=1, price=Decimal("100"),
+        )
+        self.payment = Payment.objects.create(
+            booking=booking, amount=booking.price, transaction_id="tx-1"
+        )
+
+    def test_verify_marks_payment_completed(self):
+        success = (200, {"status": "success", "data": {"status": "successful"}}, 0)
+        with StubGateway([success]) as stub, override_settings(CHAPA_BASE_URL=stub.url):
+            response = APIClient().get("/api/payments/verify/tx-1/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["payment_status"], "COMPLETED")
+        self.assertEqual(stub.requests[0][1], "/transaction/verify/tx-1")
+
+
+@override_settings(TASK_EXECUTOR_EAGER=True)
+class AsyncPaymentViewTests(TestCase):
+    """The async payment views keep the sync views' contract."""
+
+    def setUp(self):
+        self.guest = User.objects.create_user(username="guest", email="guest@example.com")
+        listing = make_listing(User.objects.create_user(username="host"))
+        self.booking = Booking.objects.create(
+            listing=listing, user=self.guest, check_in=date.today(),
+            check_out=date.today() + timedelta(days=1), guests=1, price=Decimal("100"),
+        )
+
+    async def test_initiate_requires_authentication(self):
+        response = await self.async_client.post(f"/api/payments/async/initiate/{self.booking.id}/")
+        self.assertEqual(response.status_code, 401)
+
+    async def test_initiate_creates_pending_payment(self):
+        await self.async_client.aforce_login(self.guest)
+        success = (200, {"status": "success", "data": {"id": "tx-9", "checkout_url": "https://pay"}}, 0)
+        with StubGateway([success]) as stub, override_settings(CHAPA_BASE_URL=stub.url):
+            response = await self.async_client.post(f"/api/payments/async/initiate/{self.booking.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["payment_link"], "https://pay")
+        payment = await Payment.objects.aget(transaction_id="tx-9")
+        self.assertEqual(payment.status, "PENDING")
+        self.assertEqual(stub.requests[0][1], "/transaction/initialize")
+
+    async def test_verify_marks_payment_completed(self):
+        await Payment.objects.acreate(
+            booking=self.booking, amount=self.booking.price, transaction_id="tx-1"
+        )
+        success = (200, {"status": "success", "data": {"status": "successful"}}, 0)
+        with StubGateway([success]) as stub, override_settings(CHAPA_BASE_URL=stub.url):
+            response = await self.async_client.get("/api/payments/async/verify/tx-1/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["payment_status"], "COMPLETED")
+        self.assertEqual((await Payment.objects.aget(transaction_id="tx-1")).status, "COMPLETED")
+
+    async def test_non_json_gateway_body_is_an_error(self):
+        await self.async_client.aforce_login(self.guest)
+        await Payment.objects.acreate(
+            booking=self.booking, amount=self.booking.price, transaction_id="tx-1"
+        )
+        bad_gateway = (502, b"<html>Bad Gateway</html>", 0)
+        with StubGateway([bad_gateway]) as stub, override_settings(CHAPA_BASE_URL=stub.url):
+            initiated = await self.async_client.post(f"/api/payments/async/initiate/{self.booking.id}/")
+            verified = await self.async_client.get("/api/payments/async/verify/tx-1/")
+        self.assertEqual(initiated.status_code, 500)
+        self.assertIn("error", initiated.json())
+        self.assertEqual(verified.status_code, 500)
+        self.assertEqual((await Payment.objects.aget(transaction_id="tx-1")).status, "PENDING")
+
+    async def test_verify_unknown_transaction_is_404(self):
+        response = await self.async_client.get("/api/payments/async/verify/missing/")
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(TASK_EXECUTOR_EAGER=True, CHAPA_WEBHOOK_SECRET="whsec")
+class PaymentReconciliationTests(TestCase):
+    """Webhooks and the reconciliation job settle PENDING payments once."""
+
+    def setUp(self):
+        guest = User.objects.create_user(username="guest", email="guest@example.com")
+        listing = make_listing(User.objects.create_user(username="host"))
+        self.booking = Booking.objects.create(
+            listing=listing, user=guest, check_in=date.today(),
+            check_out=date.today() + timedelta(days=1), guests=1, price=Decimal("100"),
+        )
+
+    def make_payment(self, transaction_id, age=timedelta(0)):
+        payment = Payment.objects.create(
+            booking=self.booking, amount=self.booking.price, transaction_id=transaction_id
+        )
+        Payment.objects.filter(pk=payment.pk).update(updated_at=timezone.now() - age)
+        return payment
+
+    def post_webhook(self, event, signature=None):
+        body = json.dumps(event).encode()
+        return APIClient().post(
+            "/api/payments/webhook/",
+            body,
+            content_type="application/json",
+            HTTP_X_CHAPA_SIGNATURE=signature or webhook_signature(body),
+        )
+
+    def test_webhook_settles_payment_once(self):
+        self.make_payment("tx-1")
+        event = {
+            "event": "charge.success", "tx_ref": f"booking-{self.booking.pk}", "reference": "tx-1",
+            "status": "success",
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.post_webhook(event)
+            second = self.post_webhook(event)
+
+        self.assertEqual(first.json(), {"updated": True, "payment_status": "COMPLETED", "transaction_id": "tx-1"})
+        self.assertFalse(second.json()["updated"])
+        self.assertEqual(Payment.objects.get(transaction_id="tx-1").status, "COMPLETED")
+        self.assertEqual(OutboundEmail.objects.filter(subject="Payment Successful").count(), 1)
+
+    def test_webhook_without_reference_finds_the_booking_payment(self):
+        failed = self.make_payment("tx-old")
+        Payment.objects.filter(pk=failed.pk).update(status="FAILED")
+        self.make_payment("tx-2")
+        response = self.post_webhook({"tx_ref": f"booking-{self.booking.pk}", "status": "success"})
+        self.assertEqual(response.json()["transaction_id"], "tx-2")
+        self.assertEqual(Payment.objects.get(transaction_id="tx-2").status, "COMPLETED")
+
+        unknown = self.post_webhook({"tx_ref": "booking-999999", "reference": "tx-nope", "status": "success"})
+        self.assertEqual(unknown.json(), {"updated": False})
+
+    def test_webhook_rejects_bad_signature(self):
+        self.make_payment("tx-1")
+        response = self.post_webhook({"reference": "tx-1", "status": "success"}, signature="0" * 64)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Payment.objects.get(transaction_id="tx-1").status, "PENDING")
+
+    def test_reconcile_verifies_only_stale_pending_payments(self):
+        stale = timedelta(hours=1)
+        self.make_payment("tx-paid", age=stale)
+        self.make_payment("tx-open", age=stale)
+        self.make_payment("tx-fresh")
+
+        def reply(status):
+            return (200, {"status": "success", "data": {"status": status}}, 0)
+
+        with StubGateway([reply("successful"), reply("pending")]) as stub, override_settings(
+            CHAPA_BASE_URL=stub.url
+        ):
+            totals = reconcile_pending_payments(concurrency=1)
+
+        self.assertEqual(totals["checked"], 2)
+        self.assertEqual(totals["completed"], 1)
+        self.assertEqual(totals["pending"], 1)
+        self.assertEqual(len(stub.requests), 2)
+        self.assertNotIn("/transaction/verify/tx-fresh", [path for _, path, *_ in stub.requests])
+        statuses = dict(Payment.objects.values_list("transaction_id", "status"))
+        self.assertEqual(statuses["tx-fresh"], "PENDING")
+        self.assertEqual(sorted([statuses["tx-paid"], statuses["tx-open"]]), ["COMPLETED", "PENDING"])
+        # Re-checked payments go to the back of the queue.
+        self.assertEqual(reconcile_pending_payments()["checked"], 0)
+
+    def test_reconcile_counts_malformed_replies_as_errors(self):
+        stale = timedelta(hours=1)
+        self.make_payment("tx-bad", age=stale)
+        self.make_payment("tx-paid", age=stale)
+        replies = [
+            (200, {"status": "success", "data": None}, 0),
+            (200, {"status": "success", "data": {"status": "successful"}}, 0),
+        ]
+        with StubGateway(replies) as stub, override_settings(CHAPA_BASE_URL=stub.url):
+            totals = reconcile_pending_payments(concurrency=1)
+
+        self.assertEqual(totals["checked"], 2)
+        self.assertEqual(totals["errors"], 1)
+        self.assertEqual(totals["completed"], 1)
+        self.assertEqual(Payment.objects.get(transaction_id="tx-bad").status, "PENDING")
+
+    def test_reconcile_does_not_count_payments_settled_elsewhere(self):
+        payment = self.make_payment("tx-raced", age=timedelta(hours=1))
+        # A webhook settles the payment after the run claimed it.
+        Payment.objects.filter(pk=payment.pk).update(status="COMPLETED")
+
+        with patch.object(payments, "_claim_stale", side_effect=[[payment], []]), patch.object(
+            payments, "_gateway_status", return_value="COMPLETED"
+        ):
+            totals = reconcile_pending_payments(concurrency=1)
+        self.assertEqual(totals["checked"], 1)
+        self.assertEqual(totals["completed"], 0)
+
+
+@override_settings(TASK_EXECUTOR_EAGER=True)
+class IdempotentPaymentTests(TestCase):
+    """Repeated initiate/verify calls do not repeat gateway calls or emails."""
+
+    def setUp(self):
+        cache.clear()
+        self.guest = User.objects.create_user(username="guest", email="guest@example.com")
+        listing = make_listing(User.objects.create_user(username="host"))
+        self.booking = Booking.objects.create(
+            listing=listing, user=self.guest, check_in=date.today(),
+            check_out=date.today() + timedelta(days=1), guests=1, price=Decimal("100"),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.guest)
+
+    def initiate(self, booking_id=None, **headers):
+        return self.client.post(
+            f"/api/payments/initiate/{booking_id or self.booking.id}/", **headers
+        )
+
+    def test_verify_settled_payment_skips_gateway_and_email(self):
+        Payment.objects.create(booking=self.booking, amount=100, transaction_id="tx-1")
+        success = (200, {"status": "success", "data": {"status": "successful"}}, 0)
+        with StubGateway([success]) as stub, override_settings(CHAPA_BASE_URL=stub.url):
+            with self.captureOnCommitCallbacks(execute=True):
+                responses = [self.client.get("/api/payments/verify/tx-1/") for _ in range(3)]
+
+        self.assertEqual([r.json()["payment_status"] for r in responses], ["COMPLETED"] * 3)
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual(OutboundEmail.objects.filter(subject="Payment Successful").count(), 1)
+
+    def test_refund_invalidates_cached_status(self):
+        payment = Payment.objects.create(
+            booking=self.booking, amount=100, transaction_id="tx-1", status="COMPLETED"
+        )
+        self.client.get("/api/payments/verify/tx-1/")
+        payment.status = "REFUNDED"
+        payment.save()
+        self.assertEqual(self.client.get("/api/payments/verify/tx-1/").json()["payment_status"], "REFUNDED")
+
+    def test_initiate_reuses_pending_checkout(self):
+        success = (200, {"status": "success", "data": {"id": "tx-9", "checkout_url": "https://pay/9"}}, 0)
+        with StubGateway([success]) as stub, override_settings(CHAPA_BASE_URL=stub.url):
+            first = self.initiate()
+            second = self.initiate()
+
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual(first.json()["payment_link"], "https://pay/9")
+        self.assertEqual(second.json()["payment_link"], "https://pay/9")
+        self.assertEqual(first.json()["payment_id"], second.json()["payment_id"])
+        self.assertEqual(Payment.objects.filter(booking=self.booking).count(), 1)
+
+        Payment.objects.filter(transaction_id="tx-9").update(status="COMPLETED")
+        self.assertEqual(self.initiate().status_code, 409)
+
+    def test_initiate_rechecks_for_a_checkout_once_locked(self):
+        lock = views.lock_initiation
+
+        def lock_after_other_call_finished(booking_id):
+            # Another call opened a checkout and released the lock just before.
+            Payment.objects.create(
+                booking=self.booking, amount=100, transaction_id="tx-other", checkout_url="https://pay/other"
+            )
+            return lock(booking_id)
+
+        with StubGateway([(200, {}, 0)]) as stub, override_settings(CHAPA_BASE_URL=stub.url):
+            with patch.object(views, "lock_initiation", lock_after_other_call_finished):
+                response = self.initiate()
+        self.assertEqual(response.json()["payment_link"], "https://pay/other")
+        self.assertEqual(stub.requests, [])
+
+    def test_key_released_during_a_claim_is_claimed_again(self):
+        create = IdempotencyKey.objects.create
+        calls = []
+
+        def create_after_release(**kwargs):
+            # The first insert collides with a row that is gone by the lookup.
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise IntegrityError("duplicate key")
+            return create(**kwargs)
+
+        with patch.object(IdempotencyKey.objects, "create", create_after_release):
+            record, stored = idempotency.begin("key-1", self.guest, "fingerprint")
+        self.assertIsNone(stored)
+        self.assertEqual(record.key, "key-1")
+        self.assertEqual(len(calls), 2)
+
+    def test_idempotency_key_replays_and_rejects_reuse(self):
+        failure = (200, {"status": "failed", "message": "declined"}, 0)
+        with StubGateway([failure]) as stub, override_settings(CHAPA_BASE_URL=stub.url):
+            first = self.initiate(HTTP_IDEMPOTENCY_KEY="key-1")
+            replay = self.initiate(HTTP_IDEMPOTENCY_KEY="key-1")
+            other = Booking.objects.create(
+                listing=self.booking.listing, user=self.guest, check_in=date.today(),
+                check_out=date.today() + timedelta(days=1), guests=1, price=Decimal("100"),
+            )
+            reused = self.initiate(booking_id=other.id, HTTP_IDEMPOTENCY_KEY="key-1")
+
+        self.assertEqual(first.status_code, 400)
+        self.assertEqual(replay.status_code, 400)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(reused.status_code, 422)
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_expired_keys_are_purged(self):
+        self.initiate(booking_id=999999, HTTP_IDEMPOTENCY_KEY="gone")  # 404s release the key
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        IdempotencyKey.objects.create(
+            key="old", user=self.guest, fingerprint="x", status_code=200, response={},
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(purge_expired_keys(), 1)
+
+
+class RequestMetricsTests(TestCase):
+    """RequestMetricsMiddleware logs and aggregates per-request timings."""
+
+    def setUp(self):
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+        host = User.objects.create_user(username="host")
+        make_listing(host)
+
+    def test_request_is_logged_with_query_count(self):
+        with self.assertLogs("alx_travel_app.requests", "DEBUG") as logs, CaptureQueriesContext(
+            connection
+        ) as queries:
+            response = APIClient().get("/api/listings/")
+        self.assertEqual(response.status_code, 200)
+
+        record = logs.records[-1]
+        self.assertEqual(record.route, "listing-list")
+        self.assertEqual(record.status, 200)
+        self.assertEqual(record.db_queries, len(queries.captured_queries))
+        self.assertIn("route=listing-list", record.getMessage())
+
+    def test_only_slow_requests_are_logged_at_info(self):
+        with self.assertLogs("alx_travel_app.requests", "DEBUG") as logs:
+            APIClient().get("/api/listings/")
+            with override_settings(REQUEST_LOG_SLOW_MS=0):
+                APIClient().get("/api/listings/")
+        self.assertEqual([record.levelname for record in logs.records], ["DEBUG", "INFO"])
+
+    @override_settings(DEBUG=True)
+    def test_metrics_endpoint_renders_route_histograms(self):
+        APIClient().get("/api/listings/")
+        body = APIClient().get("/metrics").content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",route="listing-list",status="200"} 1',
+            body,
+        )
+        self.assertIn('http_request_db_queries_bucket{method="GET",route="listing-list",le="+Inf"} 1', body)
+
+    def test_metrics_endpoint_is_closed_without_token(self):
+        self.assertEqual(APIClient().get("/metrics").status_code, 403)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_endpoint_requires_configured_token(self):
+        self.assertEqual(APIClient().get("/metrics").status_code, 403)
+        response = APIClient().get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        response = APIClient().get("/metrics", HTTP_AUTHORIZATION="Bearer s\u00e9cret")
+        self.assertEqual(response.status_code, 403)
+
+
+class SyntheticFixtureTests(TestCase):
+    """seed_fixture builds a consistent, reproducible dataset for bench_api."""
+
+    SIZE = FixtureSize(users=5, listings=8, bookings=12, reviews=10, payments=6)
+
+    def test_fixture_counts_and_derived_data(self):
+        counts = seed_fixture(self.SIZE, seed=3, batch_size=4)
+        self.assertEqual(counts, {"users": 5, "listings": 8, "bookings": 12, "reviews": 10, "payments": 6})
+        self.assertEqual(Payment.objects.filter(transaction_id__startswith="bench-3-tx-").count(), 6)
+        for listing in Listing.objects.all():
+            ratings = list(listing.reviews.values_list("rating", flat=True))
+            self.assertEqual(listing.reviews_count, len(ratings))
+            self.assertEqual(listing.rating_sum, sum(ratings))
+        self.assertTrue(ListingOccupancy.objects.exists())
+
+    def test_same_seed_reproduces_rows(self):
+        def snapshot():
+            return (
+                list(Listing.objects.order_by("pk").values_list("slug", "price", "location", "available_to")),
+                list(Booking.objects.order_by("pk").values_list("price", "check_in")),
+                list(Payment.objects.order_by("pk").values_list("transaction_id", "completed_at")),
+            )
+
+        seed_fixture(self.SIZE, seed=3, anchor=date(2030, 1, 1))
+        first = snapshot()
+        User.objects.filter(username__startswith="bench-3-").delete()
+        seed_fixture(self.SIZE, seed=3, anchor=date(2030, 1, 1))
+        self.assertEqual(snapshot(), first)
+
+    def test_bench_command_writes_results(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.json")
+            call_command(
+                "bench_api", "--scale", "10", "--requests", "3", "--warmup", "0", "--json", path,
+                stdout=StringIO(),
+            )
+            with open(path) as fh:
+                results = json.load(fh)
+
+        self.assertEqual(results["meta"]["rows"]["listings"], 10)
+        for name, row in results["scenarios"].items():
+            self.assertEqual(sum(row["statuses"].values()), 3, name)
+            self.assertTrue(all(code.startswith("2") for code in row["statuses"]), name)
+            self.assertLessEqual(row["p50_ms"], row["p99_ms"])
+        # Bookings made by the booking_create scenario are removed again.
+        self.assertEqual(Booking.objects.count(), 20)
+
+
+class BulkSeedCommandTests(TestCase):
+    """seed and seed_users generate rows in memory and bulk insert them in chunks."""
+
+    def test_seed_users_bulk_inserts_with_one_password(self):
+        User.objects.create_user(username="existing")
+        call_command("seed_users", "--count", "7", "--batch-size", "3", stdout=StringIO())
+        users = User.objects.exclude(username="existing")
+        self.assertEqual(users.count(), 7)
+        self.assertEqual(len(set(users.values_list("password", flat=True))), 1)
+        self.assertTrue(users.first().check_password("password123"))
+
+    def test_seed_bulk_mode_counts_and_derived_data(self):
+        out = StringIO()
+        call_command(
+            "seed", "--users", "4", "--listings", "6", "--bookings", "9", "--reviews", "6",
+            "--batch-size", "4", stdout=out,
+        )
+        self.assertIn("rows/s", out.getvalue())
+        self.assertEqual(Listing.objects.count(), 6)
+        self.assertEqual(Booking.objects.count(), 9)
+        self.assertEqual(Payment.objects.count(), 9)
+        self.assertEqual(Review.objects.count(), 6)
+        self.assertEqual(len(set(Listing.objects.values_list("slug", flat=True))), 6)
+        for listing in Listing.objects.all():
+            self.assertEqual(listing.reviews_count, listing.reviews.count())
+
+    def test_seed_adds_bookings_to_existing_listings(self):
+        host = User.objects.create_user(username="host")
+        listing = make_listing(host, slug="existing")
+        Review.objects.create(listing=listing, user=host, rating=5)
+        call_command("seed", "--listings", "0", "--bookings", "3", "--reviews", "1", stdout=StringIO())
+        self.assertEqual(listing.bookings.count(), 3)
+        # The only possible reviewer already reviewed the listing.
+        self.assertEqual(Review.objects.count(), 1)
+
+    def test_same_seed_reproduces_sharded_rows(self):
+        def snapshot():
+            return (
+                list(User.objects.order_by("pk").values_list("pk", "username", "password")),
+                list(Listing.objects.order_by("pk").values_list("pk", "slug", "host_id", "price", "available_to")),
+                list(Booking.objects.order_by("pk").values_list("pk", "listing_id", "user_id", "price", "check_in")),
+                list(Payment.objects.order_by("pk").values_list("booking_id", "transaction_id", "completed_at")),
+                list(Review.objects.order_by("pk").values_list("listing_id", "user_id", "rating")),
+            )
+
+        args = [
+            "--seed", "5", "--anchor-date", "2030-01-01",
+            "--users", "5", "--listings", "7", "--bookings", "11", "--reviews", "7",
+        ]
+        with patch.object(seeding, "SHARD_SIZE", 3):
+            call_command("seed", *args, stdout=StringIO())
+            first = snapshot()
+            for model in (User, Listing, Booking, Payment, Review):
+                model.objects.all().delete()
+            call_command("seed", *args, "--batch-size", "2", stdout=StringIO())
+        self.assertEqual(snapshot(), first)
+        # Shards only point at rows that exist.
+        self.assertEqual(Booking.objects.filter(listing__isnull=False, user__isnull=False).count(), 11)
+        # Dates follow --anchor-date, not the day the command runs.
+        self.assertFalse(Listing.objects.exclude(available_from=date(2030, 1, 1)).exists())
+        self.assertFalse(Booking.objects.filter(check_in__lte=date(2030, 1, 1)).exists())
+        self.assertEqual(
+            set(Payment.objects.exclude(completed_at=None).values_list("completed_at", flat=True)),
+            {seeding.anchor_time(date(2030, 1, 1))},
+        )
+        self.assertEqual(Payment.objects.filter(booking__isnull=False).count(), 11)
+
+    def test_same_seed_can_run_twice(self):
+        args = ["--seed", "5", "--users", "3", "--listings", "2", "--bookings", "4", "--reviews", "0"]
+        call_command("seed", *args, stdout=StringIO())
+        call_command("seed", *args, stdout=StringIO())
+        self.assertEqual(Payment.objects.values("transaction_id").distinct().count(), 8)
+
+    def test_shards_cover_contiguous_id_ranges(self):
+        first_ids = {Listing: 100, Booking: 200, Payment: 300, Review: 400}
+        with patch.object(seeding, "SHARD_SIZE", 4):
+            shards = seeding.plan_listing_shards(
+                "run", 1, first_ids, 10, 25, 9, [], users_below=50, anchor=date(2030, 1, 1)
+            )
+        self.assertEqual([shard.listings for shard in shards], [4, 4, 2])
+        self.assertEqual(sum(shard.bookings for shard in shards), 25)
+        self.assertEqual(sum(shard.reviews for shard in shards), 9)
+        for before, after in zip(shards, shards[1:]):
+            self.assertEqual(after.listing_first_id, before.listing_first_id + before.listings)
+            self.assertEqual(after.booking_first_id, before.booking_first_id + before.bookings)
+            self.assertEqual(after.payment_first_id - 300, after.booking_first_id - 200)
+
+    def test_seed_without_users_reports_error(self):
+        out = StringIO()
+        call_command("seed", stdout=out)
+        self.assertIn("No users found", out.getvalue())
+        self.assertFalse(Listing.objects.exists())
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    """Bookings and payments stream as CSV/NDJSON in fixed-size chunks."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="x", email="admin@example.com")
+        self.guest = User.objects.create_user(username="guest", email="guest@example.com")
+        listing = make_listing(self.admin, title="Sea View")
+        self.bookings = []
+        for n, status in enumerate(["confirmed", "pending", "confirmed", "cancelled", "confirmed"]):
+            booking = Booking.objects.create(
+                listing=listing, user=self.guest, check_in=date(2030, 1, 1 + n),
+                check_out=date(2030, 1, 2 + n), guests=1, price=Decimal("100.00"), status=status,
+            )
+            Payment.objects.create(booking=booking, amount=booking.price, transaction_id=f"tx-{n}")
+            self.bookings.append(booking)
+        Booking.objects.filter(pk=self.bookings[0].pk).update(created_at=timezone.now() - timedelta(days=10))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_export_joins_title_and_email_with_one_query_per_chunk(self):
+        with CaptureQueriesContext(connection) as queries:
+            body = self.read(self.client.get("/api/exports/bookings.csv"))
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual([int(row["id"]) for row in rows], [b.pk for b in self.bookings])
+        self.assertEqual(rows[0]["listing_title"], "Sea View")
+        self.assertEqual(rows[0]["user_email"], "guest@example.com")
+        # 5 rows in chunks of 2 -> 3 queries, whatever the row count.
+        self.assertEqual(sum("listings_booking" in q["sql"] for q in queries.captured_queries), 3)
+
+    def test_filters_by_status_and_date(self):
+        today = timezone.localdate().isoformat()
+        body = self.read(self.client.get("/api/exports/bookings.ndjson", {"status": "confirmed", "start": today}))
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [self.bookings[2].pk, self.bookings[4].pk])
+
+        response = self.client.get("/api/exports/payments.csv", {"status": "confirmed"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_is_admin_only(self):
+        self.client.force_authenticate(self.guest)
+        self.assertEqual(self.client.get("/api/exports/payments.csv").status_code, 403)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get("/api/exports/users.csv").status_code, 404)
+
+    def test_export_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "payments.ndjson")
+            out = StringIO()
+            call_command("export", "payments", "--format", "ndjson", "--output", path, stdout=out)
+            with open(path) as fh:
+                rows = [json.loads(line) for line in fh]
+        self.assertIn("Exported 5 payments", out.getvalue())
+        self.assertEqual(rows[0]["user_email"], "guest@example.com")
+        self.assertEqual(rows[0]["transaction_id"], "tx-0")
+
+
+class ListingImportTests(TestCase):
+    """CSV/NDJSON uploads create listings in chunks and upsert by slug."""
+
+    HEADER = "slug,title,description,location,listing_type,price,capacity\n"
+
+    def setUp(self):
+        self.host = User.objects.create_user(username="host", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.host)
+
+    def upload(self, body, name="listings.csv"):
+        upload = SimpleUploadedFile(name, body.encode())
+        return self.client.post("/api/listings/import/", {"file": upload}, format="multipart")
+
+    def test_csv_creates_listings_with_unique_slugs(self):
+        make_listing(self.host, title="Sea View", slug="sea-view")
+        body = self.HEADER + "".join(
+            f",Sea View,Nice.,Lagos,hotel,{100 + n},2\n" for n in range(3)
+        )
+        with override_settings(LISTING_IMPORT_CHUNK_SIZE=2), CaptureQueriesContext(connection) as queries:
+            response = self.upload(body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual(
+            sorted(Listing.objects.values_list("slug", flat=True)),
+            ["sea-view", "sea-view-2", "sea-view-3", "sea-view-4"],
+        )
+        # Queries grow with the number of chunks, not rows.
+        self.assertLess(len(queries), 20)
+
+    def test_slug_rows_update_own_listing_and_skip_others(self):
+        mine = make_listing(self.host, title="Old", slug="mine")
+        other = User.objects.create_user(username="other")
+        make_listing(other, title="Theirs", slug="theirs")
+        body = self.HEADER + (
+            "mine,New Title,Nice.,Abuja,hotel,250,4\n"
+            "theirs,Taken,Nice.,Abuja,hotel,250,4\n"
+            "fresh,Fresh,Nice.,Abuja,tour,80,2\n"
+            "fresh,Again,Nice.,Abuja,tour,80,2\n"
+        )
+        response = self.upload(body)
+        self.assertEqual(
+            {key: response.data[key] for key in ("rows", "created", "updated", "failed")},
+            {"rows": 4, "created": 1, "updated": 1, "failed": 2},
+        )
+        self.assertEqual([error["line"] for error in response.data["errors"]], [3, 5])
+        mine.refresh_from_db()
+        self.assertEqual((mine.title, mine.price), ("New Title", Decimal("250.00")))
+        self.assertEqual(Listing.objects.get(slug="theirs").title, "Theirs")
+        self.assertEqual(Listing.objects.get(slug="fresh").host, self.host)
+
+    def test_update_keeps_columns_the_row_leaves_out(self):
+        mine = make_listing(
+            self.host, title="Old", slug="mine", latitude=6.5244, longitude=3.3792,
+            available_from=date(2026, 1, 1), available_to=date(2026, 12, 31),
+            pricing_rules={"weekend_multiplier": "1.2"},
+        )
+        geohash = mine.geohash
+        body = (
+            "slug,title,description,location,listing_type,price,capacity,latitude,longitude\n"
+            "mine,New Title,Nice.,Abuja,hotel,250,4,,\n"
+            "moved,Moved,Nice.,Abuja,hotel,90,2,9.0765,7.3986\n"
+        )
+        make_listing(self.host, title="Moved", slug="moved")
+        response = self.upload(body)
+        self.assertEqual(response.data["updated"], 2)
+
+        mine.refresh_from_db()
+        self.assertEqual((mine.title, mine.price), ("New Title", Decimal("250.00")))
+        self.assertEqual((mine.latitude, mine.longitude, mine.geohash), (6.5244, 3.3792, geohash))
+        self.assertEqual((mine.available_from, mine.available_to), (date(2026, 1, 1), date(2026, 12, 31)))
+        self.assertEqual(mine.pricing_rules, {"weekend_multiplier": "1.2"})
+        moved = Listing.objects.get(slug="moved")
+        self.assertEqual(moved.geohash, geo.geohash_for(9.0765, 7.3986))
+
+    def test_slug_created_by_another_import_meanwhile_is_not_overwritten(self):
+        other = User.objects.create_user(username="other")
+        match_slugs = ListingImporter._match_slugs
+        looked = []
+
+        def racing_match(importer, named):
+            # Another host's import commits "fresh" right after the first lookup;
+            # it survives this chunk's rollback, so it is re-created here.
+            if looked and not Listing.objects.filter(slug="fresh").exists():
+                make_listing(other, title="Theirs", slug="fresh")
+            result = match_slugs(importer, named)
+            if not looked:
+                make_listing(other, title="Theirs", slug="fresh")
+            looked.append(1)
+            return result
+
+        with patch.object(ListingImporter, "_match_slugs", racing_match):
+            response = self.upload(self.HEADER + "fresh,Mine,Nice.,Abuja,tour,80,2\n")
+        self.assertEqual(len(looked), 2)
+        self.assertEqual((response.data["created"], response.data["failed"]), (0, 1))
+        self.assertEqual(Listing.objects.get(slug="fresh").title, "Theirs")
+
+    def test_ndjson_reports_invalid_lines(self):
+        body = "\n".join([
+            json.dumps({"title": "Ok", "description": "d", "location": "Lagos",
+                        "listing_type": "hotel", "price": "90", "capacity": 2}),
+            "{not json",
+            json.dumps({"title": "No price", "description": "d", "location": "Lagos",
+                        "listing_type": "hotel", "capacity": 2}),
+        ])
+        response = self.upload(body, name="listings.ndjson")
+        self.assertEqual((response.data["created"], response.data["failed"]), (1, 2))
+        self.assertEqual(response.data["errors"][0], {"line": 2, "errors": {"non_field_errors": ["Invalid JSON."]}})
+        self.assertIn("price", response.data["errors"][1]["errors"])
+
+    def test_import_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "listings.csv")
+            with open(path, "w") as fh:
+                fh.write(self.HEADER + ",Garden Flat,Nice.,Lagos,hotel,120,2\n,Bad,Nice.,Lagos,castle,1,1\n")
+            out = StringIO()
+            call_command("import_listings", path, "--host", "host", stdout=out)
+        self.assertIn("1 created, 0 updated, 1 failed", out.getvalue())
+        self.assertIn("Line 3", out.getvalue())
+        self.assertTrue(Listing.objects.filter(slug="garden-flat", host=self.host).exists())
+
+
+class ListingFullTextSearchTests(TestCase):
+    """Keyword search is ranked, filterable and kept in sync with listing writes."""
+
+    def setUp(self):
+        self.host = User.objects.create_user(username="host", password="x")
+        self.title_hit = make_listing(self.host, title="Garden Cottage", description="Quiet stay.")
+        self.text_hit = make_listing(self.host, title="City Flat", description="Shared garden out back.")
+        self.tour = make_listing(self.host, title="Garden Walk", listing_type="tour", description="Guided.")
+        make_listing(self.host, title="Beach Hut", description="Sea view.")
+        self.client = APIClient()
+
+    def search(self, **params):
+        response = self.client.get("/api/listings/search/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data["results"]]
+
+    def test_ranks_title_matches_first_and_combines_with_filters(self):
+        self.assertEqual(self.search(q="garden", listing_type="hotel"), [self.title_hit.pk, self.text_hit.pk])
+        self.assertEqual(self.search(q="GARDEN walk!"), [self.tour.pk, self.title_hit.pk, self.text_hit.pk])
+        self.assertEqual(self.search(q="garden", min_price="150"), [])
+
+    def test_query_must_contain_a_word(self):
+        self.assertEqual(self.client.get("/api/listings/search/").status_code, 400)
+        self.assertEqual(self.client.get("/api/listings/search/", {"q": '"*-'}).status_code, 400)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.title_hit.title = "Lake Cottage"
+        self.title_hit.save()
+        self.text_hit.delete()
+        self.assertEqual(self.search(q="garden"), [self.tour.pk])
+        self.assertEqual(self.search(q="lake"), [self.title_hit.pk])
+
+    def test_bulk_imported_listings_are_indexed(self):
+        self.client.force_authenticate(self.host)
+        upload = SimpleUploadedFile(
+            "listings.csv",
+            b"title,description,location,listing_type,price,capacity\nTreehouse,Nice.,Lagos,hotel,90,2\n",
+        )
+        self.client.post("/api/listings/import/", {"file": upload}, format="multipart")
+        self.assertEqual(self.search(q="treehouse"), [Listing.objects.get(title="Treehouse").pk])
+
+
+@override_settings(TASK_EXECUTOR_EAGER=True)
+class AutocompleteTests(TestCase):
+    """Autocomplete answers from memory and follows changes published by other workers."""
+
+    def setUp(self):
+        cache.clear()
+        self.host = User.objects.create_user(username="host", password="x")
+        self.cottage = make_listing(self.host, title="Garden Cottage", location="Lagos")
+        self.flat = make_listing(self.host, title="City Garden Flat", location="Lagos")
+        make_listing(self.host, title="Gardener's Rest", location="Port Harcourt")
+        self.index = autocomplete.AutocompleteIndex()
+        self.index.rebuild()
+        self.client = APIClient()
+
+    def suggest(self, **params):
+        with patch.object(autocomplete, "index", self.index):
+            response = self.client.get("/api/listings/autocomplete/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"]
+
+    def test_suggestions_never_query_the_database(self):
+        with self.assertNumQueries(0):
+            titles = self.suggest(q="gard")
+            locations = self.suggest(q="har", field="location")
+        self.assertEqual([row["title"] for row in titles], ["Garden Cottage", "Gardener's Rest", "City Garden Flat"])
+        self.assertEqual(locations, [{"location": "Port Harcourt", "listings": 1}])
+        self.assertEqual([row["id"] for row in self.suggest(q="garden c")], [self.cottage.pk, self.flat.pk])
+        self.assertEqual(self.suggest(q="l", field="location"), [{"location": "Lagos", "listings": 2}])
+
+    def test_published_changes_reach_other_workers_without_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_listing(self.host, title="Garden Loft", location="Accra")
+            self.cottage.delete()
+        with self.assertNumQueries(0):
+            titles = [row["title"] for row in self.suggest(q="garden")]
+        self.assertEqual(titles, ["Garden Loft", "Gardener's Rest", "City Garden Flat"])
+        self.assertEqual(self.suggest(q="acc", field="location"), [{"location": "Accra", "listings": 1}])
+
+    @override_settings(TASK_EXECUTOR_EAGER=False)
+    def test_cold_index_is_built_in_the_background(self):
+        cold = autocomplete.AutocompleteIndex()
+        with patch.object(autocomplete.executor, "offer", return_value=True) as offer, self.assertNumQueries(0):
+            cold.sync()
+            cold.sync()
+            self.assertEqual(cold.suggest_titles("garden"), [])
+        offer.assert_called_once_with(cold._rebuild_in_background)
+
+        cold._rebuild_in_background()
+        self.assertEqual(len(cold.suggest_titles("garden")), 3)
+
+    @override_settings(TASK_EXECUTOR_EAGER=False)
+    def test_rebuild_is_deferred_when_the_task_queue_is_full(self):
+        cold = autocomplete.AutocompleteIndex()
+        with patch.object(autocomplete.executor, "offer", return_value=False) as offer, self.assertNumQueries(0):
+            cold.sync()
+            cold.sync()
+        # Never built on the request thread, and retried on the next sync.
+        self.assertEqual(cold.suggest_titles("garden"), [])
+        self.assertEqual(offer.call_count, 2)
+
+    def test_unpublished_bulk_writes_trigger_a_rebuild(self):
+        Listing.objects.bulk_create([Listing(title="Garden Barn", description="d", price=Decimal("50"))])
+        autocomplete.invalidate()
+        self.assertIn("Garden Barn", [row["title"] for row in self.suggest(q="garden")])
+
+
+class GeoSearchTests(TestCase):
+    """?near=lat,lng&radius=km keeps listings within a great-circle distance."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.host = User.objects.create_user(username="host")
+        # Points due north of Lagos centre (6.5244, 3.3792): 0.009 deg is about 1 km.
+        self.centre = make_listing(self.host, title="Centre", latitude=6.5244, longitude=3.3792)
+        self.near = make_listing(self.host, title="Near", latitude=6.5514, longitude=3.3792)  # 3 km
+        self.far = make_listing(
+            self.host, title="Far tour", listing_type="tour", latitude=6.7044, longitude=3.3792
+        )  # 20 km
+        make_listing(self.host, title="Somewhere")  # no coordinates
+
+    def _titles(self, params):
+        response = self.client.get("/api/listings/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(row["title"] for row in response.json()["results"])
+
+    def test_geohash_follows_coordinates(self):
+        self.assertEqual(self.centre.geohash, geo.encode(6.5244, 3.3792))
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.centre.latitude = self.centre.longitude = None
+        self.centre.save()
+        self.assertEqual(Listing.objects.get(pk=self.centre.pk).geohash, "")
+
+    def test_radius(self):
+        self.assertEqual(self._titles({"near": "6.5244,3.3792"}), ["Centre", "Near"])  # 10 km default
+        self.assertEqual(self._titles({"near": "6.5244,3.3792", "radius": "2.9"}), ["Centre"])
+        self.assertEqual(self._titles({"near": "6.5244,3.3792", "radius": "25"}), ["Centre", "Far tour", "Near"])
+        self.assertEqual(self._titles({"near": "6.5244,3.3792", "radius": "25", "listing_type": "tour"}), ["Far tour"])
+
+    @override_settings(GEO_MAX_RESULTS=2)
+    def test_keeps_the_nearest(self):
+        self.assertEqual(self._titles({"near": "6.7044,3.3792", "radius": "25"}), ["Far tour", "Near"])
+
+    def test_invalid_parameters(self):
+        for params in ({"near": "6.5"}, {"near": "91,3"}, {"radius": "5"}, {"near": "6.5,3.3", "radius": "0"}):
+            response = self.client.get("/api/listings/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_covering_cells_contain_the_circle(self):
+        for latitude, longitude, radius in ((6.5244, 3.3792, 10), (-1.29, 179.99, 5), (89.9, 0, 50)):
+            cells = geo.covering_cells(latitude, longitude, radius)
+            self.assertLessEqual(len(cells), 9)
+            # Points at the radius in each direction all fall in a covering cell.
+            for d_lat, d_lng in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                degrees = radius / 111.2 * 0.999
+                lat = max(min(latitude + d_lat * degrees, 90), -90)
+                lng = longitude + d_lng * degrees / max(math.cos(math.radians(lat)), 1e-9)
+                lng = (lng + 180) % 360 - 180
+                point = geo.encode(lat, lng)
+                self.assertTrue(any(point.startswith(cell) for cell in cells), (latitude, longitude, d_lat, d_lng))
+
+    def test_backfill_command(self):
+        unlocated = make_listing(self.host, title="Lagos flat", location="lagos")
+        Listing.objects.filter(pk=self.near.pk).update(geohash="")  # written with raw SQL
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as fh:
+            fh.write("name,latitude,longitude\nLagos,6.5,3.4\n")
+        self.addCleanup(os.remove, fh.name)
+        out = StringIO()
+        call_command("backfill_geo", "--gazetteer", fh.name, stdout=out)
+        self.assertIn("✅", out.getvalue())
+        unlocated.refresh_from_db()
+        self.near.refresh_from_db()
+        self.assertEqual((unlocated.latitude, unlocated.longitude), (6.5, 3.4))
+        self.assertEqual(unlocated.geohash, geo.encode(6.5, 3.4))
+        self.assertEqual(self.near.geohash, geo.encode(6.5514, 3.3792))
+
+
+class PricingTests(TestCase):
+    """Quotes apply a listing's pricing rules night by night."""
+
+    RULES = {
+        "weekend_multiplier": "1.50",
+        "seasons": [
+            {"start": "2030-01-06", "end": "2030-01-07", "multiplier": "2.00"},
+            {"start": "2030-01-07", "end": "2030-01-07", "multiplier": "0.50"},
+        ],
+        "stay_discounts": [{"min_nights": 3, "percent": "5"}, {"min_nights": 7, "percent": "10"}],
+        "included_guests": 2,
+        "extra_guest_fee": "20.00",
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.host = User.objects.create_user(username="host")
+        self.guest = User.objects.create_user(username="guest")
+        self.listing = make_listing(
+            self.host, price=Decimal("100.00"), capacity=6, pricing_rules=self.RULES,
+            available_from=date(2030, 1, 1), available_to=date(2030, 12, 31),
+        )
+        self.flat = make_listing(self.host, title="Flat rate", price=Decimal("80.00"))
+
+    def test_rules(self):
+        # Tue 1 .. Mon 7 January 2030: Fri/Sat at 150, Sun at 200, Mon at 50 (the later season).
+        quote = quote_stay(self.listing, date(2030, 1, 1), date(2030, 1, 8), 4)
+        self.assertEqual(quote.nights, 7)
+        self.assertEqual(quote.nightly_total, Decimal("850.00"))
+        self.assertEqual(quote.discount, Decimal("85.00"))
+        self.assertEqual(quote.guest_fees, Decimal("280.00"))
+        self.assertEqual(quote.total, Decimal("1045.00"))
+
+    def test_many_stays_match_single_quotes(self):
+        stays = [
+            (self.listing, date(2030, 1, 1) + timedelta(days=n), date(2030, 1, 3) + timedelta(days=2 * n), 1 + n % 4)
+            for n in range(12)
+        ] + [(self.flat, date(2030, 1, 4), date(2030, 1, 6), 5)]
+        self.assertEqual(quote_stays(stays), [quote_stay(*stay) for stay in stays])
+        self.assertEqual(quote_stays(stays)[-1].total, Decimal("160.00"))
+
+    def test_quote_endpoint(self):
+        response = self.client.post("/api/listings/quote/", [
+            {"listing_id": self.listing.pk, "check_in": "2030-01-01", "check_out": "2030-01-08", "guests": 4},
+            {"listing_id": self.flat.pk, "check_in": "2030-01-01", "check_out": "2030-01-03"},
+        ], format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([row["total"] for row in response.json()], ["1045.00", "160.00"])
+
+        response = self.client.post("/api/listings/quote/", [
+            {"listing_id": 999999, "check_in": "2030-01-01", "check_out": "2030-01-03"},
+            {"listing_id": self.flat.pk, "check_in": "2030-01-03", "check_out": "2030-01-03"},
+        ], format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_bookings_are_priced_on_the_server(self):
+        self.client.force_authenticate(self.guest)
+        response = self.client.post("/api/bookings/", {
+            "listing_id": self.listing.pk, "check_in": "2030-01-01", "check_out": "2030-01-08",
+            "guests": 4, "price": "1.00",
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()["price"], "1045.00")
+
+        booking_id = response.json()["id"]
+        Listing.objects.filter(pk=self.listing.pk).update(price=Decimal("500.00"))
+        response = self.client.patch(f"/api/bookings/{booking_id}/", {"status": "confirmed"}, format="json")
+        self.assertEqual(response.json()["price"], "1045.00")  # not requoted
+        response = self.client.patch(f"/api/bookings/{booking_id}/", {"guests": 2}, format="json")
+        self.assertEqual(response.json()["price"], quote_stay(
+            Listing.objects.get(pk=self.listing.pk), date(2030, 1, 1), date(2030, 1, 8), 2
+        ).total.to_eng_string())
+
+    def test_bookings_are_bounded_like_quotes(self):
+        self.client.force_authenticate(self.guest)
+        long_stay = {"listing_id": self.flat.pk, "check_in": "2030-01-01", "check_out": "2031-01-02", "guests": 1}
+        self.assertEqual(self.client.post("/api/bookings/", long_stay, format="json").status_code, 400)
+        self.assertEqual(self.client.post("/api/bookings/bulk/", [long_stay], format="json").status_code, 400)
+
+        luxury = make_listing(
+            self.host, title="Palace", price=Decimal("99999999.00"), capacity=6,
+            available_from=date(2030, 1, 1), available_to=date(2030, 12, 31),
+        )
+        stay = {"listing_id": luxury.pk, "check_in": "2030-01-01", "check_out": "2030-01-03", "guests": 1}
+        response = self.client.post("/api/bookings/", stay, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("more than a booking can hold", response.json()["non_field_errors"][0])
+        response = self.client.post("/api/bookings/bulk/", [stay], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_quote_endpoint_is_throttled(self):
+        cache.clear()
+        body = [{"listing_id": self.flat.pk, "check_in": "2030-01-01", "check_out": "2030-01-03"}]
+        with patch.object(QuoteRateThrottle, "THROTTLE_RATES", {"quote": "2/min"}):
+            statuses = [self.client.post("/api/listings/quote/", body, format="json").status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_rules_are_validated(self):
+        self.client.force_authenticate(self.host)
+        response = self.client.patch(f"/api/listings/{self.flat.pk}/", {
+            "pricing_rules": {"seasons": [{"start": "2030-02-01", "end": "2030-01-01", "multiplier": "1.2"}]},
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("pricing_rules", response.json())
+
+
+@override_settings(ANALYTICS_ROLLUP_OVERLAP=0)
+class AnalyticsRollupTests(TestCase):
+    """Daily rollups are refreshed incrementally and served per host and listing."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.host = User.objects.create_user(username="host")
+        self.other_host = User.objects.create_user(username="other")
+        guest = User.objects.create_user(username="guest")
+        self.today = timezone.localdate()
+        window = {"available_from": self.today, "available_to": self.today + timedelta(days=30)}
+        self.villa = make_listing(self.host, title="Villa", capacity=4, **window)
+        self.loft = make_listing(self.host, title="Loft", capacity=4, **window)
+        self.cabin = make_listing(self.other_host, title="Cabin", capacity=4, **window)
+
+        def book(listing, guests, status="confirmed"):
+            return Booking.objects.create(
+                listing=listing, user=guest, check_in=self.today + timedelta(days=1),
+                check_out=self.today + timedelta(days=3), guests=guests, price=Decimal("200"), status=status,
+            )
+
+        self.villa_booking = book(self.villa, 2)
+        book(self.villa, 1, status="pending")
+        book(self.loft, 3)
+        book(self.cabin, 1)
+        Payment.objects.create(
+            booking=self.villa_booking, amount=Decimal("200.00"), status="COMPLETED", transaction_id="tx-1"
+        )
+        Review.objects.create(listing=self.villa, user=guest, rating=4)
+        Review.objects.create(listing=self.loft, user=guest, rating=5)
+        analytics.refresh_rollups()
+
+    def get(self, url, user=None, **params):
+        self.client.force_authenticate(user or self.host)
+        return self.client.get(url, {"end": (self.today + timedelta(days=5)).isoformat(), **params})
+
+    def test_host_totals(self):
+        response = self.get("/api/analytics/host/")
+        self.assertEqual(response.status_code, 200, response.content)
+        totals = response.json()["totals"]
+        self.assertEqual(totals["bookings_confirmed"], 2)
+        self.assertEqual(totals["bookings_pending"], 1)
+        self.assertEqual(Decimal(totals["revenue"]), Decimal("200.00"))
+        self.assertEqual(totals["average_rating"], 4.5)
+        self.assertEqual(totals["guest_nights"], 12)  # villa 3 + loft 3 guests, two nights each
+        self.assertEqual(totals["occupied_nights"], 4)
+        self.assertEqual(len(response.json()["days"]), 3)  # today, and the two booked nights
+
+    def test_listing_analytics_are_private_to_the_host(self):
+        response = self.get(f"/api/analytics/listings/{self.villa.pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["totals"]["bookings_confirmed"], 1)
+        self.assertEqual(self.get(f"/api/analytics/listings/{self.cabin.pk}/").status_code, 404)
+        self.assertEqual(self.get("/api/analytics/host/", host=self.other_host.pk).status_code, 400)
+        self.assertEqual(self.get("/api/analytics/host/", start="2020-01-01").status_code, 400)
+
+    def test_incremental_refresh(self):
+        self.villa_booking.status = "cancelled"
+        self.villa_booking.save()
+        Review.objects.get(listing=self.loft).delete()
+        self.assertEqual(RollupInvalidation.objects.count(), 1)
+
+        self.assertEqual(analytics.refresh_rollups(), {"listings": 2, "hosts": 1})
+        self.assertEqual(analytics.refresh_rollups(), {"listings": 0, "hosts": 0})
+        self.assertFalse(RollupInvalidation.objects.exists())
+        totals = self.get("/api/analytics/host/").json()["totals"]
+        self.assertEqual((totals["bookings_confirmed"], totals["bookings_cancelled"]), (1, 1))
+        self.assertEqual(totals["reviews_count"], 1)
+
+    def test_deleting_a_listing_records_one_invalidation(self):
+        guest = User.objects.get(username="guest")
+        for days in range(3, 23):
+            booking = Booking.objects.create(
+                listing=self.villa, user=guest, check_in=self.today + timedelta(days=days),
+                check_out=self.today + timedelta(days=days + 1), guests=1, price=Decimal("100"),
+            )
+            Payment.objects.create(booking=booking, amount=booking.price, transaction_id=f"tx-d{days}")
+        RollupInvalidation.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.villa.delete()
+        self.assertLess(len(queries), 20)  # no per-booking writes
+        self.assertEqual(list(RollupInvalidation.objects.values_list("host_id", flat=True)), [self.host.pk])
+
+        analytics.refresh_rollups()
+        self.assertEqual(self.get("/api/analytics/host/").json()["totals"]["bookings_confirmed"], 1)
+
+    def test_moving_a_listing_refreshes_both_hosts(self):
+        self.loft.host = self.other_host
+        self.loft.save()
+        analytics.refresh_rollups()
+        self.assertEqual(self.get("/api/analytics/host/").json()["totals"]["bookings_confirmed"], 1)
+        other = self.get("/api/analytics/host/", user=self.other_host).json()["totals"]
+        self.assertEqual(other["bookings_confirmed"], 2)
+
+    def test_failed_rebuild_keeps_the_previous_rollups(self):
+        before = ListingDailyStats.objects.count()
+        with patch.object(analytics, "refresh_hosts", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                analytics.refresh_rollups(rebuild=True)
+        self.assertEqual(ListingDailyStats.objects.count(), before)
+        self.assertTrue(HostDailyStats.objects.exists())
+
+    def test_revenue_is_booked_on_the_completion_day(self):
+        payment = Payment.objects.get(transaction_id="tx-1")
+        self.assertIsNotNone(payment.completed_at)
+        Payment.objects.filter(pk=payment.pk).update(completed_at=payment.completed_at - timedelta(days=2))
+        payment.refresh_from_db()
+        payment.checkout_url = "https://pay/again"
+        payment.save()  # a later edit moves updated_at only
+        analytics.refresh_rollups()
+
+        revenue = dict(
+            ListingDailyStats.objects.filter(listing=self.villa, revenue__gt=0).values_list("date", "revenue")
+        )
+        self.assertEqual(revenue, {self.today - timedelta(days=2): Decimal("200.00")})
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        Booking.objects.filter(listing=self.cabin).delete()
+        analytics.refresh_rollups()
+        def rollups():
+            return list(
+                ListingDailyStats.objects.order_by("listing_id", "date")
+                .values_list("listing_id", "date", *analytics.METRICS)
+            )
+
+        expected = rollups()
+        out = StringIO()
+        call_command("refresh_analytics", "--rebuild", stdout=out)
+        self.assertIn("✅", out.getvalue())
+        self.assertEqual(rollups(), expected)
+        self.assertFalse(HostDailyStats.objects.filter(host=self.other_host).exists())
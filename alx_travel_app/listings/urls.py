@@ -1,10 +1,17 @@
 from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.routers import DefaultRouter
 from .views import (
     ListingViewSet,
     BookingViewSet,
     InitiatePaymentView,
     VerifyPaymentView,
+    ChapaWebhookView,
+    AsyncInitiatePaymentView,
+    AsyncVerifyPaymentView,
+    ExportView,
+    HostAnalyticsView,
+    ListingAnalyticsView,
     UserViewSet,
     UserSignupView,
 )
@@ -20,6 +27,20 @@ urlpatterns = [
     path("users/signup/", UserSignupView.as_view(), name="user-signup"),
     path("payments/initiate/<int:booking_id>/", InitiatePaymentView.as_view(), name="initiate-payment"),
     path("payments/verify/<str:transaction_id>/", VerifyPaymentView.as_view(), name="verify-payment"),
+    path("payments/webhook/", ChapaWebhookView.as_view(), name="chapa-webhook"),
+    path(
+        "payments/async/initiate/<int:booking_id>/",
+        csrf_exempt(AsyncInitiatePaymentView.as_view()),
+        name="async-initiate-payment",
+    ),
+    path(
+        "payments/async/verify/<str:transaction_id>/",
+        AsyncVerifyPaymentView.as_view(),
+        name="async-verify-payment",
+    ),
+    path("exports/<slug:resource>.<slug:file_format>", ExportView.as_view(), name="export"),
+    path("analytics/host/", HostAnalyticsView.as_view(), name="host-analytics"),
+    path("analytics/listings/<int:listing_id>/", ListingAnalyticsView.as_view(), name="listing-analytics"),
 ]
 
 # Include router URLs (listings, bookings, users CRUD)
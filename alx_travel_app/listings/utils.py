@@ -1,12 +1,134 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
 from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BackgroundExecutor:
+    """
+    Bounded in-process task queue served by a small pool of daemon threads.
+
+    Used in sync mode (USE_CELERY=False) so requests do not wait on email
+    delivery. Threads start lazily on the first submit, which keeps the
+    executor safe to import before a pre-forking server forks. When the
+    queue is full the task runs in the caller's thread instead of being lost.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _start(self):
+        with self._lock:
+            if self._threads or self._closed:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work, name=f"task-executor-{index}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._run(*item)
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _run(func, args, kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception("Background task %s failed", getattr(func, "__name__", func))
+        finally:
+            # Worker threads own their DB connections; never leave them open.
+            connections.close_all()
+
+    def submit(self, func, *args, **kwargs):
+        if self._closed:
+            return func(*args, **kwargs)
+        self._start()
+        try:
+            self._queue.put_nowait((func, args, kwargs))
+        except queue.Full:
+            logger.warning("Task queue full; running %s inline", getattr(func, "__name__", func))
+            return func(*args, **kwargs)
+
+    def offer(self, func, *args, **kwargs):
+        """Queue `func` if there is room; return False instead of running it inline."""
+        if self._closed:
+            return False
+        self._start()
+        try:
+            self._queue.put_nowait((func, args, kwargs))
+        except queue.Full:
+            return False
+        return True
+
+    def shutdown(self, timeout=None):
+        """Stop accepting work and wait up to `timeout` seconds for the queue to drain."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+        for _ in threads:
+            # Sentinels queue up behind pending work, so workers finish it first.
+            # A full queue must not hold exit past the deadline; the threads
+            # are daemons and die with the process.
+            try:
+                self._queue.put(_STOP, timeout=remaining())
+            except queue.Full:
+                break
+        for thread in threads:
+            thread.join(remaining())
+        pending = self._queue.qsize()
+        if pending > len(threads):
+            logger.warning("Task executor stopped with about %d tasks still queued", pending)
+
+
+executor = BackgroundExecutor(
+    workers=settings.TASK_EXECUTOR_WORKERS,
+    queue_size=settings.TASK_EXECUTOR_QUEUE_SIZE,
+)
+atexit.register(lambda: executor.shutdown(settings.TASK_EXECUTOR_DRAIN_TIMEOUT))
+
+
+def run_in_background(func, *args, **kwargs):
+    """Run `func` on the local executor once the current transaction commits."""
+    if settings.TASK_EXECUTOR_EAGER:
+        transaction.on_commit(lambda: func(*args, **kwargs))
+    else:
+        transaction.on_commit(lambda: executor.submit(func, *args, **kwargs))
 
 
 def run_task(task_func, *args, **kwargs):
     """
-    Run Celery task asynchronously if USE_CELERY=True,
-    else run synchronously (apply directly).
+    Dispatch a task once the current transaction commits: to Celery if
+    USE_CELERY=True, else to the in-process background executor.
     """
     if getattr(settings, "USE_CELERY", False):
-        return task_func.delay(*args, **kwargs)  # async
+        transaction.on_commit(lambda: task_func.delay(*args, **kwargs))  # async
     else:
-        return task_func(*args, **kwargs)  # sync
+        run_in_background(task_func, *args, **kwargs)  # local thread pool
@@ -1,22 +1,75 @@
+import json
+from datetime import timedelta
+
 import requests
-from django.conf import settings
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.shortcuts import get_object_or_404, redirect
+from django.views import View
 from rest_framework import status, viewsets, permissions, generics
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.throttling import UserRateThrottle
 from rest_framework.views import APIView
 
-from .models import Listing, Booking, Payment
+from . import autocomplete, idempotency
+from .analytics import last_refreshed, summarize
+from .availability import BLOCKING_STATUSES, check_availability
+from .cache import LIST_SCOPE, VersionedCacheMixin
+from .exports import CONTENT_TYPES, EXPORTS, export_queryset, stream_export
+from .filters import ListingSearchFilter, StableOrderingFilter
+from .gateway import GATEWAY_ERRORS, get_async_gateway_client
+from .imports import ListingImporter, format_for, read_rows
+from .models import HostDailyStats, Listing, ListingDailyStats, Booking, Payment
+from .occupancy import listing_calendars
+from .pagination import KeysetPagination, SearchPagination
+from .payments import (
+    PAYMENT_STATUS_MAP,
+    TERMINAL_STATUSES,
+    apply_webhook_event,
+    chapa_initiate_payload,
+    chapa_initiate_payment,
+    chapa_verify_payment,
+    lock_initiation,
+    record_checkout,
+    remember_status,
+    reuse_checkout,
+    settle_payment,
+    status_cache_key,
+    unlock_initiation,
+    verify_webhook_signature,
+)
+from .pricing import quote_stay, quote_stays
+from .search import search_listings
 from .serializers import (
+    AnalyticsQuerySerializer,
+    AutocompleteQuerySerializer,
+    AvailabilityQuerySerializer,
+    BookingBulkItemSerializer,
+    CalendarQuerySerializer,
+    ExportQuerySerializer,
+    HostDailyStatsSerializer,
+    ListingDailyStatsSerializer,
     ListingSerializer,
+    ListingTextSearchSerializer,
+    QuoteRequestSerializer,
+    QuoteSerializer,
     BookingSerializer,
     UserSerializer,
     UserSignupSerializer,
+    booking_price_error,
 )
 from .tasks import (
-    send_payment_confirmation_email,
+    send_bulk_booking_notifications,
     send_booking_confirmation_email,
     send_host_notification_email,
     send_signup_confirmation_email,
@@ -44,132 +97,317 @@ class UserSignupView(generics.CreateAPIView):
         # after saving user, redirect to listings endpoint
         return redirect("/api/listings/")
 
-# ----------------------------
-# Chapa Payment Helpers
-# ----------------------------
-def chapa_initiate_payment(booking):
-    """Prepare and send payment initiation request to Chapa."""
-    url = "https://api.chapa.co/v1/transaction/initialize"
-    headers = {
-        "Authorization": f"Bearer {settings.CHAPA_SECRET_KEY}",
-        "Content-Type": "application/json",
-    }
-    data = {
-        "amount": str(booking.price),
-        "currency": "ETB",
-        "email": booking.user.email,
-        "first_name": booking.user.first_name,
-        "last_name": booking.user.last_name,
-        "tx_ref": f"booking-{booking.id}",
-        "callback_url": f"{settings.FRONTEND_URL}/payment/callback/",
-    }
-    response = requests.post(url, json=data, headers=headers)
-    return response.json(), response.status_code
-
-
-def chapa_verify_payment(transaction_id):
-    """Verify payment status with Chapa."""
-    url = f"https://api.chapa.co/v1/transaction/verify/{transaction_id}"
-    headers = {"Authorization": f"Bearer {settings.CHAPA_SECRET_KEY}"}
-    response = requests.get(url, headers=headers)
-    return response.json(), response.status_code
-
-
 # ----------------------------
 # Payment Views
 # ----------------------------
 class InitiatePaymentView(APIView):
-    """Start a payment flow for a booking."""
+    """
+    Start a payment flow for a booking.
+
+    Idempotent per booking: while a payment is pending its checkout link is
+    returned again instead of opening a new Chapa session. Clients may also
+    send an Idempotency-Key header to have retries replay the first response.
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, booking_id):
-        booking = get_object_or_404(Booking, id=booking_id)
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            data, status_code = self.initiate(booking_id)
+            return Response(data, status=status_code)
+
+        record, stored = idempotency.begin(
+            key, request.user, idempotency.request_fingerprint(request)
+        )
+        if stored is not None:
+            return Response(
+                stored.response,
+                status=stored.status_code,
+                headers={"Idempotent-Replayed": "true"},
+            )
+        try:
+            data, status_code = self.initiate(booking_id)
+        except BaseException:
+            record.delete()
+            raise
+        idempotency.finish(record, status_code, data)
+        return Response(data, status=status_code)
+
+    def initiate(self, booking_id):
+        booking = get_object_or_404(Booking.objects.select_related("user"), id=booking_id)
+
+        existing = reuse_checkout(booking.id)
+        if existing is not None:
+            return existing
+        if not lock_initiation(booking.id):
+            return {"error": "Payment initiation is already in progress."}, status.HTTP_409_CONFLICT
 
         try:
+            # A call that held the lock may have opened a checkout since the check above.
+            existing = reuse_checkout(booking.id)
+            if existing is not None:
+                return existing
             response_data, status_code = chapa_initiate_payment(booking)
-
             if status_code == 200 and response_data.get("status") == "success":
-                transaction_id = response_data["data"]["id"]
+                return record_checkout(booking, response_data)
+            return (
+                {"error": "Failed to initiate payment", "details": response_data},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        except requests.RequestException as e:
+            return {"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+        finally:
+            unlock_initiation(booking.id)
 
-                payment = Payment.objects.create(
-                    transaction_id=transaction_id,
-                    amount=booking.price,
-                    status="PENDING",
-                    booking=booking,
-                )
 
+class VerifyPaymentView(APIView):
+    """
+    Verify the status of a payment transaction with Chapa.
+
+    Only PENDING payments are checked with the gateway; terminal statuses
+    are answered from the cache or the database.
+    """
+    def get(self, request, transaction_id):
+        cached = cache.get(status_cache_key(transaction_id))
+        if cached is not None:
+            return Response({"payment_status": cached, "transaction_id": transaction_id})
+
+        payment = get_object_or_404(
+            Payment.objects.select_related("booking__user"), transaction_id=transaction_id
+        )
+
+        if payment.status not in TERMINAL_STATUSES:
+            try:
+                data, status_code = chapa_verify_payment(transaction_id)
+            except requests.RequestException as e:
                 return Response(
-                    {
-                        "message": "Payment initiated successfully.",
-                        "payment_id": payment.id,
-                        "payment_link": response_data["data"]["checkout_url"],
-                    },
-                    status=status.HTTP_200_OK,
+                    {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
 
-            return Response(
-                {"error": "Failed to initiate payment", "details": response_data},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+            if status_code != 200 or data.get("status") != "success":
+                return Response({"error": data}, status=status.HTTP_400_BAD_REQUEST)
 
-        except requests.RequestException as e:
-            return Response(
-                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+            # Sends the confirmation email only on the PENDING -> COMPLETED change.
+            settle_payment(payment, PAYMENT_STATUS_MAP.get(data["data"]["status"].lower(), "PENDING"))
 
+        remember_status(payment)
+        return Response(
+            {
+                "payment_status": payment.status,
+                "transaction_id": payment.transaction_id,
+            },
+            status=status.HTTP_200_OK,
+        )
 
-class VerifyPaymentView(APIView):
-    """Verify the status of a payment transaction with Chapa."""
-    def get(self, request, transaction_id):
-        payment = get_object_or_404(Payment, transaction_id=transaction_id)
+
+class ChapaWebhookView(APIView):
+    """
+    Receive payment events pushed by Chapa.
+
+    The raw body must carry a valid HMAC-SHA256 signature (CHAPA_WEBHOOK_SECRET)
+    in the x-chapa-signature header. Events only move PENDING payments, so
+    redelivered events are acknowledged without changing anything.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        body = request.body
+        signature = request.headers.get("x-chapa-signature") or request.headers.get("chapa-signature")
+        if not verify_webhook_signature(body, signature):
+            return Response({"error": "Invalid signature."}, status=status.HTTP_403_FORBIDDEN)
 
         try:
-            data, status_code = chapa_verify_payment(transaction_id)
+            event = json.loads(body)
+        except ValueError:
+            event = None
+        if not isinstance(event, dict):
+            return Response({"error": "Invalid payload."}, status=status.HTTP_400_BAD_REQUEST)
+
+        payment, updated = apply_webhook_event(event)
+        if payment is None:
+            # Acknowledge so Chapa stops redelivering events for unknown payments.
+            return Response({"updated": False}, status=status.HTTP_200_OK)
+        return Response(
+            {
+                "updated": updated,
+                "payment_status": payment.status,
+                "transaction_id": payment.transaction_id,
+            },
+            status=status.HTTP_200_OK,
+        )
 
-            if status_code != 200 or data.get("status") != "success":
-                return Response({"error": data}, status=status.HTTP_400_BAD_REQUEST)
 
-            status_map = {
-                "successful": "COMPLETED",
-                "failed": "FAILED",
-            }
-            payment.status = status_map.get(
-                data["data"]["status"].lower(), "PENDING"
+# ----------------------------
+# Async Payment Views (ASGI)
+# ----------------------------
+# Same contract as the views above, but the gateway call is awaited on a
+# pooled async client instead of holding a worker thread, so under ASGI one
+# worker can keep many Chapa requests in flight. Under WSGI they still work,
+# each request running in its own event loop.
+async def authenticate_request(request):
+    """Run the configured DRF authenticators and return the request's user."""
+    drf_request = Request(
+        request,
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    return await sync_to_async(lambda: drf_request.user)()
+
+
+def error_response(exc):
+    return JsonResponse({"detail": str(exc.detail)}, status=exc.status_code)
+
+
+class AsyncInitiatePaymentView(View):
+    """Async version of InitiatePaymentView."""
+
+    async def post(self, request, booking_id):
+        try:
+            user = await authenticate_request(request)
+        except APIException as exc:
+            return error_response(exc)
+        if not user.is_authenticated:
+            return error_response(NotAuthenticated())
+
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            data, status_code = await self.initiate(booking_id)
+            return JsonResponse(data, status=status_code)
+
+        try:
+            record, stored = await sync_to_async(idempotency.begin)(
+                key, user, idempotency.request_fingerprint(request)
             )
-            payment.save()
+        except APIException as exc:
+            return error_response(exc)
+        if stored is not None:
+            response = JsonResponse(stored.response, status=stored.status_code)
+            response["Idempotent-Replayed"] = "true"
+            return response
+        try:
+            data, status_code = await self.initiate(booking_id)
+        except BaseException:
+            await record.adelete()
+            raise
+        await sync_to_async(idempotency.finish)(record, status_code, data)
+        return JsonResponse(data, status=status_code)
+
+    async def initiate(self, booking_id):
+        booking = await Booking.objects.select_related("user").filter(id=booking_id).afirst()
+        if booking is None:
+            return {"detail": "No Booking matches the given query."}, 404
+
+        existing = await sync_to_async(reuse_checkout)(booking.id)
+        if existing is not None:
+            return existing
+        if not await sync_to_async(lock_initiation)(booking.id):
+            return {"error": "Payment initiation is already in progress."}, 409
 
-            if payment.status == "COMPLETED":
-                run_task(
-                    send_payment_confirmation_email,
-                    payment.booking.user.email,
-                    payment.booking.id,
+        try:
+            # A call that held the lock may have opened a checkout since the check above.
+            existing = await sync_to_async(reuse_checkout)(booking.id)
+            if existing is not None:
+                return existing
+            response = await get_async_gateway_client().post(
+                "transaction/initialize", json=chapa_initiate_payload(booking)
+            )
+            response_data = response.json()
+            if response.status_code == 200 and response_data.get("status") == "success":
+                return await sync_to_async(record_checkout)(booking, response_data)
+            return {"error": "Failed to initiate payment", "details": response_data}, 400
+        # httpx, unlike requests, raises a bare ValueError for a non-JSON body.
+        except (*GATEWAY_ERRORS, ValueError) as e:
+            return {"error": str(e)}, 500
+        finally:
+            await sync_to_async(unlock_initiation)(booking.id)
+
+
+class AsyncVerifyPaymentView(View):
+    """Async version of VerifyPaymentView."""
+
+    async def get(self, request, transaction_id):
+        cached = await cache.aget(status_cache_key(transaction_id))
+        if cached is not None:
+            return JsonResponse({"payment_status": cached, "transaction_id": transaction_id})
+
+        payment = await Payment.objects.select_related("booking__user").filter(
+            transaction_id=transaction_id
+        ).afirst()
+        if payment is None:
+            return JsonResponse({"detail": "No Payment matches the given query."}, status=404)
+
+        if payment.status not in TERMINAL_STATUSES:
+            try:
+                response = await get_async_gateway_client().get(
+                    f"transaction/verify/{transaction_id}"
                 )
+                data = response.json()
+            except (*GATEWAY_ERRORS, ValueError) as e:
+                return JsonResponse({"error": str(e)}, status=500)
 
-            return Response(
-                {
-                    "payment_status": payment.status,
-                    "transaction_id": payment.transaction_id,
-                },
-                status=status.HTTP_200_OK,
-            )
+            if response.status_code != 200 or data.get("status") != "success":
+                return JsonResponse({"error": data}, status=400)
 
-        except requests.RequestException as e:
-            return Response(
-                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            await sync_to_async(settle_payment)(
+                payment, PAYMENT_STATUS_MAP.get(data["data"]["status"].lower(), "PENDING")
             )
 
+        await sync_to_async(remember_status)(payment)
+        return JsonResponse(
+            {"payment_status": payment.status, "transaction_id": payment.transaction_id}
+        )
+
 
 # ----------------------------
 # Booking & Listings
 # ----------------------------
 class BookingViewSet(viewsets.ModelViewSet):
     """Manage bookings (CRUD)."""
-    queryset = Booking.objects.all()
+    queryset = Booking.objects.select_related("user", "listing")
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    bulk_max_items = 500
+    bulk_notification_batch = 100
+
+    def _save_if_available(self, serializer, **save_kwargs):
+        """
+        Save the booking only if its listing can take it.
+
+        The listing row is locked for the duration of the transaction, so
+        concurrent requests for the same listing are checked one at a time
+        and cannot double-book.
+        """
+        instance = serializer.instance
+        data = serializer.validated_data
+
+        def current(field):
+            return data.get(field, getattr(instance, field, None))
+
+        with transaction.atomic():
+            listing = Listing.objects.select_for_update().get(pk=current("listing").pk)
+            if (current("status") or "pending") in BLOCKING_STATUSES:
+                result = check_availability(
+                    listing,
+                    current("check_in"),
+                    current("check_out"),
+                    current("guests"),
+                    exclude_booking_id=getattr(instance, "pk", None),
+                )
+                if not result.available:
+                    raise ValidationError({"non_field_errors": [result.reason]})
+            # The price is quoted on the server, and only requoted when the
+            # stay changes, so a status update keeps the agreed price.
+            if instance is None or any(field in data for field in ("listing", "check_in", "check_out", "guests")):
+                total = quote_stay(listing, current("check_in"), current("check_out"), current("guests")).total
+                error = booking_price_error(total)
+                if error:
+                    raise ValidationError({"non_field_errors": [error]})
+                save_kwargs["price"] = total
+            return serializer.save(listing=listing, **save_kwargs)
 
     def perform_create(self, serializer):
-        booking = serializer.save(user=self.request.user)
+        booking = self._save_if_available(serializer, user=self.request.user)
 
         if booking.user and booking.user.email:
             run_task(send_booking_confirmation_email, booking.user.email, booking.id)
@@ -183,12 +421,268 @@ class BookingViewSet(viewsets.ModelViewSet):
                 guest_name,
             )
 
+    def perform_update(self, serializer):
+        self._save_if_available(serializer)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Create many bookings in one all-or-nothing transaction."""
+        serializer = BookingBulkItemSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=self.bulk_max_items
+        )
+        serializer.is_valid(raise_exception=True)
+        bookings = serializer.save(user=request.user)
+
+        booking_ids = [booking.id for booking in bookings]
+        for start in range(0, len(booking_ids), self.bulk_notification_batch):
+            run_task(
+                send_bulk_booking_notifications,
+                booking_ids[start:start + self.bulk_notification_batch],
+            )
+
+        data = BookingSerializer(bookings, many=True, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class QuoteRateThrottle(UserRateThrottle):
+    """Per user (or per IP for anonymous callers) limit on the public quote action."""
+    scope = "quote"
 
-class ListingViewSet(viewsets.ModelViewSet):
+
+class ListingViewSet(VersionedCacheMixin, viewsets.ModelViewSet):
     """Manage listings (CRUD)."""
     queryset = Listing.objects.all()
     serializer_class = ListingSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    filter_backends = [ListingSearchFilter, StableOrderingFilter]
+    ordering_fields = ["price", "capacity", "available_from", "created_at", "average_rating"]
+    ordering = ["-created_at", "-id"]
+    quote_max_items = 500
+
+    def get_queryset(self):
+        # Review aggregates are stored on Listing (see listings.signals) and
+        # the host is joined, so a page costs a fixed number of queries.
+        return super().get_queryset().select_related("host")
+
+    @action(detail=True, methods=["get"])
+    def availability(self, request, pk=None):
+        """Check whether the listing is free for a stay and guest count."""
+        params = AvailabilityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        listing = self.get_object()
+        result = check_availability(
+            listing, query["check_in"], query["check_out"], query["guests"]
+        )
+        return Response(
+            {
+                "listing_id": listing.pk,
+                "check_in": query["check_in"],
+                "check_out": query["check_out"],
+                "guests": query["guests"],
+                "available": result.available,
+                "remaining_capacity": result.remaining_capacity,
+                "reason": result.reason,
+            }
+        )
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Keyword search over titles, descriptions and locations, best matches first.
+
+        Takes ?q= plus any of the list filters. Results are cached like the
+        list, since any listing change can alter them.
+        """
+        params = ListingTextSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        def render():
+            queryset = search_listings(self.filter_queryset(self.get_queryset()), params.validated_data["q"])
+            paginator = SearchPagination()
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+        return self._cached(request, LIST_SCOPE, render)
+
+    @action(detail=False, methods=["get"], authentication_classes=[], permission_classes=[AllowAny])
+    def autocomplete(self, request):
+        """
+        Title or location suggestions for a typed prefix, from the in-memory index.
+
+        No authentication, so a lookup runs no database query at all.
+        """
+        params = AutocompleteQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        autocomplete.index.sync()
+        if query["field"] == "location":
+            results = autocomplete.index.suggest_locations(query["q"], query["limit"])
+        else:
+            results = autocomplete.index.suggest_titles(query["q"], query["limit"])
+        return Response({"results": results})
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[IsAuthenticated],
+        parser_classes=[MultiPartParser],
+    )
+    def import_listings(self, request):
+        """
+        Create or update listings from an uploaded CSV or NDJSON `file`.
+
+        Rows with a slug update the caller's listing with that slug (or
+        create it); rows without one are created. Returns counts and the
+        errors of rejected rows by line number.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": ["Upload a CSV or NDJSON file."]})
+        file_format = request.data.get("file_format") or format_for(upload.name)
+        if file_format not in ("csv", "ndjson"):
+            raise ValidationError({"file_format": ["Use a .csv or .ndjson file, or set file_format."]})
+
+        report = ListingImporter(request.user).run(read_rows(upload, file_format))
+        return Response(report)
+
+    @action(detail=False, methods=["get"])
+    def calendar(self, request):
+        """Per-night occupancy for many listings, read from the occupancy table."""
+        params = CalendarQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        start = query.get("start") or timezone.localdate()
+        end = start + timedelta(days=query["days"] - 1)
+        found = Listing.objects.only(
+            "id", "capacity", "available_from", "available_to"
+        ).in_bulk(query["ids"])
+        listings = [found[pk] for pk in query["ids"] if pk in found]
+
+        return Response(
+            {
+                "start": start,
+                "end": end,
+                "listings": listing_calendars(listings, start, end),
+            }
+        )
+
+    @action(detail=False, methods=["post"], permission_classes=[AllowAny], throttle_classes=[QuoteRateThrottle])
+    def quote(self, request):
+        """
+        Price many stays in one call.
+
+        Takes a list of {listing_id, check_in, check_out, guests} and returns
+        a quote for each, in order, from the listings' pricing rules. Quotes
+        are not holds: availability is checked when booking.
+        """
+        params = QuoteRequestSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=self.quote_max_items
+        )
+        params.is_valid(raise_exception=True)
+        quotes = quote_stays(
+            (item["listing"], item["check_in"], item["check_out"], item["guests"])
+            for item in params.validated_data
+        )
+        return Response(QuoteSerializer(quotes, many=True).data)
+
+
+# ----------------------------
+# Host analytics
+# ----------------------------
+class AnalyticsView(APIView):
+    """Daily rollup rows and their totals over ?start=&end= (listings.analytics)."""
+    permission_classes = [IsAuthenticated]
+
+    def respond(self, rows, serializer_class, query, **extra):
+        return Response(
+            {
+                **extra,
+                "start": query["start"],
+                "end": query["end"],
+                # Changes after this moment are not in the figures yet.
+                "as_of": last_refreshed(),
+                "totals": summarize(rows),
+                "days": serializer_class(rows, many=True).data,
+            }
+        )
+
+    def query(self, request):
+        params = AnalyticsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data
+
+
+class HostAnalyticsView(AnalyticsView):
+    """
+    GET /api/analytics/host/?start=&end= - activity across the caller's
+    listings; staff may add &host=<id> for another host.
+    """
+
+    def get(self, request):
+        query = self.query(request)
+        host_id = request.user.pk
+        if "host" in query:
+            if not request.user.is_staff:
+                raise ValidationError({"host": ["Only staff can view another host's analytics."]})
+            host_id = query["host"]
+        rows = HostDailyStats.objects.filter(
+            host_id=host_id, date__gte=query["start"], date__lte=query["end"]
+        ).order_by("date")
+        return self.respond(rows, HostDailyStatsSerializer, query, host_id=host_id)
+
+
+class ListingAnalyticsView(AnalyticsView):
+    """GET /api/analytics/listings/<id>/?start=&end= - one listing's activity, for its host or staff."""
+
+    def get(self, request, listing_id):
+        query = self.query(request)
+        listing = Listing.objects.filter(pk=listing_id).only("id", "host_id").first()
+        if listing is None or (listing.host_id != request.user.pk and not request.user.is_staff):
+            raise NotFound("No such listing among yours.")
+        rows = ListingDailyStats.objects.filter(
+            listing_id=listing.pk, date__gte=query["start"], date__lte=query["end"]
+        ).order_by("date")
+        return self.respond(rows, ListingDailyStatsSerializer, query, listing_id=listing.pk)
+
+
+# ----------------------------
+# Exports
+# ----------------------------
+class ExportView(APIView):
+    """
+    Stream every booking or payment as CSV or NDJSON (admin only).
+
+    GET /api/exports/<bookings|payments>.<csv|ndjson>?start=&end=&status=
+    filters on the creation date (inclusive) and status. Rows are read in
+    fixed-size chunks with the listing title and user email joined in, so
+    the response is never held in memory.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, resource, file_format):
+        export = EXPORTS.get(resource)
+        if export is None or file_format not in CONTENT_TYPES:
+            raise NotFound()
+        params = ExportQuerySerializer(
+            data=request.query_params, context={"statuses": export.statuses}
+        )
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        queryset = export_queryset(export, query.get("start"), query.get("end"), query.get("status"))
+        response = StreamingHttpResponse(
+            stream_export(export, queryset, file_format), content_type=CONTENT_TYPES[file_format]
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{resource}-{timezone.localdate().isoformat()}.{file_format}"'
+        )
+        return response
 
 
 # ----------------------------